@@ -0,0 +1,111 @@
+"""Микробенчмарк: стоимость маршрутизации callback_query.
+
+Сравнивает старую цепочку фильтров F.data.startswith(...) (в порядке регистрации
+из прежнего main.py, с ручным split) и префиксное дерево из callbacks.py
+(поиск + unpack фабрики).
+
+Запуск: python benchmarks/bench_callbacks.py [--number 20000]
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import F  # noqa: E402
+from aiogram.types import CallbackQuery, Chat, Message, User  # noqa: E402
+
+from callbacks import (  # noqa: E402
+    NOOP, CallbackTrie, CartAction, CartCallback, MaintenanceCallback, MenuCallback,
+    MenuTarget, OrderAction, OrderCallback, ProductAction, ProductCallback, StockAction,
+    StockCallback, _Route, route_path,
+)
+
+# Порядок фильтров из старого main.py: (тип сравнения, значение)
+LEGACY_FILTERS = [
+    ("eq", "catalog:page:0"), ("sw", "product:"), ("sw", "cart:add:"), ("sw", "cart:dec:"),
+    ("sw", "cart:remove:"), ("eq", "cart:clear"), ("eq", "order:checkout"), ("sw", "bonus:toggle:"),
+    ("eq", "order:pay"), ("sw", "admin:price:product:"), ("eq", "bonus:apply"),
+    ("sw", "admin:delete:product:"), ("sw", "admin:delete:confirm:"), ("eq", "admin:delete:cancel"),
+    ("eq", "admin:delete:menu"), ("sw", "admin:product:"), ("sw", "admin:stock:product:"),
+    ("sw", "admin:stock:add:"), ("sw", "admin:stock:dec:"), ("eq", "admin:stock:menu"),
+    ("eq", "admin:menu"), ("sw", "admin:bonus:user:"), ("sw", "admin:bonus:add:"),
+    ("sw", "admin:bonus:remove:"), ("sw", "admin:order:delete:confirm:"), ("sw", "admin:order:delete:"),
+    ("sw", "admin:order:cancel:"), ("sw", "admin:order:"), ("sw", "maintenance:toggle:"),
+    ("eq", "menu:main"), ("eq", "menu:cart"), ("eq", "noop"),
+]
+
+ORDER = "ORDER-123456-ABCDEF"
+
+# (старый callback_data, новый callback_data, фабрика)
+SAMPLES = [
+    ("product:42", ProductCallback(action=ProductAction.view, product_id=42).pack(), ProductCallback),
+    ("cart:add:42", CartCallback(action=CartAction.add, product_id=42).pack(), CartCallback),
+    ("admin:stock:add:42", StockCallback(action=StockAction.add, product_id=42).pack(), StockCallback),
+    (f"admin:order:{ORDER}", OrderCallback(action=OrderAction.view, order_number=ORDER).pack(), OrderCallback),
+    ("maintenance:toggle:on", MaintenanceCallback(enable=True).pack(), MaintenanceCallback),
+    ("menu:cart", MenuCallback(target=MenuTarget.cart).pack(), MenuCallback),
+    ("noop", NOOP, None),
+]
+
+
+def make_callback(data: str) -> CallbackQuery:
+    user = User(id=1, is_bot=False, first_name="bench")
+    message = Message(message_id=1, date=datetime.now(), chat=Chat(id=1, type="private"))
+    return CallbackQuery(id="1", from_user=user, chat_instance="bench", message=message, data=data)
+
+
+def build_legacy_chain():
+    return [(F.data == value) if kind == "eq" else F.data.startswith(value) for kind, value in LEGACY_FILTERS]
+
+
+def legacy_dispatch(chain, callback: CallbackQuery):
+    for magic in chain:
+        if magic.resolve(callback):
+            return callback.data.split(":")
+    return None
+
+
+def build_trie() -> CallbackTrie:
+    trie = CallbackTrie()
+    handler = object()
+    for factory, actions in [
+        (ProductCallback, ProductAction), (CartCallback, CartAction), (OrderCallback, OrderAction),
+        (StockCallback, StockAction), (MenuCallback, MenuTarget),
+    ]:
+        for action in actions:
+            trie.add(route_path(factory, action), _Route(handler, factory))
+    trie.add(route_path(MaintenanceCallback), _Route(handler, MaintenanceCallback))
+    trie.add(route_path(NOOP), _Route(handler, None))
+    return trie
+
+
+def trie_dispatch(trie: CallbackTrie, callback: CallbackQuery):
+    route = trie.resolve(callback.data)
+    if route.factory is not None:
+        return route.factory.unpack(callback.data)
+    return route
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000, help="итераций на образец")
+    args = parser.parse_args()
+
+    chain = build_legacy_chain()
+    trie = build_trie()
+
+    print(f"{'callback_data':<34} {'filters, µs':>12} {'trie, µs':>10} {'trie+unpack, µs':>16}")
+    for old_data, new_data, factory in SAMPLES:
+        old_cb, new_cb = make_callback(old_data), make_callback(new_data)
+        legacy = timeit.timeit(lambda: legacy_dispatch(chain, old_cb), number=args.number)
+        resolve = timeit.timeit(lambda: trie.resolve(new_cb.data), number=args.number)
+        full = timeit.timeit(lambda: trie_dispatch(trie, new_cb), number=args.number)
+        per_call = 1e6 / args.number
+        print(f"{old_data:<34} {legacy * per_call:>12.2f} {resolve * per_call:>10.2f} {full * per_call:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
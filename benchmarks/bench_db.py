@@ -0,0 +1,291 @@
+"""Бенчмарк: операции database.py на базах разного размера.
+
+Для каждого масштаба (число пользователей) создаёт временную БД через
+database.init_db() и заливает пропорционально товары, заказы с позициями,
+бонусы и корзины. Затем каждую операцию (get_cart, get_active_bonus,
+create_order, get_all_orders, get_all_products, add_to_cart, ...) вызывает
+много раз и считает ops/s и перцентили задержки. Подготовка аргументов
+(например, наполнение корзины перед create_order) в замер не входит.
+
+Результаты пишутся в JSON; --compare сравнивает с прошлым прогоном
+(например, с результатом предыдущего коммита).
+
+Запуск: python benchmarks/bench_db.py [--scales 1000,100000,1000000] [--iterations 200]
+        [--json bench_db.json] [--compare old.json]
+"""
+import argparse
+import asyncio
+import inspect
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiosqlite  # noqa: E402
+
+import database as db  # noqa: E402
+from records import OrderItem  # noqa: E402
+from rendering import render_order_summary  # noqa: E402
+
+KINDS = ("Худи", "Футболка", "Свитшот", "Кепка", "Шапка", "Куртка", "Рюкзак", "Носки")
+COLORS = ("чёрный", "белый", "серый", "синий", "красный", "зелёный")
+USERS_PER_PRODUCT = 20           # 1M пользователей -> 50k товаров
+MIN_PRODUCTS = 100
+ORDERS_PER_USER = 1.0
+BONUS_SHARE = 0.3                # у стольких пользователей есть активный бонус
+CART_SHARE = 0.1                 # у стольких пользователей что-то лежит в корзине
+BATCH = 50000
+STOCK = 10 ** 9                  # create_order и add_to_cart не должны упираться в остаток
+REGRESSION = 1.10                # p50 медленнее в 1.1 раза - помечаем в --compare
+
+
+# ==================== НАПОЛНЕНИЕ ====================
+def sizes_for(users: int) -> dict:
+    return {
+        "users": users,
+        "products": max(MIN_PRODUCTS, users // USERS_PER_PRODUCT),
+        "orders": int(users * ORDERS_PER_USER),
+    }
+
+
+def product_name(product_id: int) -> str:
+    return f"{KINDS[product_id % len(KINDS)]} {COLORS[product_id // len(KINDS) % len(COLORS)]} #{product_id}"
+
+
+async def fill(sizes: dict, rnd: random.Random):
+    users, products, orders = sizes["users"], sizes["products"], sizes["orders"]
+    async with aiosqlite.connect(db.DB_PATH) as conn:
+        for start in range(1, users + 1, BATCH):
+            await conn.executemany(
+                "INSERT INTO users (user_id, username, first_name, name_key) VALUES (?, ?, ?, ?)",
+                [(user_id, f"user{user_id}", "Bench", "bench")
+                 for user_id in range(start, min(start + BATCH, users + 1))]
+            )
+        await conn.executemany(
+            "INSERT INTO products (id, name, description, price, stock) VALUES (?, ?, ?, ?, ?)",
+            [(product_id, product_name(product_id), "Плотный хлопок, оверсайз", rnd.randint(300, 9000), STOCK)
+             for product_id in range(1, products + 1)]
+        )
+        await conn.executemany(
+            "INSERT INTO bonuses (user_id, discount_percent) VALUES (?, ?)",
+            [(user_id, rnd.choice((5, 10, 15))) for user_id in range(1, users + 1) if rnd.random() < BONUS_SHARE]
+        )
+        await conn.executemany(
+            "INSERT OR IGNORE INTO cart (user_id, product_id, quantity) VALUES (?, ?, ?)",
+            [(user_id, rnd.randint(1, products), rnd.randint(1, 3))
+             for user_id in range(1, users + 1) if rnd.random() < CART_SHARE for _ in range(rnd.randint(1, 3))]
+        )
+        await conn.commit()
+
+        # Карточка заказа (summary) - как у create_order: иначе get_order_summary мерил бы
+        # разовую дорисовку старых заказов вместо чтения готовой карточки
+        created_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        for start in range(1, orders + 1, BATCH):
+            order_rows, item_rows = [], []
+            for order_id in range(start, min(start + BATCH, orders + 1)):
+                positions = [(product_name(rnd.randint(1, products)), rnd.randint(1, 3), rnd.randint(300, 9000))
+                             for _ in range(rnd.randint(1, 3))]
+                total = sum(quantity * price for _, quantity, price in positions)
+                order_number = f"ORDER-{order_id % 1000000:06d}-{rnd.getrandbits(24):06X}"
+                user_id, status = rnd.randint(1, users), rnd.choice(("pending", "paid", "paid"))
+                items = [OrderItem(product_name=name, quantity=quantity, subtotal=quantity * price)
+                         for name, quantity, price in positions]
+                summary = render_order_summary(order_number, f"user{user_id}", created_at, status,
+                                               items, total, 0, total)
+                order_rows.append((order_id, order_number, user_id, total, 0, total, status, created_at,
+                                   summary, sum(quantity for _, quantity, _ in positions)))
+                item_rows += [(order_id, name, quantity, price, quantity * price)
+                              for name, quantity, price in positions]
+            await conn.executemany("""
+                INSERT INTO orders (id, order_number, user_id, total_price, discount_percent, final_price,
+                                    status, created_at, summary, item_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, order_rows)
+            await conn.executemany("""
+                INSERT INTO order_items (order_id, product_name, quantity, price_per_item, subtotal)
+                VALUES (?, ?, ?, ?, ?)
+            """, item_rows)
+            await conn.commit()
+        await conn.execute("ANALYZE")
+        await conn.commit()
+
+        cursor = await conn.execute("SELECT order_number FROM orders ORDER BY random() LIMIT 200")
+        return [row[0] for row in await cursor.fetchall()]
+
+
+# ==================== ОПЕРАЦИИ ====================
+def build_operations(sizes: dict, order_numbers: list):
+    """(имя, доля итераций, подготовка аргументов, операция).
+    Доля < 1 - для операций, читающих таблицу целиком: на 1M они идут секундами"""
+    users, products = sizes["users"], sizes["products"]
+    buyers = itertools.count(users + 1)  # свежие покупатели с пустой корзиной
+
+    async def prepare_order(rnd):
+        buyer = next(buyers)
+        for _ in range(rnd.randint(1, 3)):
+            await db.add_to_cart(buyer, rnd.randint(1, products), 1)
+        return buyer, await db.get_cart(buyer), 0
+
+    def prepare_search(rnd):
+        # Иначе после первых восьми запросов мерили бы кэш поиска, а не LIKE по таблице
+        db._search_cache.clear()
+        return rnd.choice(KINDS).lower(),
+
+    return [
+        ("get_or_create_user", 1, lambda rnd: (rnd.randint(1, users), "user", "Bench"), db.get_or_create_user),
+        ("is_banned", 1, lambda rnd: (rnd.randint(1, users),), db.is_banned),
+        ("get_cart", 1, lambda rnd: (rnd.randint(1, users),), db.get_cart),
+        ("get_active_bonus", 1, lambda rnd: (rnd.randint(1, users),), db.get_active_bonus),
+        ("get_bonus_usage", 1, lambda rnd: (rnd.randint(1, users),), db.get_bonus_usage),
+        ("get_product", 1, lambda rnd: (rnd.randint(1, products),), db.get_product),
+        ("search_products", 1, prepare_search, db.search_products),
+        ("get_admin_products_page", 1, lambda rnd: (), db.get_admin_products_page),
+        ("search_users", 1, lambda rnd: ("all", f"user{rnd.randint(1, users)}"), db.search_users),
+        ("add_to_cart", 1, lambda rnd: (next(buyers), rnd.randint(1, products), 1), db.add_to_cart),
+        ("create_order", 1, prepare_order, db.create_order),
+        ("get_order", 1, lambda rnd: (rnd.choice(order_numbers),), db.get_order),
+        ("get_order_summary", 1, lambda rnd: (rnd.choice(order_numbers),), db.get_order_summary),
+        ("get_recent_orders", 1, lambda rnd: (), db.get_recent_orders),
+        ("search_orders", 1, lambda rnd: (rnd.choice(KINDS).lower(),), db.search_orders),
+        ("get_sales_stats", 1, lambda rnd: (), db.get_sales_stats),
+        ("get_catalog_products", 0.1, lambda rnd: (), db.get_catalog_products),
+        ("get_all_products", 0.1, lambda rnd: (), db.get_all_products),
+        ("get_all_orders", 0.02, lambda rnd: (), db.get_all_orders),
+    ]
+
+
+def summarize(samples: list) -> dict:
+    ordered = sorted(samples)
+    total = sum(ordered)
+
+    def percentile(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e3
+
+    return {
+        "iterations": len(ordered),
+        "ops_per_sec": len(ordered) / total if total else 0.0,
+        "mean_ms": total / len(ordered) * 1e3,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": ordered[-1] * 1e3,
+    }
+
+
+async def run_scale(users: int, iterations: int, only: set, keep: bool) -> dict:
+    db.DB_PATH = tempfile.mktemp(suffix=".db")
+    await db.init_db()
+    await db.load_reservations()
+    await db.load_bans()
+    rnd = random.Random(users)
+    sizes = sizes_for(users)
+
+    started = time.perf_counter()
+    order_numbers = await fill(sizes, rnd)
+    build = time.perf_counter() - started
+    print(f"\n=== {users} пользователей: {sizes['products']} товаров, {sizes['orders']} заказов "
+          f"(залито за {build:.1f} с, файл {os.path.getsize(db.DB_PATH) / 1048576:.0f} МБ)")
+    print(f"{'операция':<24} {'итераций':>8} {'ops/s':>10} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'макс, мс':>9}")
+
+    results = {}
+    for name, share, prepare, operation in build_operations(sizes, order_numbers):
+        if only and name not in only:
+            continue
+        samples = []
+        for _ in range(max(3, int(iterations * share))):
+            args = prepare(rnd)
+            if inspect.isawaitable(args):
+                args = await args
+            started = time.perf_counter()
+            await operation(*args)
+            samples.append(time.perf_counter() - started)
+        results[name] = stats = summarize(samples)
+        print(f"{name:<24} {stats['iterations']:>8} {stats['ops_per_sec']:>10.0f} {stats['p50_ms']:>9.2f} "
+              f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}")
+
+    if keep:
+        print(f"БД сохранена: {db.DB_PATH}")
+    else:
+        os.remove(db.DB_PATH)
+    return {"sizes": sizes, "build_seconds": build, "operations": results}
+
+
+# ==================== ОТЧЁТ ====================
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def compare(current: dict, previous: dict):
+    print(f"\nСравнение с {previous['meta'].get('revision') or 'прошлым прогоном'} (p50, мс):")
+    for scale, result in current["scales"].items():
+        old = previous["scales"].get(scale)
+        if old is None:
+            continue
+        print(f"--- {scale} пользователей")
+        for name, stats in result["operations"].items():
+            before = old["operations"].get(name)
+            if before is None or not before["p50_ms"]:
+                continue
+            ratio = stats["p50_ms"] / before["p50_ms"]
+            mark = "  ⚠️ медленнее" if ratio >= REGRESSION else ("  ✅ быстрее" if ratio <= 1 / REGRESSION else "")
+            print(f"{name:<24} {before['p50_ms']:>9.2f} -> {stats['p50_ms']:>9.2f} ({ratio:.2f}x){mark}")
+
+
+async def run(scales: list, iterations: int, only: set, keep: bool) -> dict:
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "iterations": iterations,
+        },
+        "scales": {},
+    }
+    for users in scales:
+        report["scales"][str(users)] = await run_scale(users, iterations, only, keep)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="1000,100000,1000000", help="числа пользователей через запятую")
+    parser.add_argument("--iterations", type=int, default=200, help="вызовов на операцию")
+    parser.add_argument("--only", default="", help="только эти операции (через запятую)")
+    parser.add_argument("--json", default="bench_db.json", help="куда записать результаты")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--keep", action="store_true", help="не удалять временные БД")
+    args = parser.parse_args()
+
+    # Журнал бота (резервы, заказы) в замере только мешает
+    logging.disable(logging.INFO)
+
+    scales = [int(scale) for scale in args.scales.split(",") if scale]
+    only = {name for name in args.only.split(",") if name}
+    report = asyncio.run(run(scales, args.iterations, only, args.keep))
+
+    with open(args.json, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты: {args.json}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(report, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Бенчмарк: поиск заказов в админке на большой базе.
+
+Создаёт временную БД через database.init_db(), заливает N заказов
+(по 1-3 позиции, индексы и триггер order_items_fts работают как в боте)
+и замеряет database.search_orders() во всех режимах: точный номер,
+префикс номера, ID покупателя, @username и название товара.
+
+Запуск: python benchmarks/bench_order_search.py [--orders 1000000] [--repeat 50]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiosqlite  # noqa: E402
+
+import database as db  # noqa: E402
+
+PRODUCTS = [f"{kind} {color}" for kind in ("Худи", "Футболка", "Свитшот", "Кепка", "Шапка", "Куртка")
+            for color in ("чёрный", "белый", "серый", "синий", "красный")]
+USERS = 20000
+BATCH = 50000
+
+
+def make_batch(start: int, count: int, rnd: random.Random):
+    orders, items = [], []
+    for order_id in range(start, start + count):
+        user_id = rnd.randint(1, USERS)
+        number = f"ORDER-{order_id % 1000000:06d}-{rnd.getrandbits(24):06X}"
+        positions = [(rnd.choice(PRODUCTS), rnd.randint(1, 3), rnd.randint(300, 5000))
+                     for _ in range(rnd.randint(1, 3))]
+        total = sum(quantity * price for _, quantity, price in positions)
+        orders.append((order_id, number, user_id, total, 0, total, "paid"))
+        items += [(order_id, name, quantity, price, quantity * price) for name, quantity, price in positions]
+    return orders, items
+
+
+async def fill(count: int):
+    rnd = random.Random(42)
+    async with aiosqlite.connect(db.DB_PATH) as conn:
+        await conn.executemany(
+            "INSERT INTO users (user_id, username, first_name) VALUES (?, ?, ?)",
+            [(user_id, f"user{user_id}", "Bench") for user_id in range(1, USERS + 1)]
+        )
+        for start in range(1, count + 1, BATCH):
+            orders, items = make_batch(start, min(BATCH, count - start + 1), rnd)
+            await conn.executemany("""
+                INSERT INTO orders (id, order_number, user_id, total_price, discount_percent, final_price, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, orders)
+            await conn.executemany("""
+                INSERT INTO order_items (order_id, product_name, quantity, price_per_item, subtotal)
+                VALUES (?, ?, ?, ?, ?)
+            """, items)
+            await conn.commit()
+        cursor = await conn.execute("SELECT order_number FROM orders WHERE id = ?", (count // 2,))
+        return (await cursor.fetchone())[0]
+
+
+async def run(count: int, repeat: int):
+    db.DB_PATH = tempfile.mktemp(suffix=".db")
+    await db.init_db()
+
+    started = time.perf_counter()
+    sample = await fill(count)
+    print(f"Залито {count} заказов за {time.perf_counter() - started:.1f} с\n")
+
+    queries = [
+        ("точный номер", sample),
+        ("префикс номера", sample[:10]),
+        ("ID покупателя", "4242"),
+        ("@username", "@user4242"),
+        ("товар", "худи"),
+        ("товар, 2 слова", "кепка сер"),
+        ("часть слова", "футбол"),
+    ]
+    print(f"{'режим':<18} {'запрос':<22} {'1-я стр., мс':>13} {'2-я стр., мс':>13}")
+    for title, query in queries:
+        first = second = 0.0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            orders, cursor = await db.search_orders(query)
+            first += time.perf_counter() - started
+            if cursor is not None:
+                started = time.perf_counter()
+                await db.search_orders(query, cursor)
+                second += time.perf_counter() - started
+        second_text = f"{second / repeat * 1e3:>13.2f}" if cursor is not None else f"{'-':>13}"
+        print(f"{title:<18} {query:<22} {first / repeat * 1e3:>13.2f} {second_text}")
+
+    os.remove(db.DB_PATH)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1000000, help="сколько заказов залить")
+    parser.add_argument("--repeat", type=int, default=50, help="повторов на запрос")
+    args = parser.parse_args()
+    asyncio.run(run(args.orders, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
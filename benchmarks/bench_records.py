@@ -0,0 +1,136 @@
+"""Бенчмарк: записи с __slots__ (records.py) против dict(aiosqlite.Row).
+
+Создаёт временную БД через database.init_db(), заливает пользователей, товары
+(1 на USERS_PER_PRODUCT пользователей) и заказы (1 на пользователя) и читает
+таблицы целиком так же, как get_all_products / get_all_orders и выборка всех
+пользователей: прежним способом (row_factory = Row, затем dict(row)) и фабрикой
+записей. Для каждого способа - время, память результата и пик (tracemalloc),
+число живых объектов-блоков. Замер на sqlite3 без потока aiosqlite: поток
+одинаков для обоих способов и только добавил бы шум.
+
+Запуск: python benchmarks/bench_records.py [--users 1000000] [--repeat 3]
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db  # noqa: E402
+from records import Order, Product, User  # noqa: E402
+
+USERS_PER_PRODUCT = 20
+BATCH = 50000
+
+QUERIES = [
+    ("users", User, "SELECT user_id, username, first_name, name_key, is_admin, is_banned, created_at FROM users"),
+    ("products", Product, "SELECT * FROM products ORDER BY name"),
+    ("orders", Order, """
+        SELECT o.id, o.order_number, o.user_id, o.total_price, o.discount_percent,
+               o.final_price, o.status, o.created_at, o.item_count,
+               u.username, u.first_name
+        FROM orders o
+        JOIN users u ON o.user_id = u.user_id
+        ORDER BY o.created_at DESC
+    """),
+]
+
+
+def fill(path: str, users: int):
+    products = max(100, users // USERS_PER_PRODUCT)
+    with sqlite3.connect(path) as conn:
+        for start in range(1, users + 1, BATCH):
+            ids = range(start, min(start + BATCH, users + 1))
+            conn.executemany(
+                "INSERT INTO users (user_id, username, first_name, name_key) VALUES (?, ?, ?, ?)",
+                [(user_id, f"user{user_id}", "Покупатель", "покупатель") for user_id in ids]
+            )
+            conn.executemany(
+                "INSERT INTO orders (id, order_number, user_id, total_price, discount_percent, final_price, "
+                "status, item_count) VALUES (?, ?, ?, 4990, 0, 4990, 'paid', 1)",
+                [(user_id, f"ORDER-{user_id:07d}-BENCH", user_id) for user_id in ids]
+            )
+        conn.executemany(
+            "INSERT INTO products (id, name, description, price, stock) VALUES (?, ?, ?, ?, ?)",
+            [(product_id, f"Товар #{product_id}", "Плотный хлопок, оверсайз", 4990, 10)
+             for product_id in range(1, products + 1)]
+        )
+    return products
+
+
+def fetch_dicts(conn: sqlite3.Connection, sql: str) -> list:
+    conn.row_factory = sqlite3.Row
+    return [dict(row) for row in conn.execute(sql).fetchall()]
+
+
+def fetch_records(conn: sqlite3.Connection, record, sql: str) -> list:
+    conn.row_factory = record.factory
+    return conn.execute(sql).fetchall()
+
+
+def measure(fetch, repeat: int) -> dict:
+    """Лучшее время из repeat прогонов; память - отдельным прогоном под tracemalloc"""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        rows = fetch()
+        best = min(best, time.perf_counter() - started)
+        del rows
+
+    gc.collect()
+    tracemalloc.start()
+    rows = fetch()
+    retained, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    count = len(rows)
+    del rows
+    return {"rows": count, "seconds": best, "retained": retained, "peak": peak, "blocks": blocks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3, help="прогонов на замер времени")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_records_")
+    db.DB_PATH = os.path.join(workdir, "shop.db")
+    try:
+        asyncio.run(db.init_db())
+        started = time.perf_counter()
+        products = fill(db.DB_PATH, args.users)
+        print(f"{args.users} пользователей, {products} товаров, {args.users} заказов "
+              f"(залито за {time.perf_counter() - started:.1f} с)\n")
+
+        print(f"{'таблица':<10} {'способ':<10} {'строк':>9} {'время, с':>9} {'память, МБ':>11} "
+              f"{'пик, МБ':>9} {'байт/строку':>12} {'блоков':>10}")
+        conn = sqlite3.connect(db.DB_PATH)
+        for name, record, sql in QUERIES:
+            results = {
+                "dict": measure(lambda: fetch_dicts(conn, sql), args.repeat),
+                "record": measure(lambda: fetch_records(conn, record, sql), args.repeat),
+            }
+            for kind, stats in results.items():
+                print(f"{name:<10} {kind:<10} {stats['rows']:>9} {stats['seconds']:>9.2f} "
+                      f"{stats['retained'] / 2 ** 20:>11.1f} {stats['peak'] / 2 ** 20:>9.1f} "
+                      f"{stats['retained'] / max(stats['rows'], 1):>12.0f} {stats['blocks']:>10}")
+            before, after = results["dict"], results["record"]
+            print(f"{'':<10} {'выигрыш':<10} {'':>9} {before['seconds'] / after['seconds']:>8.2f}x "
+                  f"{before['retained'] / after['retained']:>10.2f}x {before['peak'] / after['peak']:>8.2f}x\n")
+        conn.close()
+    finally:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Микробенчмарк: сборка текста карточки товара и корзины.
+
+Сравнивает прежнюю сборку f-строками и += (как в обработчиках до rendering.py)
+с кэшированной шапкой карточки и join-сборкой корзины. Перед замером проверяет,
+что тексты совпадают символ в символ.
+
+Запуск: python benchmarks/bench_render.py [--number 2000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import CartLine, Product  # noqa: E402
+from rendering import render_cart, render_checkout, render_product_card  # noqa: E402
+
+
+def make_product(description_len: int) -> Product:
+    return Product(
+        id=description_len, version=1, name="Худи оверсайз «Ночной город»",
+        description=("Плотный хлопок, двойная строчка. " * (description_len // 33 + 1))[:description_len],
+        price=4990, stock=25,
+    )
+
+
+def make_cart(size: int) -> list:
+    return [
+        CartLine(product_id=i, name=f"Товар номер {i}", price=100 + i, quantity=1 + i % 5)
+        for i in range(size)
+    ]
+
+
+# ==================== ПРЕЖНЯЯ СБОРКА ====================
+def legacy_product_card(product: Product, available_stock: int, in_cart: int) -> str:
+    text = (
+        f"📦 <b>{product.name}</b>\n\n"
+        f"📝 {product.description or 'Описание отсутствует'}\n\n"
+        f"💰 Цена: <b>{product.price}₽</b>\n"
+        f"📦 В наличии: <b>{available_stock} шт.</b>\n"
+    )
+    if in_cart > 0:
+        text += f"🛒 <b>В вашей корзине: {in_cart} шт.</b>\n"
+    return text
+
+
+def legacy_cart(cart: list) -> str:
+    total = sum(item.price * item.quantity for item in cart)
+    text = "🛒 <b>Ваша корзина:</b>\n\n"
+    for item in cart:
+        subtotal = item.price * item.quantity
+        text += f"• {item.name} × {item.quantity} шт. = <b>{subtotal}₽</b>\n"
+    text += f"\n💰 <b>Итого: {total}₽</b>"
+    return text
+
+
+def legacy_checkout(cart: list, bonus: int, use_bonus: bool) -> str:
+    total = sum(item.price * item.quantity for item in cart)
+    text = "📋 <b>Ваш заказ:</b>\n\n"
+    for item in cart:
+        subtotal = item.price * item.quantity
+        text += f"• {item.name} × {item.quantity} = <b>{subtotal}₽</b>\n"
+    text += f"\n💰 Сумма: <b>{total}₽</b>"
+    if bonus:
+        discount = total * bonus // 100
+        if use_bonus:
+            text += f"\n🎁 Скидка {bonus}%: -{discount}₽"
+            text += f"\n✅ <b>К оплате: {total - discount}₽</b>"
+        else:
+            text += f"\n🎁 Скидка {bonus}%: <i>не используется</i>"
+            text += f"\n✅ <b>К оплате: {total}₽</b>"
+    else:
+        text += f"\n✅ <b>К оплате: {total}₽</b>"
+    return text
+
+
+def measure(fn, number: int) -> float:
+    return timeit.timeit(fn, number=number) * 1e6 / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="итераций на замер")
+    args = parser.parse_args()
+
+    print(f"{'сценарий':<34} {'прежде, µs':>12} {'сейчас, µs':>12} {'ускорение':>10}")
+
+    for description_len in (0, 200, 2000, 4000):
+        product = make_product(description_len)
+        assert legacy_product_card(product, 7, 3) == render_product_card(product, 7, 3)
+        before = measure(lambda: legacy_product_card(product, 7, 3), args.number)
+        after = measure(lambda: render_product_card(product, 7, 3), args.number)
+        print(f"{f'карточка, описание {description_len}':<34} {before:>12.2f} {after:>12.2f} {before / after:>9.1f}x")
+
+    for size in (1, 10, 100, 1000):
+        cart = make_cart(size)
+        assert legacy_cart(cart) == render_cart(cart)
+        assert legacy_checkout(cart, 10, True) == render_checkout(cart, 10, True)
+        number = max(args.number // size, 10)
+        before = measure(lambda: legacy_cart(cart), number)
+        after = measure(lambda: render_cart(cart), number)
+        print(f"{f'корзина, позиций {size}':<34} {before:>12.2f} {after:>12.2f} {before / after:>9.1f}x")
+        before = measure(lambda: legacy_checkout(cart, 10, True), number)
+        after = measure(lambda: render_checkout(cart, 10, True), number)
+        print(f"{f'заказ, позиций {size}':<34} {before:>12.2f} {after:>12.2f} {before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Бенчмарк: поиск товаров через FTS5 на большом каталоге.
+
+Создаёт временную БД через database.init_db(), заливает N товаров
+(триггеры products_fts срабатывают на каждую вставку) и замеряет
+search_products() без кэша и с кэшем по запросу.
+
+Словарь описаний намеренно маленький: каждое слово встречается примерно
+в половине каталога, так что запросы по описанию - худший случай.
+
+Запуск: python benchmarks/bench_search.py [--products 100000] [--repeat 50]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiosqlite  # noqa: E402
+
+import database as db  # noqa: E402
+
+KINDS = ["Худи", "Футболка", "Свитшот", "Кепка", "Шапка", "Куртка", "Брюки", "Шорты", "Носки", "Рюкзак"]
+COLORS = ["чёрный", "белый", "серый", "синий", "красный", "зелёный", "бежевый", "хаки"]
+WORDS = ["хлопок", "оверсайз", "принт", "вышивка", "флис", "лён", "капюшон", "карман", "молния",
+         "тёплый", "лёгкий", "унисекс", "лимитированный", "коллекция", "базовый", "плотный"]
+
+QUERIES = ["х", "ху", "худи", "худи чёрн", "кепка хаки", "лимит", "флис капюшон", "несуществующее"]
+
+
+def make_rows(count: int):
+    rnd = random.Random(42)
+    for i in range(count):
+        name = f"{rnd.choice(KINDS)} {rnd.choice(COLORS)} #{i}"
+        description = " ".join(rnd.choices(WORDS, k=rnd.randint(5, 25)))
+        yield name, description, rnd.randint(300, 9000), rnd.randint(0, 50)
+
+
+async def run(products: int, repeat: int):
+    db.DB_PATH = tempfile.mktemp(suffix=".db")
+    await db.init_db()
+
+    started = time.perf_counter()
+    async with aiosqlite.connect(db.DB_PATH) as conn:
+        await conn.executemany(
+            "INSERT INTO products (name, description, price, stock) VALUES (?, ?, ?, ?)",
+            make_rows(products)
+        )
+        await conn.commit()
+    print(f"Залито {products} товаров за {time.perf_counter() - started:.1f} с "
+          f"(FTS-индекс поддерживается триггерами)\n")
+
+    print(f"{'запрос':<20} {'найдено':>8} {'без кэша, мс':>13} {'с кэшем, µs':>12}")
+    for query in QUERIES:
+        cold = 0.0
+        for _ in range(repeat):
+            db.bump_catalog_version()  # сбрасывает кэш поиска
+            started = time.perf_counter()
+            results = await db.search_products(query)
+            cold += time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            await db.search_products(query)
+        warm = time.perf_counter() - started
+
+        print(f"{query:<20} {len(results):>8} {cold / repeat * 1e3:>13.2f} {warm / repeat * 1e6:>12.1f}")
+
+    os.remove(db.DB_PATH)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=100000, help="размер каталога")
+    parser.add_argument("--repeat", type=int, default=50, help="повторов на запрос")
+    args = parser.parse_args()
+    asyncio.run(run(args.products, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Бенчмарк: потоковые выборки iter_* против списков в памяти.
+
+Для каждого размера создаёт временную БД (пользователи и по заказу на
+пользователя, как в bench_records.py) и проходит iter_users / iter_orders двумя
+способами: потоком (строка обработана и отброшена) и списком, как раньше
+отдавали get_all_*. Пик памяти (tracemalloc) у потока не должен расти с размером
+таблицы - он ограничен порцией STREAM_BATCH.
+
+Запуск: python benchmarks/bench_stream.py [--users 10000,100000,1000000] [--batch 500]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db  # noqa: E402
+from bench_records import fill  # noqa: E402
+
+
+async def stream(iterate) -> int:
+    count = 0
+    async for _ in iterate():
+        count += 1
+    return count
+
+
+async def collect(iterate) -> int:
+    rows = [row async for row in iterate()]
+    return len(rows)
+
+
+async def measure(consume, iterate) -> dict:
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = await consume(iterate)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"rows": rows, "seconds": elapsed, "peak": peak}
+
+
+async def run(users: int, batch: int):
+    await db.init_db()
+    fill(db.DB_PATH, users)
+    for name, iterate in (("users", lambda: db.iter_users(batch=batch)),
+                          ("orders", lambda: db.iter_orders(batch=batch))):
+        for kind, consume in (("поток", stream), ("список", collect)):
+            stats = await measure(consume, iterate)
+            print(f"{users:>10} {name:<8} {kind:<8} {stats['rows']:>10} {stats['seconds']:>9.2f} "
+                  f"{stats['peak'] / 2 ** 20:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", default="10000,100000,1000000", help="размеры таблицы через запятую")
+    parser.add_argument("--batch", type=int, default=db.STREAM_BATCH, help="строк на один SELECT")
+    args = parser.parse_args()
+
+    print(f"{'пользоват.':>10} {'таблица':<8} {'способ':<8} {'строк':>10} {'время, с':>9} {'пик, МБ':>9}")
+    for users in (int(size) for size in args.users.split(",")):
+        workdir = tempfile.mkdtemp(prefix="bench_stream_")
+        db.DB_PATH = os.path.join(workdir, "shop.db")
+        try:
+            asyncio.run(run(users, args.batch))
+        finally:
+            for name in os.listdir(workdir):
+                os.remove(os.path.join(workdir, name))
+            os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    main()
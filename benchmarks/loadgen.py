@@ -0,0 +1,344 @@
+"""Нагрузочный прогон всего бота без Telegram: апдейты идут прямо в dp.feed_update.
+
+Собирает диспетчер из main.py (те же роутеры и middleware), подменяет сессию бота
+заглушкой, которая запоминает исходящие вызовы Bot API и сразу отвечает, и
+прогоняет синтетические сценарии на временной БД:
+
+  shopper  - /start -> каталог -> товар -> +/- в корзину -> корзина -> оформление -> оплата
+  browser  - /start -> каталог -> листание -> несколько карточек -> бонусы
+  admin    - админ-панель -> история заказов -> заказ -> склад -> +1 -> статистика
+
+Каждый сценарий - свой пользователь, шаги внутри сценария идут последовательно,
+одновременно выполняется --concurrency сценариев. Отчёт: апдейты/с, задержка
+апдейтов, шагов и сценариев целиком, вызовы database.py, SQL-запросы и вызовы
+Bot API на апдейт. Удобно мерить main.py до и после изменения (--json + сравнение руками).
+
+Запуск: python benchmarks/loadgen.py [--journeys 500] [--concurrency 50]
+        [--mix shopper=6,browser=3,admin=1] [--products 300] [--json loadgen.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+os.environ.setdefault("BOT_TOKEN", "42:loadgen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiosqlite  # noqa: E402
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.dispatcher.event.bases import UNHANDLED  # noqa: E402
+from aiogram.types import CallbackQuery, Chat, Message, Update, User  # noqa: E402
+
+import database as db  # noqa: E402
+from callbacks import (  # noqa: E402
+    CartAction, CartCallback, CatalogCallback, MenuCallback, MenuTarget, OrderAction, OrderCallback,
+    ProductAction, ProductCallback, StockAction, StockCallback,
+)
+from metrics import db_metrics  # noqa: E402
+
+STOCK = 10 ** 9                  # оплата не должна упираться в остаток
+FIRST_USER_ID = 10 ** 6
+DEFAULT_MIX = "shopper=6,browser=3,admin=1"
+
+
+# ==================== ЗАГЛУШКА BOT API ====================
+class StubSession(BaseSession):
+    """Сессия без сети: считает вызовы по методам и сразу возвращает правдоподобный ответ"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[type(method).__name__] += 1
+        if "Message" not in str(method.__returning__):
+            return True
+        chat_id = getattr(method, "chat_id", None)
+        return Message(
+            message_id=next(self._message_ids), date=datetime.now(),
+            chat=Chat(id=chat_id if isinstance(chat_id, int) else 0, type="private"),
+            text=getattr(method, "text", None),
+        )
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+# ==================== АПДЕЙТЫ ====================
+_update_ids = itertools.count(1)
+
+
+def _user(user_id: int) -> User:
+    return User(id=user_id, is_bot=False, first_name="Load", username=f"load{user_id}")
+
+
+def message(user_id: int, text: str) -> Update:
+    return Update(update_id=next(_update_ids), message=Message(
+        message_id=1, date=datetime.now(), chat=Chat(id=user_id, type="private"),
+        from_user=_user(user_id), text=text,
+    ))
+
+
+def callback(user_id: int, data: str) -> Update:
+    origin = Message(message_id=1, date=datetime.now(), chat=Chat(id=user_id, type="private"), text="…")
+    return Update(update_id=next(_update_ids), callback_query=CallbackQuery(
+        id=str(next(_update_ids)), from_user=_user(user_id), chat_instance="loadgen", message=origin, data=data,
+    ))
+
+
+# ==================== СЦЕНАРИИ ====================
+# Сценарий - список (имя шага, апдейт); апдейты собираются до замера
+
+def shopper(user_id: int, rnd: random.Random, products: list, orders: list) -> list:
+    first, second = rnd.sample(products, 2)
+    return [
+        ("/start", message(user_id, "/start")),
+        ("catalog", message(user_id, "🛍️ Каталог")),
+        ("product", callback(user_id, ProductCallback(action=ProductAction.view, product_id=first).pack())),
+        ("cart_add", callback(user_id, CartCallback(action=CartAction.add, product_id=first).pack())),
+        ("cart_add", callback(user_id, CartCallback(action=CartAction.add, product_id=first).pack())),
+        ("cart_dec", callback(user_id, CartCallback(action=CartAction.dec, product_id=first).pack())),
+        ("catalog_back", callback(user_id, CatalogCallback(page=0).pack())),
+        ("product", callback(user_id, ProductCallback(action=ProductAction.view, product_id=second).pack())),
+        ("cart_add", callback(user_id, CartCallback(action=CartAction.add, product_id=second).pack())),
+        ("cart", message(user_id, "🛒 Корзина")),
+        ("checkout", callback(user_id, OrderCallback(action=OrderAction.checkout).pack())),
+        ("pay", callback(user_id, OrderCallback(action=OrderAction.pay).pack())),
+    ]
+
+
+def browser(user_id: int, rnd: random.Random, products: list, orders: list) -> list:
+    steps = [
+        ("/start", message(user_id, "/start")),
+        ("catalog", message(user_id, "🛍️ Каталог")),
+        ("catalog_page", callback(user_id, CatalogCallback(page=1).pack())),
+    ]
+    for product_id in rnd.sample(products, 3):
+        steps.append(("product", callback(user_id, ProductCallback(action=ProductAction.view,
+                                                                    product_id=product_id).pack())))
+        steps.append(("catalog_back", callback(user_id, CatalogCallback(page=0).pack())))
+    steps.append(("bonuses", message(user_id, "🎁 Бонусы")))
+    return steps
+
+
+def admin(user_id: int, rnd: random.Random, products: list, orders: list) -> list:
+    product_id = rnd.choice(products)
+    steps = [
+        ("admin_panel", message(user_id, "⚙️ Админ-панель")),
+        ("admin_orders", message(user_id, "📋 История заказов")),
+    ]
+    if orders:
+        steps.append(("admin_order", callback(user_id, OrderCallback(action=OrderAction.view,
+                                                                      order_number=rnd.choice(orders)).pack())))
+    steps += [
+        ("admin_orders_back", callback(user_id, MenuCallback(target=MenuTarget.admin_orders).pack())),
+        ("admin_stock", message(user_id, "📦 Пополнить товар")),
+        ("admin_stock_view", callback(user_id, StockCallback(action=StockAction.view, product_id=product_id).pack())),
+        ("admin_stock_add", callback(user_id, StockCallback(action=StockAction.add, product_id=product_id).pack())),
+        ("admin_stats", message(user_id, "📊 Статистика")),
+        ("admin_menu", callback(user_id, MenuCallback(target=MenuTarget.admin).pack())),
+    ]
+    return steps
+
+
+JOURNEYS = {"shopper": shopper, "browser": browser, "admin": admin}
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in JOURNEYS:
+            raise argparse.ArgumentTypeError(f"неизвестный сценарий {name!r}; есть: {', '.join(JOURNEYS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ==================== ПОДГОТОВКА ====================
+async def prepare(products: int, orders: int, rnd: random.Random) -> tuple:
+    """Временная БД: товары с большим остатком и немного старых заказов для админки"""
+    await db.init_db()
+    async with aiosqlite.connect(db.DB_PATH) as conn:
+        await conn.executemany(
+            "INSERT INTO products (id, name, description, price, stock) VALUES (?, ?, ?, ?, ?)",
+            [(product_id, f"Товар #{product_id}", "Описание для нагрузки", rnd.randint(300, 9000), STOCK)
+             for product_id in range(1, products + 1)]
+        )
+        await conn.executemany(
+            "INSERT INTO orders (order_number, user_id, total_price, discount_percent, final_price, status, "
+            "item_count) VALUES (?, ?, ?, 0, ?, 'pending', 1)",
+            [(f"ORDER-{order_id:06d}-LOADGN", 1, 1000, 1000) for order_id in range(orders)]
+        )
+        await conn.commit()
+    await db.load_reservations()
+    await db.load_bans()
+    return list(range(1, products + 1)), [f"ORDER-{order_id:06d}-LOADGN" for order_id in range(orders)]
+
+
+async def make_admins(user_ids: list):
+    for user_id in user_ids:
+        await db.get_or_create_user(user_id, f"load{user_id}", "Load")
+        await db.add_admin(user_id)
+
+
+# ==================== ПРОГОН ====================
+class ErrorCounter(logging.Handler):
+    """Исключения обработчиков ловит errors_handler из main.py и пишет в лог - считаем их здесь"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+def percentiles(samples: list) -> dict:
+    ordered = sorted(samples) or [0.0]
+
+    def at(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e3
+
+    return {"count": len(samples), "mean_ms": sum(ordered) / len(ordered) * 1e3,
+            "p50_ms": at(0.50), "p95_ms": at(0.95), "p99_ms": at(0.99), "max_ms": ordered[-1] * 1e3}
+
+
+async def run(args) -> dict:
+    import main  # диспетчер со всеми роутерами; импортируем после подмены DB_PATH
+
+    logging.disable(logging.WARNING)  # errors_handler по-прежнему виден ErrorCounter
+    errors = ErrorCounter()
+    logging.getLogger().addHandler(errors)
+
+    rnd = random.Random(args.seed)
+    products, orders = await prepare(args.products, args.orders, rnd)
+    db_metrics.configure(enabled=True, slow_query_ms=10 ** 6)
+    db_metrics.instrument(db)
+
+    session = StubSession()
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+
+    # План прогона: сценарии по весам, у каждого свой пользователь
+    names = rnd.choices(list(args.mix), weights=list(args.mix.values()), k=args.journeys)
+    plan = [(name, FIRST_USER_ID + index) for index, name in enumerate(names)]
+    await make_admins([user_id for name, user_id in plan if name == "admin"])
+    plan = [(name, JOURNEYS[name](user_id, rnd, products, orders)) for name, user_id in plan]
+
+    # Подготовка (админы, заполнение) в счётчики не входит
+    db_before = Counter({name: stats.latency.count for name, stats in db_metrics.functions.items()})
+    statements_before = sum(stats.calls for stats in db_metrics.statements.values())
+    session.calls.clear()
+    errors.count = 0
+
+    update_latency, step_latency, journey_latency = [], {}, {}
+    unhandled = Counter()
+    queue = iter(plan)
+
+    async def worker():
+        for name, steps in queue:
+            journey_started = time.perf_counter()
+            for step, update in steps:
+                started = time.perf_counter()
+                result = await main.dp.feed_update(bot, update)
+                elapsed = time.perf_counter() - started
+                update_latency.append(elapsed)
+                step_latency.setdefault(step, []).append(elapsed)
+                if result is UNHANDLED:
+                    unhandled[step] += 1
+            journey_latency.setdefault(name, []).append(time.perf_counter() - journey_started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(args.concurrency, len(plan)))))
+    wall = time.perf_counter() - started
+
+    updates = len(update_latency)
+    db_functions = Counter({name: stats.latency.count for name, stats in db_metrics.functions.items()}) - db_before
+    db_calls = sum(db_functions.values())
+    statements = sum(stats.calls for stats in db_metrics.statements.values()) - statements_before
+    api_calls = sum(session.calls.values())
+    await bot.session.close()
+    return {
+        "journeys": len(plan), "concurrency": args.concurrency, "updates": updates, "seconds": wall,
+        "updates_per_second": updates / wall if wall else 0.0,
+        "errors": errors.count, "unhandled": dict(unhandled),
+        "update": percentiles(update_latency),
+        "journeys_latency": {name: percentiles(samples) for name, samples in journey_latency.items()},
+        "steps": {step: percentiles(samples) for step, samples in step_latency.items()},
+        "db_calls_per_update": db_calls / updates if updates else 0.0,
+        "sql_per_update": statements / updates if updates else 0.0,
+        "api_calls_per_update": api_calls / updates if updates else 0.0,
+        "api_methods": dict(session.calls.most_common()),
+        "db_functions": dict(db_functions.most_common()),
+    }
+
+
+# ==================== ОТЧЁТ ====================
+def print_table(title: str, rows: dict):
+    print(f"\n{title:<22} {'кол-во':>8} {'сред, мс':>9} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'макс, мс':>9}")
+    for name, stats in rows.items():
+        print(f"{name:<22} {stats['count']:>8} {stats['mean_ms']:>9.2f} {stats['p50_ms']:>9.2f} "
+              f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}")
+
+
+def print_report(report: dict):
+    print(f"\nСценариев: {report['journeys']}, одновременно: {report['concurrency']}, "
+          f"апдейтов: {report['updates']} за {report['seconds']:.2f} с "
+          f"-> {report['updates_per_second']:.0f} апдейтов/с")
+    print(f"На апдейт: {report['db_calls_per_update']:.2f} вызовов database.py, "
+          f"{report['sql_per_update']:.2f} SQL, {report['api_calls_per_update']:.2f} вызовов Bot API")
+    if report["errors"] or report["unhandled"]:
+        print(f"⚠️ Ошибок в обработчиках: {report['errors']}, без обработчика: {report['unhandled']}")
+
+    print_table("апдейт", {"все": report["update"]})
+    print_table("сценарий", report["journeys_latency"])
+    print_table("шаг", dict(sorted(report["steps"].items(), key=lambda item: -item[1]["p50_ms"])))
+
+    print("\nBot API:", ", ".join(f"{name} {count}" for name, count in report["api_methods"].items()))
+    top = list(report["db_functions"].items())[:10]
+    print("database.py (топ-10 по вызовам):", ", ".join(f"{name} {count}" for name, count in top))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--journeys", type=int, default=500, help="сколько сценариев прогнать")
+    parser.add_argument("--concurrency", type=int, default=50, help="сценариев одновременно")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"веса сценариев (по умолчанию {DEFAULT_MIX})")
+    parser.add_argument("--products", type=int, default=300, help="товаров в каталоге")
+    parser.add_argument("--orders", type=int, default=1000, help="старых заказов в базе")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="записать отчёт в JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="loadgen_")
+    db.DB_PATH = os.path.join(workdir, "shop.db")
+    db.ARCHIVE_PATH = os.path.join(workdir, "shop_archive.db")
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"\nОтчёт: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Воспроизведение записанных апдейтов (RECORD_UPDATES_PATH) через диспетчер бота.
+
+Берёт копию БД (оригинал не трогается), при заданной соли (--salt = RECORD_SALT
+бота на момент записи) переводит в ней (и в callback_data старых записей) user_id
+в те же псевдонимы, что и в
+записи, и подаёт апдейты в dp.feed_update с заглушкой Bot API из loadgen.py.
+Темп - как в записи (--speed 1), в N раз быстрее (--speed N) или подряд без пауз (--speed 0).
+
+Отчёт: задержки апдейтов в записи и при воспроизведении, распределение по
+обработчикам (окно /latency), расхождения в вызовах Bot API (другие методы или
+их число - обработчик пошёл по другой ветке), ошибки и апдейты без обработчика.
+
+Запуск: python benchmarks/replay.py updates.jsonl.gz --db shop.db [--archive shop_archive.db]
+        [--salt ...] [--speed 1] [--limit N] [--json replay.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+
+os.environ.setdefault("BOT_TOKEN", "42:replay")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot  # noqa: E402
+from aiogram.dispatcher.event.bases import UNHANDLED  # noqa: E402
+from aiogram.types import Update  # noqa: E402
+
+import database as db  # noqa: E402
+from config import ADMIN_ID  # noqa: E402
+from loadgen import ErrorCounter, StubSession, percentiles  # noqa: E402
+from metrics import handler_latency  # noqa: E402
+from recorder import ApiCallsMiddleware, anonymize_callback_data, anonymize_id, read_records, traced  # noqa: E402
+
+DIFF_EXAMPLES = 10               # сколько видов расхождений показывать
+
+
+# ==================== КОПИЯ БД ====================
+def prepare_database(source: str, archive: str, workdir: str, salt: str):
+    """Копии основной и архивной БД; с солью - user_id заменяются на псевдонимы из записи"""
+    db.DB_PATH = os.path.join(workdir, "shop.db")
+    db.ARCHIVE_PATH = os.path.join(workdir, "shop_archive.db")
+    paths = [(source, db.DB_PATH)] + ([(archive, db.ARCHIVE_PATH)] if archive else [])
+    for original, copy in paths:
+        # backup, а не copyfile: копия согласована, даже если бот сейчас пишет в базу
+        with sqlite3.connect(original) as src, sqlite3.connect(copy) as dst:
+            src.backup(dst)
+        if salt:
+            remap_users(copy, salt)
+
+
+def remap_users(path: str, salt: str):
+    with sqlite3.connect(path) as conn:
+        conn.create_function("anon", 1, lambda user_id: anonymize_id(user_id, salt) if user_id else user_id,
+                             deterministic=True)
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        for table in tables:
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+            if "user_id" in columns:
+                conn.execute(f"UPDATE {table} SET user_id = anon(user_id)")
+
+
+def remap_callback_data(update: dict, salt: str) -> dict:
+    """user_id в callback_data - в те же псевдонимы, что и в копии БД. Новые записи уже
+    обезличены (повторно не переводятся), старые хранили настоящие id"""
+    callback = update.get("callback_query")
+    if callback and callback.get("data"):
+        callback["data"] = anonymize_callback_data(callback["data"], salt)
+    return update
+
+
+def remap_admin(salt: str):
+    """Главный админ из .env тоже под псевдонимом: модули держат свою копию ADMIN_ID"""
+    import handlers.admin
+    import handlers.checkout
+    import middlewares
+    for module in (middlewares, handlers.admin, handlers.checkout):
+        module.ADMIN_ID = anonymize_id(ADMIN_ID, salt)
+
+
+# ==================== ВОСПРОИЗВЕДЕНИЕ ====================
+async def replay(args) -> dict:
+    import main  # диспетчер со всеми роутерами
+
+    logging.disable(logging.WARNING)
+    errors = ErrorCounter()
+    logging.getLogger().addHandler(errors)
+
+    await db.init_db()
+    await db.load_reservations()
+    await db.load_bans()
+    if args.salt and ADMIN_ID:
+        remap_admin(args.salt)
+
+    session = StubSession()
+    session.middleware(ApiCallsMiddleware())
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    handler_latency.window = 10 ** 6  # для отчёта нужны все вызовы, а не последние 500
+
+    # Разбор апдейтов до замера: в записи его время тоже не учитывалось
+    records = []
+    for record in read_records(args.records):
+        update = remap_callback_data(record["update"], args.salt) if args.salt else record["update"]
+        records.append((record, Update.model_validate(update, context={"bot": bot})))
+        if args.limit and len(records) >= args.limit:
+            break
+    if not records:
+        raise SystemExit("В записи нет апдейтов")
+
+    replayed, unhandled, diffs = [], Counter(), Counter()
+    examples = {}
+
+    async def feed(record, update):
+        result, calls, elapsed = await traced(main.dp.feed_update(bot, update))
+        replayed.append(elapsed)
+        if result is UNHANDLED:
+            unhandled[update.event_type] += 1
+        if calls != record["calls"]:
+            key = (" ".join(record["calls"]) or "-", " ".join(calls) or "-")
+            diffs[key] += 1
+            examples.setdefault(key, describe(update))
+
+    first = records[0][0]["t"]
+    started = time.perf_counter()
+    tasks = []
+    for record, update in records:
+        if args.speed > 0:
+            # Как при поллинге: апдейт уходит в свою задачу в момент прихода, не дожидаясь предыдущих
+            delay = (record["t"] - first) / args.speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(feed(record, update)))
+        else:
+            await feed(record, update)
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - started
+    await bot.session.close()
+
+    return {
+        "updates": len(records), "speed": args.speed, "seconds": wall,
+        "recorded_seconds": records[-1][0]["t"] - first,
+        "updates_per_second": len(records) / wall if wall else 0.0,
+        "errors": errors.count, "unhandled": dict(unhandled),
+        "recorded": percentiles([record["ms"] / 1000 for record, _ in records]),
+        "replayed": percentiles(replayed),
+        "handlers": handler_latency.summary(),
+        "api_methods": dict(session.calls.most_common()),
+        "diverged": sum(diffs.values()),
+        "diffs": [{"recorded": recorded, "replayed": now, "count": count, "example": examples[(recorded, now)]}
+                  for (recorded, now), count in diffs.most_common()],
+    }
+
+
+def describe(update: Update) -> str:
+    if update.callback_query:
+        return f"callback {update.callback_query.data}"
+    if update.message:
+        return f"message {update.message.text or update.message.content_type}"
+    return update.event_type
+
+
+# ==================== ОТЧЁТ ====================
+def print_report(report: dict):
+    print(f"\nАпдейтов: {report['updates']} за {report['seconds']:.2f} с (в записи {report['recorded_seconds']:.0f} с, "
+          f"темп x{report['speed']:g}) -> {report['updates_per_second']:.0f} апдейтов/с")
+    if report["errors"] or report["unhandled"]:
+        print(f"⚠️ Ошибок в обработчиках: {report['errors']}, без обработчика: {report['unhandled']}")
+
+    print(f"\n{'апдейт':<12} {'сред, мс':>9} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'макс, мс':>9}")
+    for name in ("recorded", "replayed"):
+        stats = report[name]
+        print(f"{name:<12} {stats['mean_ms']:>9.2f} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+              f"{stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}")
+
+    print(f"\n{'обработчик':<32} {'вызовов':>8} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'макс, мс':>9}")
+    for row in report["handlers"]:
+        print(f"{row['name']:<32} {row['calls']:>8} {row['p50'] * 1e3:>9.2f} {row['p95'] * 1e3:>9.2f} "
+              f"{row['p99'] * 1e3:>9.2f} {row['max'] * 1e3:>9.2f}")
+
+    print(f"\nРасхождений в вызовах Bot API: {report['diverged']} из {report['updates']}")
+    for diff in report["diffs"][:DIFF_EXAMPLES]:
+        print(f"  {diff['count']:>6}  было: {diff['recorded']}\n          стало: {diff['replayed']}\n"
+              f"          пример: {diff['example']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("records", help="файл записи (gzip JSONL)")
+    parser.add_argument("--db", required=True, help="БД бота на момент записи (копируется)")
+    parser.add_argument("--archive", help="архивная БД заказов (копируется)")
+    parser.add_argument("--salt", default=os.getenv("RECORD_SALT", ""), help="RECORD_SALT бота при записи")
+    parser.add_argument("--speed", type=float, default=1.0, help="темп: 1 - как в записи, N - быстрее, 0 - без пауз")
+    parser.add_argument("--limit", type=int, default=0, help="воспроизвести только первые N апдейтов")
+    parser.add_argument("--json", help="записать отчёт в JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="replay_")
+    try:
+        prepare_database(args.db, args.archive, workdir, args.salt)
+        report = asyncio.run(replay(args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"\nОтчёт: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
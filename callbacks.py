@@ -0,0 +1,228 @@
+from enum import Enum
+from typing import Any, Callable, Dict, Optional, Sequence, Type, Union
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+
+NOOP = "noop"
+
+
+# ==================== ДЕЙСТВИЯ ====================
+# Однобуквенные коды держат callback_data далеко от лимита Telegram в 64 байта
+
+class ProductAction(str, Enum):
+    view = "v"              # карточка товара для покупателя
+    price = "p"             # админ: выбор товара для смены цены
+    delete = "d"            # админ: запрос подтверждения удаления
+    delete_confirm = "dd"   # админ: удаление подтверждено
+    delete_cancel = "dx"    # админ: удаление отменено
+    delete_menu = "dl"      # админ: список товаров для удаления
+
+
+class CartAction(str, Enum):
+    add = "a"
+    dec = "d"
+    remove = "r"
+    clear = "c"
+
+
+class OrderAction(str, Enum):
+    checkout = "co"         # предпросмотр заказа
+    pay = "p"               # создание заказа
+    view = "v"              # админ: просмотр заказа
+    confirm = "ok"          # админ: заказ оплачен
+    cancel = "x"            # админ: отмена заказа
+    delete = "d"            # админ: запрос подтверждения удаления
+    delete_confirm = "dd"   # админ: удаление подтверждено
+    search = "s"            # админ: запрос текста для поиска заказа
+    search_more = "sm"      # админ: следующая страница поиска (курсор в FSM)
+
+
+class StockAction(str, Enum):
+    view = "v"
+    add = "a"
+    dec = "d"
+    menu = "l"
+
+
+class BonusAction(str, Enum):
+    use = "u"               # покупатель: использовать скидку (value = 1/0)
+    apply = "a"             # покупатель: подсказка о применении скидки
+    add = "sa"              # админ: начисление скидки (value = user_id)
+    remove = "sr"           # админ: удаление скидок (value = user_id)
+
+
+class UserPickAction(str, Enum):
+    pick = "p"              # выбор пользователя (user_id)
+    more = "m"              # следующая страница (запрос и курсор в FSM)
+    search = "s"            # запрос текста для поиска
+    reset = "r"             # сброс поиска, первая страница
+
+
+class UserPicker(str, Enum):
+    bonus = "b"             # скидки пользователя
+    admin_add = "aa"        # назначить админом
+    admin_remove = "ar"     # снять права админа
+    ban = "ba"              # добавить в ЧС
+    unban = "ub"            # убрать из ЧС
+
+
+class ProductPickAction(str, Enum):
+    more = "m"              # следующая страница (запрос и курсор в FSM)
+    search = "s"            # запрос текста для поиска
+    view = "v"              # фильтр остатка, первая страница без поиска
+
+
+class ProductPicker(str, Enum):
+    price = "p"             # смена цены
+    delete = "d"            # удаление
+    stock = "s"             # пополнение склада
+
+
+class ProductView(str, Enum):
+    all = "all"
+    low = "low"             # мало на складе
+    out = "out"             # нет в наличии
+
+
+class MenuTarget(str, Enum):
+    main = "m"
+    cart = "c"
+    admin = "a"
+    admin_bonuses = "b"
+    admin_orders = "o"
+    search = "s"
+
+
+# ==================== ФАБРИКИ CALLBACK DATA ====================
+
+class ProductCallback(CallbackData, prefix="p"):
+    action: ProductAction
+    product_id: int = 0
+
+
+class CartCallback(CallbackData, prefix="c"):
+    action: CartAction
+    product_id: int = 0
+
+
+class OrderCallback(CallbackData, prefix="o"):
+    action: OrderAction
+    order_number: Optional[str] = None
+
+
+class StockCallback(CallbackData, prefix="s"):
+    action: StockAction
+    product_id: int = 0
+
+
+class BonusCallback(CallbackData, prefix="b"):
+    action: BonusAction
+    value: int = 0
+
+
+class UserPickCallback(CallbackData, prefix="u"):
+    action: UserPickAction
+    picker: UserPicker
+    user_id: int = 0
+
+
+class ProductPickCallback(CallbackData, prefix="k"):
+    action: ProductPickAction
+    picker: ProductPicker
+    view: ProductView = ProductView.all
+
+
+class MaintenanceCallback(CallbackData, prefix="m"):
+    enable: bool
+
+
+class CatalogCallback(CallbackData, prefix="g"):
+    page: int = 0
+
+
+class MenuCallback(CallbackData, prefix="n"):
+    target: MenuTarget
+
+
+# ==================== ПРЕФИКСНОЕ ДЕРЕВО ====================
+
+class _Route:
+    __slots__ = ("handler", "factory")
+
+    def __init__(self, handler: CallableObject, factory: Optional[Type[CallbackData]]):
+        self.handler = handler
+        self.factory = factory
+
+
+class _Node:
+    __slots__ = ("children", "route")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.route: Optional[_Route] = None
+
+
+class CallbackTrie:
+    """Префиксное дерево маршрутов по сегментам callback_data"""
+
+    def __init__(self, sep: str = ":"):
+        self.sep = sep
+        self._root = _Node()
+
+    def add(self, path: Sequence[str], route: _Route):
+        node = self._root
+        for part in path:
+            node = node.children.setdefault(part, _Node())
+        if node.route is not None:
+            raise ValueError(f"Маршрут {self.sep.join(path)!r} уже зарегистрирован")
+        node.route = route
+
+    def resolve(self, data: str) -> Optional[_Route]:
+        """Самый длинный зарегистрированный префикс: O(глубины), а не O(обработчиков)"""
+        node = self._root
+        found = node.route
+        for part in data.split(self.sep):
+            node = node.children.get(part)
+            if node is None:
+                break
+            if node.route is not None:
+                found = node.route
+        return found
+
+
+def route_path(target: Union[str, Type[CallbackData]], *actions: Any) -> Sequence[str]:
+    """Путь в дереве: префикс фабрики + коды действий (или строка как есть)"""
+    if isinstance(target, str):
+        return target.split(":")
+    return [target.__prefix__, *(a.value if isinstance(a, Enum) else str(a) for a in actions)]
+
+
+class CallbackRouter:
+    """Один обработчик callback_query на роутер, маршрутизация по префиксному дереву"""
+
+    def __init__(self, router: Router):
+        self.trie = CallbackTrie()
+        router.callback_query.register(self._dispatch)
+
+    def on(self, target: Union[str, Type[CallbackData]], *actions: Any) -> Callable:
+        """Регистрация обработчика: @callbacks.on(CartCallback, CartAction.add)"""
+        factory = None if isinstance(target, str) else target
+
+        def decorator(handler: Callable) -> Callable:
+            self.trie.add(route_path(target, *actions), _Route(CallableObject(handler), factory))
+            return handler
+
+        return decorator
+
+    async def _dispatch(self, callback: CallbackQuery, **kwargs: Any) -> Any:
+        route = self.trie.resolve(callback.data or "")
+        if route is None:
+            # Пусть попробуют другие роутеры
+            raise SkipHandler()
+        if route.factory is not None:
+            kwargs["callback_data"] = route.factory.unpack(callback.data)
+        return await route.handler.call(callback, **kwargs)
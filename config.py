@@ -0,0 +1,36 @@
+import os
+
+from dotenv import load_dotenv
+
+#Загрузка токена из .env
+load_dotenv()
+
+# Настройки
+BOT_TOKEN = os.getenv("BOT_TOKEN", "YOUR_BOT_TOKEN_HERE")
+ADMIN_ID = int(os.getenv("ADMIN_ID", 0))  # Главный админ
+CHANNEL_LINK = "https://t.me/+C8EqPbH5Dok5NWQy"
+PAYMENT_PHONE = "+79122127547"
+PAYMENT_BANK = "Озонбанк"
+SUPPORT_USERNAME = "@romasha_1"
+RESERVATION_TTL = int(os.getenv("RESERVATION_TTL", 15 * 60))  # Резерв товара в корзине, сек
+RESERVATION_SWEEP_INTERVAL = int(os.getenv("RESERVATION_SWEEP_INTERVAL", 30))
+ORDER_ARCHIVE_DAYS = int(os.getenv("ORDER_ARCHIVE_DAYS", 180))  # Завершённые заказы старше - в архив
+ORDER_ARCHIVE_INTERVAL = int(os.getenv("ORDER_ARCHIVE_INTERVAL", 6 * 3600))  # сек, 0 - не архивировать
+DB_MAINTENANCE_CHECK_INTERVAL = int(os.getenv("DB_MAINTENANCE_CHECK_INTERVAL", 60))  # сек, 0 - без обслуживания
+DB_MAINTENANCE_QUIET_HOURS = tuple(
+    int(hour) for hour in os.getenv("DB_MAINTENANCE_QUIET_HOURS", "3-6").split("-")
+)  # Окно для ANALYZE и проверки целостности, часы [с, до)
+DB_METRICS = os.getenv("DB_METRICS", "1") == "1"  # Замеры функций БД и журнал медленных запросов
+DB_SLOW_QUERY_MS = int(os.getenv("DB_SLOW_QUERY_MS", 100))  # Запросы дольше - в журнал с EXPLAIN QUERY PLAN
+HANDLER_SLOW_MS = int(os.getenv("HANDLER_SLOW_MS", 250))  # Обработчик дольше (и дольше 3×p95) - в журнал
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))  # HTTP /metrics для Prometheus, 0 - выключено
+RECORD_UPDATES_PATH = os.getenv("RECORD_UPDATES_PATH", "")  # gzip JSONL обезличенных апдейтов, пусто - не писать
+RECORD_SALT = os.getenv("RECORD_SALT", "")  # Соль псевдонимов id: та же соль нужна replay.py для копии БД
+RECORD_MAX_UPDATES = int(os.getenv("RECORD_MAX_UPDATES", 100_000))
+THROTTLE_ENABLED = os.getenv("THROTTLE_ENABLED", "1") == "1"  # Антифлуд: лимит апдейтов на пользователя
+THROTTLE_LIMITS = {
+    kind.strip(): tuple(float(value) for value in limit.split("/"))
+    for kind, _, limit in (item.partition("=") for item in os.getenv("THROTTLE_LIMITS", "").split(",") if item)
+}  # "cart=4/12,checkout=0.5/3": токенов в секунду / пачка для browse, cart, checkout, admin
+THROTTLE_MAX_BUCKETS = int(os.getenv("THROTTLE_MAX_BUCKETS", 50_000))
@@ -1,14 +1,86 @@
 import aiosqlite
+import asyncio
 import logging  # ✅ Добавьте!
 import os
+import re
+import time
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import AsyncIterator, Callable, Optional, List, Dict, Set, Tuple
+from urllib.parse import quote
+
+from metrics import db_metrics
+from records import Bonus, CartLine, Order, OrderItem, Product, User
+from rendering import ORDER_STATUS_PREFIX, render_order_summary
+from reservations import ledger
+
 DB_PATH = "shop_bot.db"
+STREAM_BATCH = 500               # строк на один SELECT в потоковых выборках iter_*
+
+
+def connect(path: Optional[str] = None) -> aiosqlite.Connection:
+    """Соединение с БД (по умолчанию основной); при DB_METRICS запросы замеряются"""
+    return aiosqlite.connect(path or DB_PATH, **db_metrics.connect_kwargs())
+
+
+async def _fetch_records(db, record, sql: str, parameters=()) -> list:
+    """Выборка записями record (Product, Order, ...) без смены row_factory соединения"""
+    cursor = await db.execute(sql, parameters)
+    cursor.row_factory = record.factory
+    rows = await cursor.fetchall()
+    await cursor.close()
+    return rows
+
+
+def connect_reader(path: Optional[str] = None) -> aiosqlite.Connection:
+    """Отдельное соединение только на чтение (mode=ro) для потоковых выборок"""
+    uri = f"file:{quote(os.path.abspath(path or DB_PATH))}?mode=ro"
+    return aiosqlite.connect(uri, uri=True, **db_metrics.connect_kwargs())
+
+
+async def _stream(record, sql: str, keyset: str, key: Callable, parameters: tuple = (),
+                  batch: int = STREAM_BATCH) -> AsyncIterator:
+    """Строки запроса записями record порциями по batch (keyset-пагинация).
+
+    sql содержит {keyset} и заканчивается на LIMIT ?: первая порция читается с условием 1,
+    следующие - с keyset и параметрами key(последняя строка). Курсор закрывается до отдачи
+    строк: журнал у базы не WAL, и открытый SELECT держал бы блокировку чтения, пока
+    потребитель (рассылка, выгрузка) обрабатывает строки, - записи бота ждали бы его.
+    Брошенный на середине генератор лучше закрывать явно (contextlib.aclosing)."""
+    condition, after = "1", ()
+    async with connect_reader() as db:
+        while True:
+            cursor = await db.execute(sql.format(keyset=condition), parameters + after + (batch,))
+            try:
+                cursor.row_factory = record.factory
+                rows = await cursor.fetchmany(batch)
+            finally:
+                await cursor.close()
+            for row in rows:
+                yield row
+            if len(rows) < batch:
+                return
+            condition, after = keyset, key(rows[-1])
+
+
+async def _add_missing_columns(db, table: str, columns: Dict[str, str]):
+    """Миграция: добавляет колонки, которых ещё нет в существующей таблице"""
+    cursor = await db.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in await cursor.fetchall()}
+    added = []
+    for name, decl in columns.items():
+        if name not in existing:
+            await db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+            added.append(name)
+    return added
 
 
 async def init_db():
     """Инициализация базы данных"""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
+        # ✅ Новый файл сразу создаётся с auto_vacuum = INCREMENTAL (для существующего
+        # прагма ничего не меняет, его переводит maintenance.py одним VACUUM)
+        await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
         # Таблица пользователей
         await db.execute("""
                          CREATE TABLE IF NOT EXISTS users
@@ -266,112 +338,480 @@ async def init_db():
             )
         """)
 
+        # ✅ Резервы товаров в корзинах (снимаются по истечении TTL)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS reservations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                UNIQUE (user_id, product_id)
+            )
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_reservations_expires ON reservations (expires_at)"
+        )
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_reservations_product ON reservations (product_id, expires_at)"
+        )
+
+        # ✅ Версия карточки товара: растёт при смене названия/описания/цены (кэш rendering.py)
+        await _add_missing_columns(db, "products", {"version": "INTEGER NOT NULL DEFAULT 1"})
+
+        # ✅ Индексы для поиска заказов в админке
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_orders_user ON orders (user_id, id)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users (username COLLATE NOCASE)")
+
+        # ✅ Пикеры пользователей в админке: поиск по началу имени и частичные индексы
+        # админов и ЧС. name_key - имя в casefold: NOCASE в SQLite не знает кириллицу
+        if await _add_missing_columns(db, "users", {"name_key": "TEXT"}):
+            rows = await db.execute_fetchall("SELECT user_id, first_name FROM users")
+            await db.executemany(
+                "UPDATE users SET name_key = ? WHERE user_id = ?",
+                [(name_key(first_name), user_id) for user_id, first_name in rows]
+            )
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_users_name_key ON users (name_key)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_users_admins ON users (user_id) WHERE is_admin = 1")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_users_banned ON users (user_id) WHERE is_banned = 1")
+
+        # ✅ Пикеры товаров в админке: страницы по name, частичные индексы "мало"/"нет в наличии"
+        await db.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_products_low_stock_{LOW_STOCK} ON products (name) "
+            f"WHERE {PRODUCT_VIEWS['low']}"
+        )
+        await db.execute(f"CREATE INDEX IF NOT EXISTS idx_products_out_of_stock ON products (name) "
+                         f"WHERE {PRODUCT_VIEWS['out']}")
+
+        # ✅ Полнотекстовый индекс по названиям товаров в заказах
+        cursor = await db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'order_items_fts'"
+        )
+        order_fts_existed = await cursor.fetchone() is not None
+        await db.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS order_items_fts USING fts5(
+                product_name,
+                content = 'order_items', content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS order_items_fts_ai AFTER INSERT ON order_items BEGIN
+                INSERT INTO order_items_fts (rowid, product_name) VALUES (new.id, new.product_name);
+            END
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS order_items_fts_ad AFTER DELETE ON order_items BEGIN
+                INSERT INTO order_items_fts (order_items_fts, rowid, product_name)
+                VALUES ('delete', old.id, old.product_name);
+            END
+        """)
+        if not order_fts_existed:
+            await db.execute("INSERT INTO order_items_fts (order_items_fts) VALUES ('rebuild')")
+
+        # ✅ Дневные агрегаты продаж (обновляются в транзакциях заказов)
+        cursor = await db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sales_daily'"
+        )
+        rollups_existed = await cursor.fetchone() is not None
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS sales_daily (
+                day TEXT PRIMARY KEY,
+                revenue INTEGER NOT NULL DEFAULT 0,
+                orders INTEGER NOT NULL DEFAULT 0,
+                discount INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS sales_daily_products (
+                day TEXT NOT NULL,
+                product_name TEXT NOT NULL,
+                units INTEGER NOT NULL DEFAULT 0,
+                revenue INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, product_name)
+            ) WITHOUT ROWID
+        """)
+
+        # ✅ Готовая карточка заказа для админки (пишется при оформлении)
+        await _add_missing_columns(db, "orders", {
+            "summary": "TEXT",
+            "item_count": "INTEGER NOT NULL DEFAULT 0",
+        })
+
+        # ✅ Полнотекстовый поиск по товарам (FTS5, синхронизируется триггерами)
+        cursor = await db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+        )
+        fts_existed = await cursor.fetchone() is not None
+        await db.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                name, description,
+                content = 'products', content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+                INSERT INTO products_fts (rowid, name, description)
+                VALUES (new.id, new.name, new.description);
+            END
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+                INSERT INTO products_fts (products_fts, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+            END
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products BEGIN
+                INSERT INTO products_fts (products_fts, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+                INSERT INTO products_fts (rowid, name, description)
+                VALUES (new.id, new.name, new.description);
+            END
+        """)
+        if not fts_existed:
+            await db.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+        if not rollups_existed:
+            # Первый запуск с агрегатами: один раз собираем их из уже оформленных заказов
+            cursor = await db.execute("SELECT id FROM orders WHERE status != 'cancelled'")
+            for (order_id,) in await cursor.fetchall():
+                await _rollup_order(db, order_id, 1)
+
         await db.commit()
     print("✅ База данных инициализирована")
 
 
 # ==================== USERS ====================
+def name_key(first_name: Optional[str]) -> Optional[str]:
+    """Ключ поиска по имени (users.name_key)"""
+    return first_name.casefold() if first_name else None
+
+
 async def get_or_create_user(user_id: int, username: str, first_name: str):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         await db.execute("""
                          INSERT
-                         OR IGNORE INTO users (user_id, username, first_name) 
-            VALUES (?, ?, ?)
-                         """, (user_id, username, first_name))
+                         OR IGNORE INTO users (user_id, username, first_name, name_key) 
+            VALUES (?, ?, ?, ?)
+                         """, (user_id, username, first_name, name_key(first_name)))
         await db.commit()
 
 
+# ==================== CACHED FLAGS ====================
+# Флаги доступа проверяются на каждом апдейте, поэтому держим их в памяти.
+# Админы и ЧС - множества id целиком (их единицы), меняются только через add_/remove_admin и ban_/unban_user
+_admin_ids: Optional[Set[int]] = None
+_banned_ids: Optional[Set[int]] = None
+_maintenance_mode: Optional[bool] = None
+flag_cache_stats = {"hits": 0, "misses": 0}
+
+
 async def is_admin(user_id: int) -> bool:
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute("SELECT is_admin FROM users WHERE user_id = ?", (user_id,))
-        result = await cursor.fetchone()
-        return result and result[0] == 1
+    global _admin_ids
+    if _admin_ids is None:
+        flag_cache_stats["misses"] += 1
+        async with connect() as db:
+            cursor = await db.execute("SELECT user_id FROM users WHERE is_admin = 1")
+            _admin_ids = {row[0] for row in await cursor.fetchall()}
+    else:
+        flag_cache_stats["hits"] += 1
+    return user_id in _admin_ids
+
+
+async def load_bans():
+    """ЧС в память (при старте бота): id по частичному индексу idx_users_banned"""
+    global _banned_ids
+    async with connect() as db:
+        cursor = await db.execute("SELECT user_id FROM users WHERE is_banned = 1")
+        _banned_ids = {row[0] for row in await cursor.fetchall()}
+    logging.info(f"🚫 ЧС загружен: {len(_banned_ids)} пользователей")
 
 
 async def is_banned(user_id: int) -> bool:
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute("SELECT is_banned FROM users WHERE user_id = ?", (user_id,))
-        result = await cursor.fetchone()
-        return result and result[0] == 1
+    """Проверка по множеству в памяти; БД читается только если ЧС ещё не загружен"""
+    if _banned_ids is None:
+        flag_cache_stats["misses"] += 1
+        await load_bans()
+    else:
+        flag_cache_stats["hits"] += 1
+    return user_id in _banned_ids
 
 
 async def add_admin(user_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         await db.execute("UPDATE users SET is_admin = 1 WHERE user_id = ?", (user_id,))
         await db.commit()
+    if _admin_ids is not None:
+        _admin_ids.add(user_id)
 
 
 async def remove_admin(user_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         await db.execute("UPDATE users SET is_admin = 0 WHERE user_id = ?", (user_id,))
         await db.commit()
+    if _admin_ids is not None:
+        _admin_ids.discard(user_id)
 
 
 async def ban_user(user_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         await db.execute("UPDATE users SET is_banned = 1 WHERE user_id = ?", (user_id,))
         await db.commit()
+    if _banned_ids is not None:
+        _banned_ids.add(user_id)
 
 
 async def unban_user(user_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         await db.execute("UPDATE users SET is_banned = 0 WHERE user_id = ?", (user_id,))
         await db.commit()
+    if _banned_ids is not None:
+        _banned_ids.discard(user_id)
+
+
+# ==================== USER PICKERS ====================
+USER_PAGE = 8
+# Выборки пикеров; admins/banned идут по частичным индексам idx_users_admins/idx_users_banned
+USER_FILTERS = {
+    "all": "1",
+    "admins": "is_admin = 1",
+    "not_admins": "is_admin = 0",
+    "banned": "is_banned = 1",
+    "not_banned": "is_banned = 0",
+}
+_USER_COLUMNS = "user_id, username, first_name, name_key"
+
+
+def _prefix_range(prefix: str) -> Tuple[str, str]:
+    """Диапазон [prefix, upper) для поиска по началу строки через индекс"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+async def search_users(kind: str = "all", query: str = "", cursor=None,
+                       limit: int = USER_PAGE) -> Tuple[List[User], Optional[list]]:
+    """Страница пикера пользователей (keyset): без запроса - по user_id,
+    число - точный user_id, иначе - по началу @username, затем по началу имени"""
+    where = USER_FILTERS[kind]
+    query = query.strip()
+
+    async with connect() as db:
+        db.row_factory = User.factory
+
+        if not query:
+            rows = await db.execute_fetchall(f"""
+                SELECT {_USER_COLUMNS} FROM users
+                WHERE {where} AND user_id > ?
+                ORDER BY user_id
+                LIMIT ?
+            """, (cursor or 0, limit + 1))
+            users = list(rows)
+            next_cursor = users[limit - 1].user_id if len(users) > limit else None
+            return users[:limit], next_cursor
+
+        if query.isdigit():
+            rows = await db.execute_fetchall(
+                f"SELECT {_USER_COLUMNS} FROM users WHERE {where} AND user_id = ?", (int(query),)
+            )
+            return list(rows), None
+
+        # Две фазы с общим курсором [фаза, ключ, user_id]: сначала совпадения
+        # по username, затем по имени (кроме уже показанных по username)
+        username_low, username_high = _prefix_range(query.lstrip("@").lower() or "@")
+        phases = ["username"] if query.startswith("@") else ["username", "name"]
+        if cursor:
+            phases = phases[phases.index(cursor[0]):]
+
+        found = []
+        for phase in phases:
+            key_after, id_after = cursor[1:] if cursor and cursor[0] == phase else (None, 0)
+            wanted = limit + 1 - len(found)
+            if phase == "username":
+                rows = await db.execute_fetchall(f"""
+                    SELECT {_USER_COLUMNS} FROM users
+                    WHERE {where}
+                      AND username >= ? COLLATE NOCASE AND username < ? COLLATE NOCASE
+                      AND (username > ? COLLATE NOCASE OR user_id > ?)
+                    ORDER BY username COLLATE NOCASE, user_id
+                    LIMIT ?
+                """, (key_after or username_low, username_high, key_after or "", id_after, wanted))
+            else:
+                name_low, name_high = _prefix_range(query.casefold())
+                rows = await db.execute_fetchall(f"""
+                    SELECT {_USER_COLUMNS} FROM users
+                    WHERE {where}
+                      AND name_key >= ? AND name_key < ?
+                      AND (name_key > ? OR user_id > ?)
+                      AND NOT (IFNULL(username, '') >= ? COLLATE NOCASE
+                               AND IFNULL(username, '') < ? COLLATE NOCASE)
+                    ORDER BY name_key, user_id
+                    LIMIT ?
+                """, (key_after or name_low, name_high, key_after or "", id_after,
+                      username_low, username_high, wanted))
+            found += [(phase, row) for row in rows]
+            if len(found) > limit:
+                break
+
+    next_cursor = None
+    if len(found) > limit:
+        phase, last = found[limit - 1]
+        next_cursor = [phase, last.username if phase == "username" else last.name_key, last.user_id]
+    return [user for _, user in found[:limit]], next_cursor
+
+
+def iter_users(kind: str = "all", batch: int = STREAM_BATCH) -> AsyncIterator[User]:
+    """Все пользователи выборки kind по user_id, без чтения таблицы в память"""
+    return _stream(User, f"""
+        SELECT {_USER_COLUMNS}, is_admin, is_banned, created_at FROM users
+        WHERE {USER_FILTERS[kind]} AND {{keyset}}
+        ORDER BY user_id
+        LIMIT ?
+    """, "user_id > ?", lambda user: (user.user_id,), batch=batch)
+
+
+def iter_admins(batch: int = STREAM_BATCH) -> AsyncIterator[User]:
+    return iter_users("admins", batch)
+
+
+def iter_banned(batch: int = STREAM_BATCH) -> AsyncIterator[User]:
+    return iter_users("banned", batch)
+
+
+async def get_all_users() -> List[User]:
+    """Весь список в памяти; для больших таблиц - iter_users"""
+    return [user async for user in iter_users()]
 
 
-async def get_all_admins() -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT user_id, username, first_name FROM users WHERE is_admin = 1")
-        return [dict(row) for row in await cursor.fetchall()]
+async def get_all_admins() -> List[User]:
+    return [user async for user in iter_admins()]
 
 
-async def get_all_users() -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT user_id, username, first_name FROM users")
-        return [dict(row) for row in await cursor.fetchall()]
+async def get_banned_users() -> List[User]:
+    return [user async for user in iter_banned()]
 
 
-async def get_banned_users() -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT user_id, username, first_name FROM users WHERE is_banned = 1")
-        return [dict(row) for row in await cursor.fetchall()]
+async def count_users(kind: str) -> int:
+    async with connect() as db:
+        cursor = await db.execute(f"SELECT COUNT(*) FROM users WHERE {USER_FILTERS[kind]}")
+        return (await cursor.fetchone())[0]
 
 
 # ==================== PRODUCTS ====================
 async def add_product(name: str, description: str, price: int, stock: int) -> bool:
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             await db.execute("""
                              INSERT INTO products (name, description, price, stock)
                              VALUES (?, ?, ?, ?)
                              """, (name, description, price, stock))
             await db.commit()
+        bump_catalog_version()
         return True
     except aiosqlite.IntegrityError:
         return False
 
 
-async def add_stock(product_id: int, quantity: int):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("""
-                         UPDATE products
-                         SET stock = stock + ?
-                         WHERE id = ?
-                         """, (quantity, product_id))
+async def upsert_products(products: List[Tuple[str, Optional[str], int, int]]) -> Tuple[int, int]:
+    """Пакетная загрузка (name, description, price, stock) одной транзакцией.
+    Существующие товары (по name) получают новые цену и остаток, описание - если передано.
+    Возвращает (добавлено, изменено); совпавшие строки не переписываются.
+    Версию каталога меняет вызывающий - один раз на весь импорт"""
+    names = [product[0] for product in products]
+    async with connect() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        rows = await db.execute_fetchall(
+            f"SELECT name FROM products WHERE name IN ({','.join('?' * len(names))})", names
+        )
+        existing = {row[0] for row in rows}
+
+        # INSERT ... ON CONFLICT тратил бы значение AUTOINCREMENT на каждую существующую строку
+        cursor = await db.executemany("""
+            UPDATE products
+            SET price       = :price,
+                stock       = :stock,
+                description = COALESCE(:description, description),
+                version     = version + (price != :price OR description IS NOT COALESCE(:description, description))
+            WHERE name = :name
+              AND (price != :price OR stock != :stock OR description IS NOT COALESCE(:description, description))
+        """, [
+            {"name": name, "description": description, "price": price, "stock": stock}
+            for name, description, price, stock in products if name in existing
+        ])
+        updated = cursor.rowcount
+        new = [product for product in products if product[0] not in existing]
+        await db.executemany("""
+            INSERT INTO products (name, description, price, stock)
+            VALUES (?, ?, ?, ?)
+        """, new)
         await db.commit()
+    return len(new), updated
+
+
+async def adjust_stock(product_id: int, delta: int) -> Optional[Product]:
+    """Изменение остатка на delta одним условным UPDATE.
+    Возвращает товар с новым остатком; None - товара нет или остаток ушёл бы в минус"""
+    async with connect() as db:
+        db.row_factory = Product.factory
+        cursor = await db.execute("""
+            UPDATE products
+            SET stock = stock + ?
+            WHERE id = ? AND stock + ? >= 0
+            RETURNING *
+        """, (delta, product_id, delta))
+        row = await cursor.fetchone()
+        await cursor.close()
+        await db.commit()
+    return row
+
+
+async def set_stock(product_id: int, stock: int) -> Optional[Product]:
+    """Точный остаток (после инвентаризации); None - товара нет"""
+    async with connect() as db:
+        db.row_factory = Product.factory
+        cursor = await db.execute("UPDATE products SET stock = ? WHERE id = ? RETURNING *", (stock, product_id))
+        row = await cursor.fetchone()
+        await cursor.close()
+        await db.commit()
+    return row
+
+
+async def adjust_stock_batch(changes: List[Tuple[str, bool, int]]) -> List[Optional[int]]:
+    """Пакетное изменение остатков одной транзакцией.
+    changes: (название, задать точно, число) - при False число прибавляется.
+    Для каждой строки - новый остаток или None (товара нет / ушёл бы в минус)"""
+    results = []
+    async with connect() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        for name, exact, value in changes:
+            if exact:
+                cursor = await db.execute(
+                    "UPDATE products SET stock = ? WHERE name = ? RETURNING stock", (value, name)
+                )
+            else:
+                cursor = await db.execute(
+                    "UPDATE products SET stock = stock + ? WHERE name = ? AND stock + ? >= 0 RETURNING stock",
+                    (value, name, value)
+                )
+            row = await cursor.fetchone()
+            await cursor.close()
+            results.append(row[0] if row else None)
+        await db.commit()
+    return results
 
 
 #async def remove_product(product_id: int):
-    #async with aiosqlite.connect(DB_PATH) as db:
+    #async with connect() as db:
         #await db.execute("DELETE FROM products WHERE id = ?", (product_id,))
         #await db.commit()
 
 async def remove_product(product_id: int):
     """Удаление товара"""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         # Сначала удаляем товар из корзин пользователей
         await db.execute("DELETE FROM cart WHERE product_id = ?", (product_id,))
 
@@ -382,41 +822,47 @@ async def remove_product(product_id: int):
         # Примечание: order_items хранит product_name, а не product_id
         # Поэтому исторические заказы сохранят информацию о товаре
 
+        await db.execute("DELETE FROM reservations WHERE product_id = ?", (product_id,))
         await db.execute("DELETE FROM products WHERE id = ?", (product_id,))
         await db.commit()
+    ledger.drop_product(product_id)
+    bump_catalog_version()
 
 
-async def update_price(product_id: int, new_price: int):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("UPDATE products SET price = ? WHERE id = ?", (new_price, product_id))
-        await db.commit()
+def iter_products(batch: int = STREAM_BATCH) -> AsyncIterator[Product]:
+    """Все товары по названию (name уникально - оно и ключ порций)"""
+    return _stream(Product, "SELECT * FROM products WHERE {keyset} ORDER BY name LIMIT ?",
+                   "name > ?", lambda product: (product.name,), batch=batch)
+
 
+async def get_all_products() -> List[Product]:
+    return [product async for product in iter_products()]
 
-async def get_all_products() -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM products ORDER BY name")
-        return [dict(row) for row in await cursor.fetchall()]
 
+async def get_catalog_products() -> List[Product]:
+    """Товары для каталога: остаток показывается за вычетом активных резервов"""
+    products = await get_all_products()
+    for product in products:
+        product.stock = ledger.available(product.id, product.stock)
+    return products
 
-async def get_product(product_id: int) -> Optional[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+
+async def get_product(product_id: int) -> Optional[Product]:
+    async with connect() as db:
+        db.row_factory = Product.factory
         cursor = await db.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-        result = await cursor.fetchone()
-        return dict(result) if result else None
+        return await cursor.fetchone()
 
 
-async def get_product_by_name(name: str) -> Optional[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+async def get_product_by_name(name: str) -> Optional[Product]:
+    async with connect() as db:
+        db.row_factory = Product.factory
         cursor = await db.execute("SELECT * FROM products WHERE name = ?", (name,))
-        result = await cursor.fetchone()
-        return dict(result) if result else None
+        return await cursor.fetchone()
 
 
 async def reduce_stock(product_id: int, quantity: int):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         await db.execute("""
                          UPDATE products
                          SET stock = stock - ?
@@ -426,19 +872,168 @@ async def reduce_stock(product_id: int, quantity: int):
         await db.commit()
 
 
+# ==================== SEARCH ====================
+SEARCH_CACHE_TTL = 30            # сколько секунд живёт результат поиска по запросу
+SEARCH_CACHE_SIZE = 1000         # сколько разных запросов помним
+SEARCH_MAX_TERMS = 8
+SEARCH_CANDIDATES = 1000         # сколько совпадений ранжируем bm25 (ограничивает худший случай)
+
+# Версия витрины: растёт при добавлении/удалении товара и смене цены.
+# Остатки в закэшированных результатах могут отставать на SEARCH_CACHE_TTL,
+# карточка товара всегда читается из БД заново.
+_catalog_version = 0
+_search_cache: Dict[Tuple[str, int], Tuple[float, int, List[Product]]] = {}
+search_cache_stats = {"hits": 0, "misses": 0}
+
+
+def bump_catalog_version():
+    global _catalog_version
+    _catalog_version += 1
+
+
+def _fts_query(text: str, whole_words: bool = False) -> Optional[str]:
+    """Ввод пользователя -> запрос FTS5: слова ищутся как префиксы, нужны все слова.
+
+    Одна буква префиксом не считается: под неё подходит половина словаря.
+    whole_words: длинные слова ищутся целиком - префиксы длиннее индекса prefix='2 3'
+    заставляют FTS5 собирать весь список документов.
+    """
+    terms = re.findall(r"\w+", text.lower())[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+
+    def fts_term(term: str) -> str:
+        if len(term) == 1 or (whole_words and len(term) > 3):
+            return f'"{term}"'
+        return f'"{term}"*'
+
+    return " ".join(fts_term(term) for term in terms)
+
+
+async def _fts_ranked(db, match: str, limit: int, exclude: Set[int]) -> List[Product]:
+    """Лучшие по bm25 среди первых SEARCH_CANDIDATES совпадений (название весит в 10 раз больше)"""
+    cursor = await db.execute("""
+        SELECT p.id, p.name, p.description, p.price, p.stock, p.version
+        FROM (SELECT rowid, bm25(products_fts, 10.0, 1.0) AS score
+              FROM products_fts
+              WHERE products_fts MATCH ?
+              LIMIT ?) f
+                 JOIN products p ON p.id = f.rowid
+        ORDER BY f.score
+        LIMIT ?
+    """, (match, SEARCH_CANDIDATES, limit + len(exclude)))
+    return [row for row in await cursor.fetchall() if row.id not in exclude][:limit]
+
+
+async def search_products(query: str, limit: int = 20) -> List[Product]:
+    """Поиск товаров по названию и описанию, лучшие совпадения (bm25) первыми"""
+    match = _fts_query(query)
+    if match is None:
+        return []
+
+    key = (match, limit)
+    now = time.monotonic()
+    cached = _search_cache.get(key)
+    if cached is not None and cached[0] > now and cached[1] == _catalog_version:
+        search_cache_stats["hits"] += 1
+        return cached[2]
+    search_cache_stats["misses"] += 1
+
+    version = _catalog_version
+    async with connect() as db:
+        db.row_factory = Product.factory
+        # Сначала совпадения в названии, остаток выдачи добираем по описанию
+        results = await _fts_ranked(db, f"{{name}} : ({match})", limit, set())
+        if len(results) < limit:
+            results += await _fts_ranked(db, match, limit - len(results), {p.id for p in results})
+
+    if len(_search_cache) >= SEARCH_CACHE_SIZE:
+        for stale in [k for k, v in _search_cache.items() if v[0] <= now or v[1] != version]:
+            del _search_cache[stale]
+        if len(_search_cache) >= SEARCH_CACHE_SIZE:
+            _search_cache.clear()
+    _search_cache[key] = (now + SEARCH_CACHE_TTL, version, results)
+    return results
+
+
+# ==================== ADMIN PRODUCT PICKERS ====================
+PRODUCT_PAGE = 8
+LOW_STOCK = 5                    # "мало на складе": от 1 до LOW_STOCK шт.
+# Фильтры пикеров товаров; low/out совпадают с условиями частичных индексов
+PRODUCT_VIEWS = {
+    "all": "1",
+    "low": f"stock > 0 AND stock <= {LOW_STOCK}",
+    "out": "stock <= 0",
+}
+_PRODUCT_PICKER_COLUMNS = "id, name, price, stock"
+
+
+async def get_admin_products_page(view: str = "all", query: str = "", cursor: Optional[str] = None,
+                                  limit: int = PRODUCT_PAGE) -> Tuple[List[Product], Optional[str]]:
+    """Страница пикера товаров в админке (keyset по уникальному name).
+    query ищет по словам названия через products_fts"""
+    where = PRODUCT_VIEWS[view]
+    params: list = [cursor or ""]
+    if query:
+        match = _fts_query(query)
+        if match is None:
+            return [], None
+        where += " AND id IN (SELECT rowid FROM products_fts WHERE products_fts MATCH ?)"
+        params.append(f"{{name}} : ({match})")
+
+    async with connect() as db:
+        db.row_factory = Product.factory
+        rows = await db.execute_fetchall(f"""
+            SELECT {_PRODUCT_PICKER_COLUMNS} FROM products
+            WHERE name > ? AND {where}
+            ORDER BY name
+            LIMIT ?
+        """, (*params, limit + 1))
+
+    products = list(rows)
+    next_cursor = products[limit - 1].name if len(products) > limit else None
+    return products[:limit], next_cursor
+
+
 # ==================== CART ====================
+async def _others_held(db, user_id: int, product_id: int, now: float) -> int:
+    """Сколько единиц товара держат активные резервы других пользователей"""
+    cursor = await db.execute("""
+        SELECT COALESCE(SUM(quantity), 0) FROM reservations
+        WHERE product_id = ? AND user_id != ? AND expires_at > ?
+    """, (product_id, user_id, now))
+    return (await cursor.fetchone())[0]
+
+
 async def add_to_cart(user_id: int, product_id: int, quantity: int = 1):
-    """Добавление товара в корзину (БЕЗ изменения остатка)"""
+    """Добавление товара в корзину с резервированием на RESERVATION_TTL"""
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
+            # ✅ Сразу берём блокировку на запись, чтобы два покупателя
+            # не зарезервировали последнюю единицу одновременно
+            await db.execute("BEGIN IMMEDIATE")
+
             # Проверяем наличие товара
             cursor = await db.execute(
                 "SELECT stock FROM products WHERE id = ?",
                 (product_id,)
             )
             result = await cursor.fetchone()
+            if not result:
+                await db.rollback()
+                return False
 
-            if not result or result[0] < quantity:
+            cursor = await db.execute(
+                "SELECT quantity FROM cart WHERE user_id = ? AND product_id = ?",
+                (user_id, product_id)
+            )
+            row = await cursor.fetchone()
+            new_quantity = (row[0] if row else 0) + quantity
+
+            # Остаток за вычетом чужих резервов должен покрыть всю позицию корзины
+            now = time.time()
+            if result[0] - await _others_held(db, user_id, product_id, now) < new_quantity:
+                await db.rollback()
                 return False
 
             # Добавляем или обновляем в корзине
@@ -449,42 +1044,51 @@ async def add_to_cart(user_id: int, product_id: int, quantity: int = 1):
                              UPDATE SET quantity = quantity + ?
                              """, (user_id, product_id, quantity, quantity))
 
-            # ✅ НЕ УМЕНЬШАЕМ остаток! Только при оформлении заказа
-            # await db.execute("UPDATE products SET stock = stock - ? WHERE id = ?", (quantity, product_id))
+            # Резервируем всю позицию и продлеваем срок резерва
+            expires_at = ledger.expires_at()
+            await db.execute("""
+                INSERT INTO reservations (user_id, product_id, quantity, expires_at)
+                VALUES (?, ?, ?, ?) ON CONFLICT(user_id, product_id)
+                DO UPDATE SET quantity = excluded.quantity, expires_at = excluded.expires_at
+            """, (user_id, product_id, new_quantity, expires_at))
 
             await db.commit()
+            ledger.set(user_id, product_id, new_quantity, expires_at)
             return True
     except Exception as e:
         logging.error(f"❌ Ошибка при добавлении в корзину: {e}")
         return False
 
 
-async def get_cart(user_id: int) -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+async def get_cart(user_id: int) -> List[CartLine]:
+    async with connect() as db:
+        db.row_factory = CartLine.factory
         cursor = await db.execute("""
                                   SELECT c.*, p.name, p.price, p.stock
                                   FROM cart c
                                            JOIN products p ON c.product_id = p.id
                                   WHERE c.user_id = ?
                                   """, (user_id,))
-        return [dict(row) for row in await cursor.fetchall()]
+        return await cursor.fetchall()
 
 
 async def remove_from_cart(user_id: int, product_id: int):
-    """Удаление товара из корзины (БЕЗ изменения остатка)"""
+    """Удаление товара из корзины (со снятием резерва)"""
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
-            # ✅ Просто удаляем товар из корзины
-            # НЕ восстанавливаем остаток, так как при добавлении он не уменьшался
+        async with connect() as db:
             await db.execute("""
                              DELETE
                              FROM cart
                              WHERE user_id = ?
                                AND product_id = ?
                              """, (user_id, product_id))
+            await db.execute(
+                "DELETE FROM reservations WHERE user_id = ? AND product_id = ?",
+                (user_id, product_id)
+            )
 
             await db.commit()
+            ledger.drop(user_id, product_id)
 
             logging.info(f"🗑️ Товар {product_id} удален из корзины пользователя {user_id}")
     except Exception as e:
@@ -492,18 +1096,18 @@ async def remove_from_cart(user_id: int, product_id: int):
 
 
 async def clear_cart(user_id: int):
-    """Очистка корзины пользователя (БЕЗ изменения остатка)"""
+    """Очистка корзины пользователя (со снятием резервов)"""
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
-            # ✅ Просто удаляем все товары из корзины
-            # НЕ восстанавливаем остаток, так как при добавлении он не уменьшался
+        async with connect() as db:
             await db.execute("""
                              DELETE
                              FROM cart
                              WHERE user_id = ?
                              """, (user_id,))
+            await db.execute("DELETE FROM reservations WHERE user_id = ?", (user_id,))
 
             await db.commit()
+            ledger.drop_user(user_id)
 
             logging.info(f"🗑️ Корзина пользователя {user_id} очищена")
     except Exception as e:
@@ -511,9 +1115,9 @@ async def clear_cart(user_id: int):
 
 
 async def update_cart_quantity(user_id: int, product_id: int, quantity: int):
-    """Обновление количества товара в корзине (БЕЗ изменения остатка)"""
+    """Обновление количества товара в корзине (резерв уменьшается вместе с корзиной)"""
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             if quantity <= 0:
                 # Удаляем товар
                 await db.execute("""
@@ -522,6 +1126,10 @@ async def update_cart_quantity(user_id: int, product_id: int, quantity: int):
                                  WHERE user_id = ?
                                    AND product_id = ?
                                  """, (user_id, product_id))
+                await db.execute(
+                    "DELETE FROM reservations WHERE user_id = ? AND product_id = ?",
+                    (user_id, product_id)
+                )
             else:
                 # Обновляем количество
                 await db.execute("""
@@ -530,8 +1138,16 @@ async def update_cart_quantity(user_id: int, product_id: int, quantity: int):
                                  WHERE user_id = ?
                                    AND product_id = ?
                                  """, (quantity, user_id, product_id))
+                await db.execute(
+                    "UPDATE reservations SET quantity = ? WHERE user_id = ? AND product_id = ?",
+                    (quantity, user_id, product_id)
+                )
 
             await db.commit()
+            if quantity <= 0:
+                ledger.drop(user_id, product_id)
+            else:
+                ledger.resize(user_id, product_id, quantity)
     except Exception as e:
         logging.error(f"❌ Ошибка при обновлении количества: {e}")
 
@@ -539,11 +1155,12 @@ async def update_cart_quantity(user_id: int, product_id: int, quantity: int):
 async def update_price(product_id: int, new_price: int) -> bool:
     """Обновление цены товара"""
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             await db.execute("""
-                UPDATE products SET price = ? WHERE id = ?
+                UPDATE products SET price = ?, version = version + 1 WHERE id = ?
             """, (new_price, product_id))
             await db.commit()
+            bump_catalog_version()
             logging.info(f"💰 Цена товара ID={product_id} изменена на {new_price}₽")
             return True
     except Exception as e:
@@ -552,7 +1169,7 @@ async def update_price(product_id: int, new_price: int) -> bool:
 
 # ==================== BONUSES ====================
 async def add_bonus(user_id: int, discount_percent: int):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         await db.execute("""
                          INSERT INTO bonuses (user_id, discount_percent, is_active)
                          VALUES (?, ?, 1)
@@ -561,7 +1178,7 @@ async def add_bonus(user_id: int, discount_percent: int):
 
 
 async def get_active_bonus(user_id: int) -> Optional[int]:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cursor = await db.execute("""
                                   SELECT discount_percent
                                   FROM bonuses
@@ -574,7 +1191,7 @@ async def get_active_bonus(user_id: int) -> Optional[int]:
 
 
 async def deactivate_bonus(user_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         await db.execute("""
                          UPDATE bonuses
                          SET is_active = 0
@@ -584,26 +1201,26 @@ async def deactivate_bonus(user_id: int):
         await db.commit()
 
 
-async def get_user_bonuses(user_id: int) -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+async def get_user_bonuses(user_id: int) -> List[Bonus]:
+    async with connect() as db:
+        db.row_factory = Bonus.factory
         cursor = await db.execute("""
                                   SELECT *
                                   FROM bonuses
                                   WHERE user_id = ?
                                   ORDER BY created_at DESC
                                   """, (user_id,))
-        return [dict(row) for row in await cursor.fetchall()]
+        return await cursor.fetchall()
 
 
 async def remove_bonus(bonus_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         await db.execute("DELETE FROM bonuses WHERE id = ?", (bonus_id,))
         await db.commit()
 
 
 # ==================== ORDERS ====================
-async def create_order(user_id: int, cart_items: List[Dict],
+async def create_order(user_id: int, cart_items: List[CartLine],
                        discount_percent: int = 0) -> Optional[str]:
     """Создание заказа с возвратом номера заказа"""
     try:
@@ -614,9 +1231,12 @@ async def create_order(user_id: int, cart_items: List[Dict],
         if discount_percent is None:
             discount_percent = 0
 
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
+            # ✅ Блокировка на запись: проверка остатков и списание — атомарно
+            await db.execute("BEGIN IMMEDIATE")
+
             # Подсчет суммы
-            total_price = sum(item['price'] * item['quantity'] for item in cart_items)
+            total_price = sum(item.price * item.quantity for item in cart_items)
 
             # ✅ Безопасный расчет скидки
             discount_percent = int(discount_percent) if discount_percent else 0
@@ -627,14 +1247,30 @@ async def create_order(user_id: int, cart_items: List[Dict],
             # Генерация уникального номера заказа
             timestamp = int(time.time()) % 1000000
             unique_id = str(uuid.uuid4())[:6].upper()
-            order_number = f"ORDER-{timestamp}-{unique_id}"
+            order_number = f"ORDER-{timestamp:06d}-{unique_id}"
+
+            # ✅ Карточка заказа для админки рендерится один раз, здесь
+            cursor = await db.execute("SELECT username FROM users WHERE user_id = ?", (user_id,))
+            user_row = await cursor.fetchone()
+            created_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())  # формат CURRENT_TIMESTAMP
+            items = [
+                OrderItem(product_name=item.name, quantity=item.quantity, subtotal=item.price * item.quantity)
+                for item in cart_items
+            ]
+            summary = render_order_summary(
+                order_number, (user_row[0] if user_row else None) or user_id, created_at, 'pending',
+                items, total_price, discount_percent, final_price
+            )
+            item_count = sum(item.quantity for item in cart_items)
 
             # Создание заказа
             await db.execute("""
                              INSERT INTO orders (order_number, user_id, total_price,
-                                                 discount_percent, final_price, status)
-                             VALUES (?, ?, ?, ?, ?, 'pending')
-                             """, (order_number, user_id, total_price, discount_percent, final_price))
+                                                 discount_percent, final_price, status,
+                                                 created_at, summary, item_count)
+                             VALUES (?, ?, ?, ?, ?, 'pending', ?, ?, ?)
+                             """, (order_number, user_id, total_price, discount_percent, final_price,
+                                   created_at, summary, item_count))
 
             # Получаем ID созданного заказа
             cursor = await db.execute("SELECT last_insert_rowid()")
@@ -645,22 +1281,34 @@ async def create_order(user_id: int, cart_items: List[Dict],
 
             # Добавление позиций заказа
             for item in cart_items:
-                subtotal = item['price'] * item['quantity']
+                subtotal = item.price * item.quantity
                 await db.execute("""
                                  INSERT INTO order_items (order_id, product_name, quantity,
                                                           price_per_item, subtotal)
                                  VALUES (?, ?, ?, ?, ?)
-                                 """, (order_id, item['name'], item['quantity'],
-                                       item['price'], subtotal))
+                                 """, (order_id, item.name, item.quantity,
+                                       item.price, subtotal))
 
-                # Уменьшение остатка товара
-                await db.execute("""
+                # Уменьшение остатка товара: резерв покупателя превращается в продажу,
+                # чужие активные резервы трогать нельзя
+                others_held = await _others_held(db, user_id, item.product_id, time.time())
+                cursor = await db.execute("""
                                  UPDATE products
                                  SET stock = stock - ?
                                  WHERE id = ?
-                                 """, (item['quantity'], item['product_id']))
+                                   AND stock - ? >= ?
+                                 """, (item.quantity, item.product_id,
+                                       item.quantity, others_held))
+                if cursor.rowcount == 0:
+                    await db.rollback()
+                    logging.warning(f"⚠️ Недостаточно товара {item.name} для заказа пользователя {user_id}")
+                    return None
+
+            await _rollup_order(db, order_id, 1)
+            await db.execute("DELETE FROM reservations WHERE user_id = ?", (user_id,))
 
             await db.commit()
+            ledger.drop_user(user_id)
             logging.info(f"✅ Заказ {order_number} успешно создан!")
             return order_number
 
@@ -671,10 +1319,10 @@ async def create_order(user_id: int, cart_items: List[Dict],
         return None
 
 
-async def get_order(order_number: str) -> Optional[Dict]:
+async def get_order(order_number: str) -> Optional[Order]:
     """Получение информации о заказе"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with connect() as db:
+        db.row_factory = Order.factory
         cursor = await db.execute("""
                                   SELECT *
                                   FROM orders
@@ -683,78 +1331,271 @@ async def get_order(order_number: str) -> Optional[Dict]:
         order = await cursor.fetchone()
 
         if not order:
-            return None
-
-        order_dict = dict(order)
+            # Завершённые старые заказы переносятся в архив (archive_orders)
+            return await get_archived_order(order_number)
 
         # Получение позиций заказа
+        db.row_factory = OrderItem.factory
         cursor = await db.execute("""
                                   SELECT *
                                   FROM order_items
                                   WHERE order_id = ?
-                                  """, (order_dict['id'],))
-        order_dict['items'] = [dict(row) for row in await cursor.fetchall()]
+                                  """, (order.id,))
+        order.items = await cursor.fetchall()
 
-        return order_dict
+        return order
 
 
-async def get_all_orders() -> List[Dict]:
-    """Получение всех заказов"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+async def get_order_summary(order_number: str) -> Optional[Order]:
+    """Карточка заказа для админки: одна выборка по номеру, без order_items"""
+    async with connect() as db:
+        db.row_factory = Order.factory
         cursor = await db.execute("""
-            SELECT o.*, u.username, u.first_name 
-            FROM orders o 
-            JOIN users u ON o.user_id = u.user_id 
-            ORDER BY o.created_at DESC
-        """)
-        orders = []
-        for row in await cursor.fetchall():
-            order = dict(row)
-            # Получение позиций
-            cursor_items = await db.execute("""
-                SELECT * FROM order_items WHERE order_id = ?
-            """, (order['id'],))
-            order['items'] = [dict(item) for item in await cursor_items.fetchall()]
-            orders.append(order)
-        return orders
+                                  SELECT order_number, user_id, status, final_price, item_count, summary
+                                  FROM orders
+                                  WHERE order_number = ?
+                                  """, (order_number,))
+        row = await cursor.fetchone()
+    if not row:
+        return await _archived_order_summary(order_number)
+
+    if row.summary is None:
+        row.summary, row.item_count = await _backfill_order_summary(order_number)
+    return row
+
+
+async def _archived_order_summary(order_number: str) -> Optional[Order]:
+    """Карточка заказа из архива (только чтение)"""
+    order = await get_archived_order(order_number)
+    if not order:
+        return None
+    if order.summary is None:
+        order.summary = render_order_summary(
+            order_number, order.user_id, order.created_at, order.status, order.items,
+            order.total_price, order.discount_percent, order.final_price
+        )
+    return order
+
+
+async def _backfill_order_summary(order_number: str) -> Tuple[str, int]:
+    """Карточка для заказов, оформленных до появления колонки summary"""
+    order = await get_order(order_number)
+    async with connect() as db:
+        cursor = await db.execute("SELECT username FROM users WHERE user_id = ?", (order.user_id,))
+        user_row = await cursor.fetchone()
+        summary = render_order_summary(
+            order_number, (user_row[0] if user_row else None) or order.user_id, order.created_at,
+            order.status, order.items, order.total_price, order.discount_percent,
+            order.final_price
+        )
+        item_count = sum(item.quantity for item in order.items)
+        await db.execute("""
+                         UPDATE orders
+                         SET summary = ?, item_count = ?
+                         WHERE order_number = ?
+                         """, (summary, item_count, order_number))
+        await db.commit()
+    return summary, item_count
+
+
+def iter_orders(batch: int = STREAM_BATCH) -> AsyncIterator[Order]:
+    """Все заказы от новых к старым (строка заказа без позиций); порции идут по
+    idx_orders_created, id внутри одной секунды - для однозначного ключа"""
+    return _stream(Order, """
+        SELECT o.id, o.order_number, o.user_id, o.total_price, o.discount_percent,
+               o.final_price, o.status, o.created_at, o.item_count,
+               u.username, u.first_name
+        FROM orders o
+        JOIN users u ON o.user_id = u.user_id
+        WHERE {keyset}
+        ORDER BY o.created_at DESC, o.id DESC
+        LIMIT ?
+    """, "(o.created_at, o.id) < (?, ?)", lambda order: (order.created_at, order.id), batch=batch)
+
+
+async def get_all_orders() -> List[Order]:
+    """Получение всех заказов (для списка хватает строки заказа, позиции не читаем)"""
+    return [order async for order in iter_orders()]
+
+
+async def get_recent_orders(limit: int = 10) -> List[Order]:
+    """Последние заказы для списка в админке (без чтения всей таблицы)"""
+    async with connect() as db:
+        db.row_factory = Order.factory
+        cursor = await db.execute("""
+            SELECT id, order_number, user_id, status, final_price, created_at
+            FROM orders
+            ORDER BY id DESC
+            LIMIT ?
+        """, (limit,))
+        return await cursor.fetchall()
+
+
+# ==================== ORDER SEARCH ====================
+ORDER_SEARCH_PAGE = 10
+ORDER_NUMBER_RE = re.compile(r"^ORDER-\d{1,6}-[0-9A-F]{6}$")  # старые номера - без нулей впереди
+_ORDER_COLUMNS = "id, order_number, user_id, status, final_price, created_at"
+
+
+def order_search_mode(query: str) -> str:
+    """Как искать: exact / prefix / user_id / username / items"""
+    upper = query.upper()
+    if ORDER_NUMBER_RE.match(upper):
+        return "exact"
+    if upper.startswith("ORDER"):
+        return "prefix"
+    if query.isdigit():
+        return "user_id"
+    if query.startswith("@"):
+        return "username"
+    return "items"
+
+
+async def search_orders(query: str, cursor=None,
+                        limit: int = ORDER_SEARCH_PAGE) -> Tuple[List[Order], Optional[object]]:
+    """Поиск заказов для админки/поддержки.
+
+    Возвращает страницу заказов и курсор следующей страницы (None - дальше пусто).
+    Курсор: номер заказа для поиска по префиксу, id заказа для остальных режимов.
+    """
+    query = query.strip()
+    mode = order_search_mode(query)
+
+    async with connect() as db:
+        if mode == "exact":
+            orders = await _fetch_records(
+                db, Order, f"SELECT {_ORDER_COLUMNS} FROM orders WHERE order_number = ?", (query.upper(),)
+            )
+            return orders, None
+
+        if mode == "prefix":
+            # Диапазон по уникальному индексу order_number, страницы по возрастанию номера
+            prefix = query.upper()
+            upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            orders = await _fetch_records(db, Order, f"""
+                SELECT {_ORDER_COLUMNS} FROM orders
+                WHERE order_number >= ? AND order_number < ? AND order_number > ?
+                ORDER BY order_number
+                LIMIT ?
+            """, (prefix, upper_bound, cursor or "", limit + 1))
+            next_cursor = orders[limit - 1].order_number if len(orders) > limit else None
+            return orders[:limit], next_cursor
+
+        before = cursor if cursor is not None else 1 << 62
+
+        if mode in ("user_id", "username"):
+            if mode == "user_id":
+                user_ids = [int(query)]
+            else:
+                rows = await db.execute_fetchall(
+                    "SELECT user_id FROM users WHERE username = ? COLLATE NOCASE", (query[1:],)
+                )
+                user_ids = [row[0] for row in rows]
+            if not user_ids:
+                return [], None
+            placeholders = ",".join("?" * len(user_ids))
+            orders = await _fetch_records(db, Order, f"""
+                SELECT {_ORDER_COLUMNS} FROM orders
+                WHERE user_id IN ({placeholders}) AND id < ?
+                ORDER BY id DESC
+                LIMIT ?
+            """, (*user_ids, before, limit + 1))
+
+        else:
+            match = _fts_query(query, whole_words=True)
+            if match is None:
+                return [], None
+            rows = await db.execute_fetchall(
+                "SELECT 1 FROM order_items_fts WHERE order_items_fts MATCH ? LIMIT 1", (match,)
+            )
+            if not rows:
+                # Целых слов нет - ищем как префиксы (медленнее на больших базах)
+                match = _fts_query(query)
+            # Позиции одного заказа идут подряд, поэтому rowid позиции убывает вместе с id заказа:
+            # идём по FTS от новых к старым и пропускаем повторы заказов
+            rows = await db.execute_fetchall(
+                "SELECT COALESCE(MIN(id), ?) FROM order_items WHERE order_id = ?", (1 << 62, before)
+            )
+            item_before = rows[0][0]
+            scan = (limit + 1) * 4
+            rows = await db.execute_fetchall("""
+                SELECT i.order_id
+                FROM order_items_fts f
+                         JOIN order_items i ON i.id = f.rowid
+                WHERE order_items_fts MATCH ? AND f.rowid < ?
+                ORDER BY f.rowid DESC
+                LIMIT ?
+            """, (match, item_before, scan))
+            order_ids = list(dict.fromkeys(row[0] for row in rows))
+            has_more = len(order_ids) > limit or len(rows) == scan
+            order_ids = order_ids[:limit]
+            if not order_ids:
+                return [], None
+            placeholders = ",".join("?" * len(order_ids))
+            orders = await _fetch_records(
+                db, Order, f"SELECT {_ORDER_COLUMNS} FROM orders WHERE id IN ({placeholders}) ORDER BY id DESC",
+                order_ids
+            )
+            return orders, (order_ids[-1] if has_more else None)
+
+    next_cursor = orders[limit - 1].id if len(orders) > limit else None
+    return orders[:limit], next_cursor
 
 
 async def update_order_status(order_number: str, status: str):
-    async with aiosqlite.connect(DB_PATH) as db:
+    """Смена статуса: в готовой карточке заменяется только строка статуса"""
+    async with connect() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        cursor = await db.execute(
+            "SELECT id, status FROM orders WHERE order_number = ?", (order_number,)
+        )
+        row = await cursor.fetchone()
+        if not row:
+            await db.rollback()
+            return
+
+        # Отменённые заказы в выручку не входят: отмена вычитает, возврат из отмены добавляет
+        sign = (status != 'cancelled') - (row[1] != 'cancelled')
+        if sign:
+            await _rollup_order(db, row[0], sign)
+
         await db.execute("""
                          UPDATE orders
-                         SET status = ?
+                         SET status  = ?,
+                             summary = replace(summary, ? || status || char(10), ? || ? || char(10))
                          WHERE order_number = ?
-                         """, (status, order_number))
+                         """, (status, ORDER_STATUS_PREFIX, ORDER_STATUS_PREFIX, status, order_number))
         await db.commit()
 
 async def get_all_admin_ids() -> List[int]:
     """Получение всех ID администраторов"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute("SELECT user_id FROM users WHERE is_admin = 1")
-        results = await cursor.fetchall()
-        return [row[0] for row in results]
+    return [user.user_id async for user in iter_admins()]
 
 
 async def delete_order(order_number: str) -> bool:
     """Полное удаление заказа и его позиций"""
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             # Получаем ID заказа
+            await db.execute("BEGIN IMMEDIATE")
             cursor = await db.execute(
-                "SELECT id FROM orders WHERE order_number = ?",
+                "SELECT id, status FROM orders WHERE order_number = ?",
                 (order_number,)
             )
             result = await cursor.fetchone()
 
             if not result:
+                await db.rollback()
                 print(f"❌ Заказ {order_number} не найден в БД")
                 return False
 
             order_id = result[0]
             print(f"🗑️ Удаляем заказ ID={order_id}, номер={order_number}")
 
+            # Убираем заказ из агрегатов (пока позиции ещё на месте)
+            if result[1] != 'cancelled':
+                await _rollup_order(db, order_id, -1)
+
             # Удаляем позиции заказа
             await db.execute(
                 "DELETE FROM order_items WHERE order_id = ?",
@@ -792,7 +1633,7 @@ async def create_welcome_bonus(user_id: int, discount_percent: int = 10):
 
 async def set_bonus_usage(user_id: int, use_bonus: bool):
     """Установка флага использования бонуса для текущего заказа"""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         await db.execute("""
             INSERT OR REPLACE INTO user_settings (user_id, use_bonus) 
             VALUES (?, ?)
@@ -802,7 +1643,7 @@ async def set_bonus_usage(user_id: int, use_bonus: bool):
 
 async def get_bonus_usage(user_id: int) -> bool:
     """Получение флага использования бонуса"""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cursor = await db.execute("""
             SELECT use_bonus FROM user_settings WHERE user_id = ?
         """, (user_id,))
@@ -810,29 +1651,334 @@ async def get_bonus_usage(user_id: int) -> bool:
         return result[0] == 1 if result else True  # По умолчанию True
 
 
-async def get_maintenance_mode() -> bool:
-    """Получение статуса режима техработ"""
-    try:
-        async with aiosqlite.connect(DB_PATH) as db:
-            # Проверяем, существует ли таблица settings
-            await db.execute("""
-                             CREATE TABLE IF NOT EXISTS settings
-                             (
-                                 key
-                                 TEXT
-                                 PRIMARY
-                                 KEY,
-                                 value
-                                 TEXT
-                             )
-                             """)
+# ==================== ORDER ARCHIVE ====================
+ARCHIVE_PATH = "shop_archive.db"
+ARCHIVE_CHUNK = 500              # заказов на транзакцию
+ARCHIVE_PAUSE = 0.05             # сек между транзакциями: оформление заказов не ждёт весь прогон
+ARCHIVE_STATUSES = ("paid", "cancelled")
+_ARCHIVE_TABLES = ("orders", "order_items")
+
+
+async def _attach_archive(db) -> Dict[str, List[str]]:
+    """ATTACH архива; таблицы создаются по образцу основных и догоняют их миграции.
+    Возвращает колонки основных таблиц для INSERT ... SELECT"""
+    await db.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_PATH,))
+    columns = {}
+    for table in _ARCHIVE_TABLES:
+        main_info = await db.execute_fetchall(f"PRAGMA main.table_info({table})")
+        archived = {row[1] for row in await db.execute_fetchall(f"PRAGMA archive.table_info({table})")}
+        if not archived:
+            await db.execute(f"CREATE TABLE archive.{table} AS SELECT * FROM main.{table} WHERE 0")
+        else:
+            for row in main_info:
+                if row[1] not in archived:
+                    await db.execute(f"ALTER TABLE archive.{table} ADD COLUMN {row[1]} {row[2]}")
+        columns[table] = [row[1] for row in main_info]
+    await db.execute("CREATE UNIQUE INDEX IF NOT EXISTS archive.idx_archive_orders_number ON orders (order_number)")
+    await db.execute("CREATE INDEX IF NOT EXISTS archive.idx_archive_items_order ON order_items (order_id)")
+    await db.commit()
+    return columns
+
+
+async def _main_db_pages(db) -> Tuple[int, int, int]:
+    page_size = (await (await db.execute("PRAGMA main.page_size")).fetchone())[0]
+    page_count = (await (await db.execute("PRAGMA main.page_count")).fetchone())[0]
+    freelist = (await (await db.execute("PRAGMA main.freelist_count")).fetchone())[0]
+    return page_size, page_count, freelist
+
+
+async def archive_orders(older_than_days: int, chunk: int = ARCHIVE_CHUNK) -> Dict:
+    """Перенос завершённых заказов старше older_than_days в архивную БД.
+
+    Кандидаты читаются по id без блокировки записи, перенос - короткими
+    транзакциями BEGIN IMMEDIATE по chunk заказов с паузой между ними.
+    Дневные агрегаты (sales_daily) не меняются: заказ не удалён, а перенесён.
+    """
+    cutoff = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - older_than_days * 86400))
+    report = {"orders": 0, "items": 0}
+
+    async with connect() as db:
+        columns = await _attach_archive(db)
+        order_columns = ", ".join(columns["orders"])
+        item_columns = ", ".join(columns["order_items"])
+        page_size, pages_before, free_before = await _main_db_pages(db)
+
+        after_id = 0
+        while True:
+            # id растут вместе с created_at: дошли до свежих заказов - дальше не читаем
+            rows = await db.execute_fetchall(
+                "SELECT id, status, created_at FROM main.orders WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, chunk)
+            )
+            if not rows:
+                break
+            after_id = rows[-1][0]
+            ids = [row[0] for row in rows if row[1] in ARCHIVE_STATUSES and row[2] < cutoff]
+
+            if ids:
+                placeholders = ",".join("?" * len(ids))
+                await db.execute("BEGIN IMMEDIATE")
+                # Статус мог смениться с момента чтения: переносим только то, что всё ещё подходит
+                rows_now = await db.execute_fetchall(f"""
+                    SELECT id FROM main.orders
+                    WHERE id IN ({placeholders}) AND status IN ('paid', 'cancelled')
+                """, ids)
+                ids = [row[0] for row in rows_now]
+                if ids:
+                    placeholders = ",".join("?" * len(ids))
+                    await db.execute(f"""
+                        INSERT INTO archive.orders ({order_columns})
+                        SELECT {order_columns} FROM main.orders WHERE id IN ({placeholders})
+                    """, ids)
+                    cursor = await db.execute(f"""
+                        INSERT INTO archive.order_items ({item_columns})
+                        SELECT {item_columns} FROM main.order_items WHERE order_id IN ({placeholders})
+                    """, ids)
+                    report["items"] += cursor.rowcount
+                    await db.execute(f"DELETE FROM main.order_items WHERE order_id IN ({placeholders})", ids)
+                    await db.execute(f"DELETE FROM main.orders WHERE id IN ({placeholders})", ids)
+                    report["orders"] += len(ids)
+                await db.commit()
+                await asyncio.sleep(ARCHIVE_PAUSE)
+
+            if rows[-1][2] >= cutoff:
+                break
+
+        # При auto_vacuum = INCREMENTAL освобождённые страницы сразу отдаются файловой системе
+        if (await (await db.execute("PRAGMA main.auto_vacuum")).fetchone())[0] == 2:
+            await db.executescript("PRAGMA main.incremental_vacuum")
+
+        _, pages_after, free_after = await _main_db_pages(db)
+        await db.execute("DETACH DATABASE archive")
+
+    report["freed_bytes"] = ((pages_before - free_before) - (pages_after - free_after)) * page_size
+    report["file_bytes_before"] = pages_before * page_size
+    report["file_bytes_after"] = pages_after * page_size
+    return report
+
+
+async def get_archived_order(order_number: str) -> Optional[Order]:
+    """Заказ из архива (с позициями); None, если архива нет или заказа в нём нет"""
+    if not os.path.exists(ARCHIVE_PATH):
+        return None
+    async with connect(ARCHIVE_PATH) as db:
+        db.row_factory = Order.factory
+        cursor = await db.execute("SELECT * FROM orders WHERE order_number = ?", (order_number,))
+        order = await cursor.fetchone()
+        if not order:
+            return None
+        db.row_factory = OrderItem.factory
+        cursor = await db.execute("SELECT * FROM order_items WHERE order_id = ?", (order.id,))
+        order.items = await cursor.fetchall()
+    order.archived = True
+    return order
+
+
+async def run_order_archiver(older_than_days: int, interval: int):
+    """Фоновая задача: периодический перенос старых заказов в архив"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            report = await archive_orders(older_than_days)
+            if report["orders"]:
+                logging.info(
+                    f"🗄️ В архив перенесено заказов: {report['orders']} "
+                    f"(позиций: {report['items']}, освобождено {report['freed_bytes'] // 1024} КБ)"
+                )
+        except Exception as e:
+            logging.error(f"❌ Ошибка архивации заказов: {e}")
+
+
+# ==================== ORDER EXPORT ====================
+EXPORT_ORDERS_PER_QUERY = 1000   # заказов на один SELECT: между запросами блокировка чтения снимается
+EXPORT_FETCH = 500               # строк за один fetchmany
+EXPORT_COLUMNS = (
+    "order_number", "created_at", "status", "user_id", "username",
+    "total_price", "discount_percent", "final_price",
+    "product_name", "quantity", "price_per_item", "subtotal",
+)
+
+
+async def iter_order_export(date_from: str, date_to: str, fetch: int = EXPORT_FETCH):
+    """Строки выгрузки (заказ × позиция) за [date_from, date_to) порциями fetchmany.
+
+    Сначала архив (там заказы старше), затем основная БД. Диапазон id находится
+    по idx_orders_created, дальше заказы читаются по id короткими запросами.
+    """
+    async with connect() as db:
+        schemas = ["main"]
+        if os.path.exists(ARCHIVE_PATH):
+            await db.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_PATH,))
+            cursor = await db.execute("SELECT 1 FROM archive.sqlite_master WHERE type = 'table' AND name = 'orders'")
+            if await cursor.fetchone():
+                schemas.insert(0, "archive")
+
+        for schema in schemas:
+            cursor = await db.execute(
+                f"SELECT MIN(id), MAX(id) FROM {schema}.orders WHERE created_at >= ? AND created_at < ?",
+                (date_from, date_to)
+            )
+            low, high = await cursor.fetchone()
+            if low is None:
+                continue
+
+            after_id = low - 1
+            while after_id < high:
+                cursor = await db.execute(f"""
+                    SELECT o.order_number, o.created_at, o.status, o.user_id, u.username,
+                           o.total_price, o.discount_percent, o.final_price,
+                           i.product_name, i.quantity, i.price_per_item, i.subtotal, o.id
+                    FROM (SELECT * FROM {schema}.orders
+                          WHERE id > ? AND id <= ? AND created_at >= ? AND created_at < ?
+                          ORDER BY id
+                          LIMIT ?) o
+                             LEFT JOIN main.users u ON u.user_id = o.user_id
+                             LEFT JOIN {schema}.order_items i ON i.order_id = o.id
+                    ORDER BY o.id, i.id
+                """, (after_id, high, date_from, date_to, EXPORT_ORDERS_PER_QUERY))
+
+                last_id = None
+                while True:
+                    rows = await cursor.fetchmany(fetch)
+                    if not rows:
+                        break
+                    last_id = rows[-1][-1]
+                    yield [row[:-1] for row in rows]
+                await cursor.close()
+
+                if last_id is None:
+                    break
+                after_id = last_id
+
+
+# ==================== SALES ROLLUPS ====================
+async def _rollup_order(db, order_id: int, sign: int):
+    """Учитывает заказ в дневных агрегатах (sign=1) или убирает его оттуда (sign=-1).
+
+    Вызывается внутри транзакции заказа, день берётся из даты оформления.
+    """
+    await db.execute("""
+        INSERT INTO sales_daily (day, revenue, orders, discount)
+        SELECT date(created_at), ? * final_price, ?, ? * (total_price - final_price)
+        FROM orders WHERE id = ?
+        ON CONFLICT (day) DO UPDATE SET revenue  = revenue + excluded.revenue,
+                                        orders   = orders + excluded.orders,
+                                        discount = discount + excluded.discount
+    """, (sign, sign, sign, order_id))
+    await db.execute("""
+        INSERT INTO sales_daily_products (day, product_name, units, revenue)
+        SELECT date(o.created_at), i.product_name, ? * i.quantity, ? * i.subtotal
+        FROM order_items i JOIN orders o ON o.id = i.order_id
+        WHERE i.order_id = ?
+        ON CONFLICT (day, product_name) DO UPDATE SET units   = units + excluded.units,
+                                                      revenue = revenue + excluded.revenue
+    """, (sign, sign, order_id))
+
+
+async def get_sales_stats(periods=(1, 7, 30), top_days: int = 7, top_limit: int = 5) -> Dict:
+    """Продажи за последние N дней (включая сегодня, по UTC) только из агрегатов"""
+    async with connect() as db:
+        stats = {'periods': {}}
+        for days in periods:
+            cursor = await db.execute("""
+                SELECT COALESCE(SUM(revenue), 0), COALESCE(SUM(orders), 0), COALESCE(SUM(discount), 0)
+                FROM sales_daily
+                WHERE day > date('now', ?)
+            """, (f"-{days} days",))
+            revenue, orders, discount = await cursor.fetchone()
+            stats['periods'][days] = {'revenue': revenue, 'orders': orders, 'discount': discount}
+
+        cursor = await db.execute("""
+            SELECT product_name, SUM(units) AS units, SUM(revenue) AS revenue
+            FROM sales_daily_products
+            WHERE day > date('now', ?)
+            GROUP BY product_name
+            HAVING SUM(units) > 0
+            ORDER BY units DESC, revenue DESC
+            LIMIT ?
+        """, (f"-{top_days} days", top_limit))
+        stats['top'] = [
+            {'product_name': name, 'units': units, 'revenue': revenue}
+            for name, units, revenue in await cursor.fetchall()
+        ]
+        return stats
+
+
+# ==================== RESERVATIONS ====================
+async def load_reservations():
+    """Загрузка активных резервов в индекс в памяти (при старте бота)"""
+    ledger.clear()
+    async with connect() as db:
+        cursor = await db.execute("""
+            SELECT user_id, product_id, quantity, expires_at
+            FROM reservations
+            WHERE expires_at > ?
+        """, (time.time(),))
+        for user_id, product_id, quantity, expires_at in await cursor.fetchall():
+            ledger.set(user_id, product_id, quantity, expires_at)
+    logging.info(f"📌 Загружено активных резервов: {len(ledger)}")
+
+
+async def expire_reservations() -> int:
+    """Снятие просроченных резервов пачками по индексу expires_at"""
+    expired = 0
+    while True:
+        now = time.time()
+        async with connect() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            cursor = await db.execute("""
+                SELECT id, user_id, product_id
+                FROM reservations
+                WHERE expires_at <= ?
+                ORDER BY expires_at
+                LIMIT ?
+            """, (now, ledger.sweep_batch))
+            batch = await cursor.fetchall()
+            if batch:
+                await db.executemany(
+                    "DELETE FROM reservations WHERE id = ?",
+                    [(row[0],) for row in batch]
+                )
             await db.commit()
 
+        for _, user_id, product_id in batch:
+            ledger.expire(user_id, product_id, now)
+        expired += len(batch)
+
+        if len(batch) < ledger.sweep_batch:
+            return expired
+        # Отдаём управление обработчикам между пачками
+        await asyncio.sleep(0)
+
+
+async def run_reservation_sweeper():
+    """Фоновая задача: периодическая очистка просроченных резервов"""
+    while True:
+        try:
+            expired = await expire_reservations()
+            if expired:
+                logging.info(f"⏳ Снято просроченных резервов: {expired}")
+        except Exception as e:
+            logging.error(f"❌ Ошибка очистки резервов: {e}")
+        await asyncio.sleep(ledger.sweep_interval)
+
+
+async def get_maintenance_mode() -> bool:
+    """Получение статуса режима техработ (из кэша, БД читается один раз)"""
+    global _maintenance_mode
+    if _maintenance_mode is not None:
+        flag_cache_stats["hits"] += 1
+        return _maintenance_mode
+
+    flag_cache_stats["misses"] += 1
+    try:
+        async with connect() as db:
             cursor = await db.execute(
                 "SELECT value FROM settings WHERE key = 'maintenance_mode'"
             )
             result = await cursor.fetchone()
-            return result[0] == '1' if result else False
+            _maintenance_mode = result[0] == '1' if result else False
+            return _maintenance_mode
     except Exception as e:
         logging.error(f"❌ Ошибка получения статуса техработ: {e}")
         return False
@@ -840,29 +1986,18 @@ async def get_maintenance_mode() -> bool:
 
 async def set_maintenance_mode(enabled: bool) -> bool:
     """Установка режима техработ"""
+    global _maintenance_mode
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
-            # Создаем таблицу если не существует
-            await db.execute("""
-                             CREATE TABLE IF NOT EXISTS settings
-                             (
-                                 key
-                                 TEXT
-                                 PRIMARY
-                                 KEY,
-                                 value
-                                 TEXT
-                             )
-                             """)
-
+        async with connect() as db:
             await db.execute("""
                 INSERT OR REPLACE INTO settings (key, value) 
                 VALUES ('maintenance_mode', ?)
             """, ('1' if enabled else '0'))
             await db.commit()
 
-            logging.info(f"🔧 Режим техработ: {'включен' if enabled else 'выключен'}")
-            return True
+        _maintenance_mode = enabled
+        logging.info(f"🔧 Режим техработ: {'включен' if enabled else 'выключен'}")
+        return True
     except Exception as e:
         logging.error(f"❌ Ошибка установки режима техработ: {e}")
-        return False
\ No newline at end of file
+        return False
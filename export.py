@@ -0,0 +1,44 @@
+import asyncio
+import csv
+import gzip
+import os
+import tempfile
+from typing import Tuple
+
+import database as db
+
+CSV_DELIMITER = ";"              # Excel в русской локали ждёт ";"
+CSV_ENCODING = "utf-8-sig"       # BOM: Excel сам распознаёт UTF-8
+
+
+# ==================== ВЫГРУЗКА ЗАКАЗОВ ====================
+def _open_export(path: str, compress: bool):
+    if compress:
+        return gzip.open(path, "wt", encoding=CSV_ENCODING, newline="")
+    return open(path, "w", encoding=CSV_ENCODING, newline="")
+
+
+async def export_orders_csv(date_from: str, date_to: str, compress: bool = False) -> Tuple[str, int]:
+    """CSV заказов с позициями за [date_from, date_to) во временный файл.
+
+    Строки приходят из БД порциями и сразу пишутся на диск в отдельном потоке:
+    память не растёт с размером выгрузки, цикл событий не блокируется.
+    Возвращает путь к файлу (удаляет вызывающий) и число строк.
+    """
+    fd, path = tempfile.mkstemp(prefix="orders_", suffix=".csv.gz" if compress else ".csv")
+    os.close(fd)
+    rows_written = 0
+    try:
+        output = await asyncio.to_thread(_open_export, path, compress)
+        try:
+            writer = csv.writer(output, delimiter=CSV_DELIMITER)
+            await asyncio.to_thread(writer.writerow, db.EXPORT_COLUMNS)
+            async for rows in db.iter_order_export(date_from, date_to):
+                await asyncio.to_thread(writer.writerows, rows)
+                rows_written += len(rows)
+        finally:
+            await asyncio.to_thread(output.close)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, rows_written
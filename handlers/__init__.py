@@ -0,0 +1,17 @@
+from aiogram import Router
+
+from middlewares import AccessMiddleware
+from handlers import admin, cart, checkout, user
+
+
+def setup_routers() -> Router:
+    """Сборка роутеров: техработы проверяются один раз на весь магазин (ЧС - BanMiddleware в main.py)"""
+    shop = Router(name="shop")
+    shop.message.outer_middleware(AccessMiddleware())
+    shop.callback_query.outer_middleware(AccessMiddleware())
+    shop.inline_query.outer_middleware(AccessMiddleware())
+    shop.include_routers(user.router, cart.router, checkout.router)
+
+    root = Router(name="root")
+    root.include_routers(shop, admin.router)
+    return root
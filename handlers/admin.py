@@ -0,0 +1,1334 @@
+import datetime
+import html
+import logging
+import os
+import tempfile
+from typing import Optional, Tuple
+
+from aiogram import Bot, F, Router, types
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.types import FSInputFile, InlineKeyboardButton, KeyboardButton
+from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
+
+import database as db
+import keyboards as kb
+import profiler
+from callbacks import (
+    BonusAction, BonusCallback, CallbackRouter, MaintenanceCallback, MenuCallback,
+    MenuTarget, OrderAction, OrderCallback, ProductAction, ProductCallback, ProductPickAction,
+    ProductPickCallback, ProductPicker, ProductView, StockAction, StockCallback, UserPickAction,
+    UserPickCallback, UserPicker,
+)
+from config import ADMIN_ID, ORDER_ARCHIVE_DAYS
+from export import export_orders_csv
+from importer import IMPORT_MAX_BYTES, import_products
+from maintenance import maintenance
+from metrics import db_metrics, handler_latency
+from middlewares import IsAdmin, filter_stats
+from rendering import render_stock_card
+from states import AdminStates
+from throttling import throttle
+
+# Проверка прав выполняется один раз на апдейт фильтром роутера
+router = Router(name="admin")
+router.message.filter(IsAdmin())
+router.callback_query.filter(IsAdmin())
+callbacks = CallbackRouter(router)
+
+
+# ==================== ADMIN PANEL ====================
+@router.message(F.text == "⚙️ Админ-панель")
+async def admin_panel(message: types.Message):
+    user_id = message.from_user.id
+
+    # Если это главный админ (ADMIN_ID), но его нет в БД — добавляем
+    if user_id == ADMIN_ID and not await db.is_admin(user_id):
+        await db.add_admin(user_id)
+        logging.info(f"✅ Главный админ {user_id} добавлен в базу данных")
+
+    await message.answer(
+        "⚙️ <b>Панель администратора</b>\n\nВыберите действие:",
+        reply_markup=kb.get_admin_keyboard(),
+        parse_mode="HTML"
+    )
+
+
+# ==================== ПИКЕРЫ ТОВАРОВ ====================
+PRODUCT_PICKER_TITLES = {
+    ProductPicker.price: "💰 <b>Выберите товар для изменения цены:</b>",
+    ProductPicker.delete: "🗑️ <b>Выберите товар для удаления:</b>",
+    ProductPicker.stock: (
+        "📦 <b>Выберите товар для пополнения</b>\n"
+        "или отправьте список строками <code>Название: +10</code> (<code>=50</code> - точный остаток):"
+    ),
+}
+PRODUCT_VIEW_TITLES = {
+    ProductView.low: f"⚠️ Мало на складе (до {db.LOW_STOCK} шт.)",
+    ProductView.out: "⛔ Нет в наличии",
+}
+
+
+async def product_picker_page(state: FSMContext, picker: ProductPicker, view: ProductView = ProductView.all,
+                              query: str = "", cursor=None):
+    """Одна страница пикера товаров; фильтр, запрос и курсоры - в FSM"""
+    products, next_cursor = await db.get_admin_products_page(view.value, query, cursor)
+    await state.update_data(product_picker=picker.value, product_view=view.value, product_query=query,
+                            product_page=cursor, product_cursor=next_cursor)
+
+    text = PRODUCT_PICKER_TITLES[picker]
+    if view in PRODUCT_VIEW_TITLES:
+        text += f"\n{PRODUCT_VIEW_TITLES[view]}"
+    if query:
+        text += f"\n🔍 Поиск: «{html.escape(query)}»"
+    if not products:
+        text += "\n\n📭 Товаров не найдено"
+    keyboard = kb.get_admin_product_picker_keyboard(picker, products, next_cursor is not None, view, bool(query))
+    return text, keyboard
+
+
+async def refresh_product_picker(callback: types.CallbackQuery, state: FSMContext, picker: ProductPicker):
+    """Вернуться к текущей странице пикера (после удаления, из карточки товара)"""
+    data = await state.get_data()
+    if data.get('product_picker') != picker.value:
+        data = {}
+    text, keyboard = await product_picker_page(
+        state, picker, ProductView(data.get('product_view', ProductView.all.value)),
+        data.get('product_query', ""), data.get('product_page')
+    )
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@callbacks.on(ProductPickCallback, ProductPickAction.more)
+async def admin_product_picker_more(callback: types.CallbackQuery, state: FSMContext,
+                                    callback_data: ProductPickCallback):
+    """Следующая страница пикера товаров"""
+    data = await state.get_data()
+    if data.get('product_picker') != callback_data.picker.value or data.get('product_cursor') is None:
+        await callback.answer("Больше товаров нет")
+        return
+
+    text, keyboard = await product_picker_page(
+        state, callback_data.picker, callback_data.view, data['product_query'], data['product_cursor']
+    )
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    await callback.answer()
+
+
+@callbacks.on(ProductPickCallback, ProductPickAction.view)
+async def admin_product_picker_view(callback: types.CallbackQuery, state: FSMContext,
+                                    callback_data: ProductPickCallback):
+    """Фильтр по остатку: первая страница без поиска"""
+    text, keyboard = await product_picker_page(state, callback_data.picker, callback_data.view)
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    await callback.answer()
+
+
+@callbacks.on(ProductPickCallback, ProductPickAction.search)
+async def admin_product_picker_search(callback: types.CallbackQuery, state: FSMContext,
+                                      callback_data: ProductPickCallback):
+    """Запрос названия для поиска товара"""
+    await state.update_data(product_picker=callback_data.picker.value, product_view=callback_data.view.value)
+    await state.set_state(AdminStates.picking_product)
+    await callback.message.answer("🔍 Введите название товара или его часть (например, <code>худи чёрн</code>):",
+                                  parse_mode="HTML")
+    await callback.answer()
+
+
+@router.message(AdminStates.picking_product, F.text)
+async def admin_product_picker_input(message: types.Message, state: FSMContext):
+    """Результаты поиска товара"""
+    data = await state.get_data()
+    picker = ProductPicker(data['product_picker'])
+    await state.set_state(AdminStates.adding_stock if picker is ProductPicker.stock else None)
+    text, keyboard = await product_picker_page(
+        state, picker, ProductView(data['product_view']), message.text.strip()
+    )
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+# ==================== ТОВАРЫ ====================
+IMPORT_FORMATS = {".csv": "csv", ".json": "json", ".jsonl": "json"}
+STOCK_INPUT = r"^\s*[+\-=]?\d{1,6}\s*$"
+STOCK_BATCH = r"^(?:[^\n]+:\s*[+\-=]?\d{1,6}\s*(?:\n|$))+$"
+STOCK_BATCH_MAX = 100
+
+
+@router.message(F.text == "💰 Изменить цену")
+async def admin_change_price_start(message: types.Message, state: FSMContext):
+    """Начало изменения цены - показываем первую страницу товаров"""
+    text, keyboard = await product_picker_page(state, ProductPicker.price)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+    await state.set_state(AdminStates.changing_price)
+
+
+@callbacks.on(ProductCallback, ProductAction.price)
+async def admin_price_product_select(callback: types.CallbackQuery, state: FSMContext,
+                                     callback_data: ProductCallback):
+    """Выбор товара для изменения цены"""
+    product_id = callback_data.product_id
+    product = await db.get_product(product_id)
+
+    if not product:
+        await callback.answer("Товар не найден", show_alert=True)
+        return
+
+    # Сохраняем ID товара в состоянии
+    await state.update_data(product_id=product_id, product_name=product.name)
+
+    text = (
+        f"💰 <b>Изменение цены товара</b>\n\n"
+        f"📦 <b>{product.name}</b>\n"
+        f"💰 Текущая цена: {product.price}₽\n\n"
+        f"💵 Введите новую цену:\n"
+        f"Или нажмите кнопку 'Назад' под сообщением"
+    )
+
+    # ✅ ИСПОЛЬЗУЕМ answer() вместо edit_text() для отправки нового сообщения
+    await callback.message.answer(
+        text,
+        reply_markup=kb.get_back_reply_keyboard(),
+        parse_mode="HTML"
+    )
+
+    # ✅ Отвечаем на callback
+    await callback.answer()
+
+    # ✅ Устанавливаем состояние
+    await state.set_state(AdminStates.changing_price_input)
+
+
+@router.message(AdminStates.changing_price_input)
+async def admin_price_change_process(message: types.Message, state: FSMContext):
+    """Процесс изменения цены"""
+    if message.text == "🔙 Назад в меню":
+        await state.clear()
+        await message.answer(
+            "⚙️ <b>Панель администратора</b>\n\nВыберите действие:",
+            reply_markup=kb.get_admin_keyboard(),
+            parse_mode="HTML"
+        )
+        return
+
+    if not message.text.isdigit():
+        await message.answer("❌ Введите корректную цену (число больше 0):")
+        return
+
+    new_price = int(message.text)
+    if new_price <= 0:
+        await message.answer("❌ Цена должна быть больше 0:")
+        return
+
+    # Получаем данные из состояния
+    data = await state.get_data()
+    product_id = data.get('product_id')
+    product_name = data.get('product_name')
+
+    if not product_id:
+        await message.answer("❌ Ошибка: товар не выбран", reply_markup=kb.get_admin_keyboard())
+        await state.clear()
+        return
+
+    # Обновляем цену в БД
+    await db.update_price(product_id, new_price)
+
+    await message.answer(
+        f"✅ <b>Цена товара \"{product_name}\" изменена!</b>\n\n"
+        f"💰 Старая цена: не указана\n"
+        f"💵 <b>Новая цена: {new_price}₽</b>",
+        reply_markup=kb.get_admin_keyboard(),
+        parse_mode="HTML"
+    )
+
+    await state.clear()
+
+
+@router.message(F.text == "➕ Добавить товар")
+async def admin_add_product_start(message: types.Message, state: FSMContext):
+    """Начало добавления товара"""
+    await message.answer(
+        "📝 Введите название товара:",
+        reply_markup=kb.get_back_reply_keyboard()
+    )
+    await state.update_data(step="name")
+    await state.set_state(AdminStates.adding_product)
+
+
+@router.message(AdminStates.adding_product)
+async def admin_add_product_process(message: types.Message, state: FSMContext):
+    """Процесс добавления товара"""
+    data = await state.get_data()
+    step = data.get("step")
+
+    if step == "name":
+        await state.update_data(name=message.text, step="description")
+        await message.answer("📝 Введите описание товара:")
+
+    elif step == "description":
+        await state.update_data(description=message.text, step="price")
+        await message.answer("💰 Введите цену товара (в рублях):")
+
+    elif step == "price":
+        if not message.text.isdigit():
+            await message.answer("❌ Введите корректное число:")
+            return
+        await state.update_data(price=int(message.text), step="stock")
+        await message.answer("📦 Введите количество товара:")
+
+    elif step == "stock":
+        if not message.text.isdigit():
+            await message.answer("❌ Введите корректное число:")
+            return
+
+        data = await state.get_data()
+        success = await db.add_product(
+            name=data['name'],
+            description=data['description'],
+            price=data['price'],
+            stock=int(message.text)
+        )
+
+        if success:
+            await message.answer(f"✅ Товар \"{data['name']}\" добавлен!", reply_markup=kb.get_admin_keyboard())
+        else:
+            await message.answer("❌ Товар с таким названием уже существует!", reply_markup=kb.get_admin_keyboard())
+
+        await state.clear()
+
+
+@router.message(F.text == "📥 Импорт товаров")
+async def admin_import_products_start(message: types.Message, state: FSMContext):
+    """Начало импорта товаров из файла"""
+    await message.answer(
+        "📥 <b>Импорт товаров</b>\n\n"
+        "Отправьте файл CSV или JSON (до 20 МБ).\n\n"
+        "<b>CSV</b> - заголовок <code>name;description;price;stock</code> (разделитель ; или ,), "
+        "колонка description необязательна.\n"
+        "<b>JSON</b> - массив объектов или по объекту на строку:\n"
+        "<code>{\"name\": \"Худи\", \"price\": 3500, \"stock\": 10}</code>\n\n"
+        "Товары ищутся по названию: новые добавляются, у существующих меняются цена и остаток "
+        "(и описание, если указано).",
+        reply_markup=kb.get_back_reply_keyboard(),
+        parse_mode="HTML"
+    )
+    await state.set_state(AdminStates.importing_products)
+
+
+@router.message(AdminStates.importing_products, F.document)
+async def admin_import_products_file(message: types.Message, state: FSMContext, bot: Bot):
+    """Загрузка присланного файла"""
+    document = message.document
+    extension = os.path.splitext(document.file_name or "")[1].lower()
+    if extension not in IMPORT_FORMATS:
+        await message.answer("❌ Нужен файл .csv, .json или .jsonl")
+        return
+    if document.file_size and document.file_size > IMPORT_MAX_BYTES:
+        await message.answer(f"❌ Файл больше {IMPORT_MAX_BYTES // 1048576} МБ")
+        return
+
+    await message.answer("⏳ Загружаю товары...")
+    fd, path = tempfile.mkstemp(prefix="import_", suffix=extension)
+    os.close(fd)
+    try:
+        await bot.download(document, destination=path)
+        report = await import_products(path, IMPORT_FORMATS[extension])
+    except Exception as e:
+        logging.error(f"❌ Ошибка импорта товаров: {e}")
+        await state.clear()
+        await message.answer(
+            "❌ Импорт прерван из-за ошибки. Уже загруженные порции сохранены, "
+            "проверьте каталог и пришлите файл ещё раз.",
+            reply_markup=kb.get_admin_keyboard()
+        )
+        return
+    finally:
+        os.remove(path)
+    await state.clear()
+
+    logging.info(
+        f"📥 Импорт товаров: добавлено {report['inserted']}, обновлено {report['updated']}, "
+        f"отклонено {report['rejected']}"
+    )
+    text = (
+        f"📥 <b>Импорт завершён</b>\n\n"
+        f"➕ Добавлено: {report['inserted']}\n"
+        f"✏️ Обновлено: {report['updated']}\n"
+        f"➖ Без изменений: {report['unchanged']}\n"
+        f"❌ Отклонено: {report['rejected']}\n"
+    )
+    if report['errors']:
+        text += "\n<b>Ошибки:</b>\n" + "\n".join(html.escape(error) for error in report['errors'])
+    await message.answer(text, reply_markup=kb.get_admin_keyboard(), parse_mode="HTML")
+
+
+@router.message(AdminStates.importing_products, F.text != "🔙 Назад в меню")
+async def admin_import_products_wrong(message: types.Message):
+    """Вместо файла пришло что-то другое"""
+    await message.answer("📎 Отправьте файл .csv или .json документом или нажмите «🔙 Назад в меню»")
+
+
+@router.message(F.text == "🗑️ Удалить товар")
+async def admin_delete_product_start(message: types.Message, state: FSMContext):
+    """Начало удаления товара - показываем первую страницу товаров"""
+    text, keyboard = await product_picker_page(state, ProductPicker.delete)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+    await state.set_state(AdminStates.deleting_product)
+
+
+@callbacks.on(ProductCallback, ProductAction.delete)
+async def admin_delete_product_confirm(callback: types.CallbackQuery, state: FSMContext,
+                                       callback_data: ProductCallback):
+    """Подтверждение удаления товара"""
+    product_id = callback_data.product_id
+    product = await db.get_product(product_id)
+
+    if not product:
+        await callback.answer("❌ Товар не найден", show_alert=True)
+        return
+
+    # Показываем информацию о товаре и спрашиваем подтверждение
+    text = (
+        f"🗑️ <b>Удаление товара</b>\n\n"
+        f"📦 <b>{product.name}</b>\n"
+        f"📝 {product.description or 'Описание отсутствует'}\n"
+        f"💰 Цена: {product.price}₽\n"
+        f"📊 Остаток: {product.stock} шт.\n\n"
+        f"⚠️ <b>Вы уверены, что хотите удалить этот товар?</b>\n"
+        f"Это действие нельзя отменить!"
+    )
+
+    # Клавиатура с подтверждением
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(
+            text="✅ Да, удалить",
+            callback_data=ProductCallback(action=ProductAction.delete_confirm, product_id=product_id).pack()
+        ),
+        InlineKeyboardButton(
+            text="❌ Отмена",
+            callback_data=ProductCallback(action=ProductAction.delete_cancel).pack()
+        )
+    )
+    builder.row(InlineKeyboardButton(
+        text="🔙 К товарам",
+        callback_data=ProductCallback(action=ProductAction.delete_menu).pack()
+    ))
+
+    await callback.message.edit_text(
+        text,
+        reply_markup=builder.as_markup(),
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+
+@callbacks.on(ProductCallback, ProductAction.delete_confirm)
+async def admin_delete_product_execute(callback: types.CallbackQuery, state: FSMContext,
+                                       callback_data: ProductCallback):
+    """Фактическое удаление товара"""
+    product_id = callback_data.product_id
+    product = await db.get_product(product_id)
+
+    if not product:
+        await callback.answer("❌ Товар не найден", show_alert=True)
+        return
+
+    # Удаляем товар
+    await db.remove_product(product_id)
+
+    await callback.answer(f"✅ Товар \"{product.name}\" удалён!", show_alert=True)
+
+    # Показываем обновлённую страницу товаров
+    await refresh_product_picker(callback, state, ProductPicker.delete)
+
+
+@callbacks.on(ProductCallback, ProductAction.delete_cancel)
+async def admin_delete_cancel(callback: types.CallbackQuery, state: FSMContext):
+    """Отмена удаления"""
+    await callback.answer("❌ Удаление отменено", show_alert=False)
+    await refresh_product_picker(callback, state, ProductPicker.delete)
+
+
+@callbacks.on(ProductCallback, ProductAction.delete_menu)
+async def admin_delete_menu_back(callback: types.CallbackQuery, state: FSMContext):
+    """Возврат к меню удаления товаров"""
+    await refresh_product_picker(callback, state, ProductPicker.delete)
+    await callback.answer()
+
+
+@router.message(F.text == "📦 Пополнить товар")
+async def admin_add_stock_start(message: types.Message, state: FSMContext):
+    """Начало пополнения товара - показываем первую страницу товаров"""
+    text, keyboard = await product_picker_page(state, ProductPicker.stock)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+    await state.set_state(AdminStates.adding_stock)
+
+
+@callbacks.on(StockCallback, StockAction.view)
+async def admin_stock_product_view(callback: types.CallbackQuery, state: FSMContext,
+                                   callback_data: StockCallback):
+    """Просмотр информации о товаре для пополнения"""
+    product_id = callback_data.product_id
+    product = await db.get_product(product_id)
+
+    if not product:
+        await callback.answer("❌ Товар не найден", show_alert=True)
+        return
+
+    # Сохраняем ID товара в состоянии: следующее число в чате меняет его остаток
+    await state.update_data(product_id=product_id, product_name=product.name)
+    await state.set_state(AdminStates.adding_stock)
+
+    await callback.message.edit_text(
+        render_stock_card(product),
+        reply_markup=kb.get_admin_stock_keyboard(product_id, product.stock),
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+
+@callbacks.on(StockCallback, StockAction.add)
+async def admin_stock_add(callback: types.CallbackQuery, state: FSMContext,
+                          callback_data: StockCallback):
+    """Добавление 1 штуки к товару"""
+    product = await db.adjust_stock(callback_data.product_id, 1)
+    if not product:
+        await callback.answer("❌ Товар не найден", show_alert=True)
+        return
+
+    await callback.answer(f"✅ Добавлено! Теперь: {product.stock} шт.", show_alert=False)
+    await callback.message.edit_text(
+        render_stock_card(product),
+        reply_markup=kb.get_admin_stock_keyboard(product.id, product.stock),
+        parse_mode="HTML"
+    )
+
+
+@callbacks.on(StockCallback, StockAction.dec)
+async def admin_stock_decrease(callback: types.CallbackQuery, state: FSMContext,
+                               callback_data: StockCallback):
+    """Удаление 1 штуки из товара"""
+    # Условие stock - 1 >= 0 проверяется в том же UPDATE: два быстрых нажатия не уведут остаток в минус
+    product = await db.adjust_stock(callback_data.product_id, -1)
+    if not product:
+        await callback.answer("⚠️ Нельзя удалить, остаток 0!", show_alert=True)
+        return
+
+    await callback.answer(f"✅ Удалено! Теперь: {product.stock} шт.", show_alert=False)
+    await callback.message.edit_text(
+        render_stock_card(product),
+        reply_markup=kb.get_admin_stock_keyboard(product.id, product.stock),
+        parse_mode="HTML"
+    )
+
+
+def parse_stock_change(text: str) -> Tuple[bool, int]:
+    """«+50» / «50» - прибавить, «-3» - убавить, «=120» - задать точно"""
+    text = text.strip()
+    if text.startswith("="):
+        return True, int(text[1:])
+    return False, int(text)
+
+
+@router.message(AdminStates.adding_stock, F.text.regexp(STOCK_INPUT))
+async def admin_stock_input(message: types.Message, state: FSMContext):
+    """Изменение остатка открытого товара на введённое число"""
+    data = await state.get_data()
+    product_id = data.get('product_id')
+    if not product_id:
+        await message.answer("❌ Сначала выберите товар или отправьте список «Название: +10»")
+        return
+
+    exact, value = parse_stock_change(message.text)
+    if exact:
+        product = await db.set_stock(product_id, value)
+    else:
+        product = await db.adjust_stock(product_id, value)
+    if not product:
+        await message.answer(f"❌ Нельзя: остаток ушёл бы в минус ({html.escape(message.text.strip())})")
+        return
+
+    await message.answer(
+        render_stock_card(product),
+        reply_markup=kb.get_admin_stock_keyboard(product.id, product.stock),
+        parse_mode="HTML"
+    )
+
+
+@router.message(AdminStates.adding_stock, F.text.regexp(STOCK_BATCH))
+async def admin_stock_batch(message: types.Message):
+    """Пакетное пополнение: строки «Название: +10», одна транзакция на сообщение"""
+    lines = [line for line in message.text.splitlines() if line.strip()]
+    if len(lines) > STOCK_BATCH_MAX:
+        await message.answer(f"❌ Не больше {STOCK_BATCH_MAX} строк за раз")
+        return
+
+    changes = []
+    for line in lines:
+        name, change = line.rsplit(":", 1)
+        exact, value = parse_stock_change(change)
+        changes.append((name.strip(), exact, value))
+    results = await db.adjust_stock_batch(changes)
+
+    report = []
+    for (name, exact, value), stock in zip(changes, results):
+        change = f"={value}" if exact else f"{value:+d}"
+        if stock is None:
+            report.append(f"❌ {html.escape(name)} ({change}): нет товара или остаток ушёл бы в минус")
+        else:
+            report.append(f"✅ {html.escape(name)} ({change}): теперь {stock} шт.")
+    applied = sum(stock is not None for stock in results)
+    await message.answer(
+        f"📦 <b>Остатки обновлены: {applied} из {len(changes)}</b>\n\n" + "\n".join(report),
+        parse_mode="HTML"
+    )
+
+
+@callbacks.on(StockCallback, StockAction.menu)
+async def admin_stock_menu_back(callback: types.CallbackQuery, state: FSMContext):
+    """Возврат к списку товаров для пополнения"""
+    await refresh_product_picker(callback, state, ProductPicker.stock)
+    await callback.answer()
+
+
+@callbacks.on(MenuCallback, MenuTarget.admin)
+async def admin_menu_back(callback: types.CallbackQuery, state: FSMContext):
+    """Возврат в админ-панель"""
+    await state.clear()
+
+    # ✅ ПРАВИЛЬНО: Удаляем сообщение и отправляем новое с ReplyKeyboard
+    await callback.message.delete()
+
+    await callback.message.answer(
+        "⚙️ <b>Панель администратора</b>\n\nВыберите действие:",
+        reply_markup=kb.get_admin_keyboard(),
+        parse_mode="HTML"
+    )
+
+    await callback.answer()
+
+
+@router.message(AdminStates.changing_price)
+async def admin_change_price(message: types.Message, state: FSMContext):
+    """Изменение цены товара"""
+    if not message.text.isdigit():
+        await message.answer("❌ Введите корректное число:")
+        return
+
+    data = await state.get_data()
+    product_id = data.get('product_id')
+
+    if product_id:
+        product = await db.get_product(product_id)
+        await db.update_price(product_id, int(message.text))
+        await message.answer(
+            f"✅ Цена товара \"{product.name}\" изменена на {message.text}₽",
+            reply_markup=kb.get_admin_keyboard()
+        )
+
+    await state.clear()
+
+
+# ==================== ПИКЕРЫ ПОЛЬЗОВАТЕЛЕЙ ====================
+# picker -> (выборка database.USER_FILTERS, заголовок страницы)
+USER_PICKERS = {
+    UserPicker.bonus: ("all", "🎁 <b>Система бонусов</b>\n\nВыберите пользователя:"),
+    UserPicker.admin_add: ("not_admins", "➕ <b>Новый администратор</b>\n\nВыберите пользователя:"),
+    UserPicker.admin_remove: ("admins", "➖ <b>Администраторы</b>\n\nНажмите на админа, чтобы снять права:"),
+    UserPicker.ban: ("not_banned", "🚫 <b>Добавить в ЧС</b>\n\nВыберите пользователя:"),
+    UserPicker.unban: ("banned", "✅ <b>Черный список</b>\n\nНажмите на пользователя, чтобы разблокировать:"),
+}
+USER_SEARCH_HELP = (
+    "🔍 <b>Поиск пользователя</b>\n\n"
+    "Отправьте одно из:\n"
+    "• ID: <code>123456789</code>\n"
+    "• начало username: <code>@ivan</code>\n"
+    "• начало имени: <code>Иван</code>"
+)
+
+
+async def user_picker_page(state: FSMContext, picker: UserPicker, query: str = "", cursor=None):
+    """Одна страница пикера; запрос и курсоры - в FSM, в callback_data только действие"""
+    kind, title = USER_PICKERS[picker]
+    users, next_cursor = await db.search_users(kind, query, cursor)
+    await state.update_data(user_picker=picker.value, user_query=query,
+                            user_page=cursor, user_cursor=next_cursor)
+
+    if query:
+        found = "" if users else "\n\n😔 Никого не найдено"
+        title = f"{title}\n🔍 Поиск: «{html.escape(query)}»{found}"
+    elif not users:
+        title = f"{title}\n\nСписок пуст"
+    return title, kb.get_user_picker_keyboard(picker, users, next_cursor is not None, bool(query))
+
+
+async def picker_state(state: FSMContext, picker: UserPicker) -> dict:
+    """Состояние пикера из FSM; от другого пикера не наследуем"""
+    data = await state.get_data()
+    if data.get('user_picker') != picker.value:
+        return {}
+    return data
+
+
+async def refresh_user_picker(callback: types.CallbackQuery, state: FSMContext, picker: UserPicker):
+    """Перерисовать текущую страницу после действия с пользователем"""
+    data = await picker_state(state, picker)
+    text, keyboard = await user_picker_page(state, picker, data.get('user_query', ""), data.get('user_page'))
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@callbacks.on(UserPickCallback, UserPickAction.more)
+async def admin_user_picker_more(callback: types.CallbackQuery, state: FSMContext,
+                                 callback_data: UserPickCallback):
+    """Следующая страница пикера"""
+    data = await picker_state(state, callback_data.picker)
+    if data.get('user_cursor') is None:
+        await callback.answer("Больше пользователей нет")
+        return
+
+    text, keyboard = await user_picker_page(state, callback_data.picker, data['user_query'], data['user_cursor'])
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    await callback.answer()
+
+
+@callbacks.on(UserPickCallback, UserPickAction.reset)
+async def admin_user_picker_reset(callback: types.CallbackQuery, state: FSMContext,
+                                  callback_data: UserPickCallback):
+    """Сброс поиска: первая страница"""
+    text, keyboard = await user_picker_page(state, callback_data.picker)
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    await callback.answer()
+
+
+@callbacks.on(UserPickCallback, UserPickAction.search)
+async def admin_user_picker_search(callback: types.CallbackQuery, state: FSMContext,
+                                   callback_data: UserPickCallback):
+    """Запрос текста для поиска пользователя"""
+    await state.update_data(user_picker=callback_data.picker.value)
+    await state.set_state(AdminStates.picking_user)
+    await callback.message.answer(USER_SEARCH_HELP, parse_mode="HTML")
+    await callback.answer()
+
+
+@router.message(AdminStates.picking_user, F.text)
+async def admin_user_picker_input(message: types.Message, state: FSMContext):
+    """Результаты поиска пользователя"""
+    await state.set_state(None)
+    picker = UserPicker((await state.get_data())['user_picker'])
+    text, keyboard = await user_picker_page(state, picker, message.text.strip())
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+def users_reply_keyboard(add_text: str):
+    builder = ReplyKeyboardBuilder()
+    builder.row(KeyboardButton(text=add_text))
+    builder.row(KeyboardButton(text="🔙 Назад"))
+    return builder.as_markup(resize_keyboard=True)
+
+
+# ==================== АДМИНЫ ====================
+@router.message(F.text.in_({"👥 Список админов", "➖ Удалить админа"}))
+async def admin_list(message: types.Message, state: FSMContext):
+    """Список администраторов (постранично, нажатие снимает права)"""
+    count = await db.count_users("admins")
+    await message.answer(f"👥 <b>Администраторов:</b> {count}",
+                         reply_markup=users_reply_keyboard("➕ Добавить админа"), parse_mode="HTML")
+    text, keyboard = await user_picker_page(state, UserPicker.admin_remove)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@router.message(F.text == "➕ Добавить админа")
+async def admin_add_admin_start(message: types.Message, state: FSMContext):
+    """Выбор пользователя для назначения админом"""
+    text, keyboard = await user_picker_page(state, UserPicker.admin_add)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@callbacks.on(UserPickCallback, UserPickAction.pick, UserPicker.admin_add)
+async def admin_add_admin_pick(callback: types.CallbackQuery, state: FSMContext,
+                               callback_data: UserPickCallback):
+    """Назначение админа"""
+    await db.add_admin(callback_data.user_id)
+    await callback.answer(f"✅ Пользователь {callback_data.user_id} добавлен в админы!", show_alert=True)
+    await refresh_user_picker(callback, state, UserPicker.admin_add)
+
+
+@callbacks.on(UserPickCallback, UserPickAction.pick, UserPicker.admin_remove)
+async def admin_remove_admin_pick(callback: types.CallbackQuery, state: FSMContext,
+                                  callback_data: UserPickCallback):
+    """Снятие прав админа"""
+    await db.remove_admin(callback_data.user_id)
+    await callback.answer(f"✅ Пользователь {callback_data.user_id} удалён из админов!", show_alert=True)
+    await refresh_user_picker(callback, state, UserPicker.admin_remove)
+
+
+# ==================== БОНУСЫ ====================
+@router.message(F.text == "🎁 Система бонусов")
+async def admin_bonuses_menu(message: types.Message, state: FSMContext):
+    """Меню системы бонусов"""
+    text, keyboard = await user_picker_page(state, UserPicker.bonus)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@callbacks.on(MenuCallback, MenuTarget.admin_bonuses)
+async def menu_admin_bonuses(callback: types.CallbackQuery, state: FSMContext):
+    """Возврат к выбору пользователя для бонусов"""
+    await refresh_user_picker(callback, state, UserPicker.bonus)
+    await callback.answer()
+
+
+@callbacks.on(UserPickCallback, UserPickAction.pick, UserPicker.bonus)
+async def admin_bonus_user(callback: types.CallbackQuery, callback_data: UserPickCallback):
+    """Выбор пользователя для работы с бонусами"""
+    await callback.message.edit_reply_markup(
+        reply_markup=kb.get_bonus_actions_keyboard(callback_data.user_id)
+    )
+    await callback.answer()
+
+
+@callbacks.on(BonusCallback, BonusAction.add)
+async def admin_bonus_add(callback: types.CallbackQuery, state: FSMContext,
+                          callback_data: BonusCallback):
+    """Добавление бонуса пользователю"""
+    target_user_id = callback_data.value
+    await state.update_data(target_user_id=target_user_id)
+    await callback.message.answer("🎁 Введите размер скидки в процентах (например, 10 для 10%):")
+    await state.set_state(AdminStates.adding_bonus)
+    await callback.answer()
+
+
+@router.message(AdminStates.adding_bonus)
+async def admin_bonus_add_process(message: types.Message, state: FSMContext):
+    """Процесс добавления бонуса"""
+    if not message.text.isdigit() or not (0 <= int(message.text) <= 100):
+        await message.answer("❌ Введите корректный процент (0-100):")
+        return
+
+    data = await state.get_data()
+    target_user_id = data.get('target_user_id')
+
+    if target_user_id:
+        await db.add_bonus(target_user_id, int(message.text))
+        await message.answer(
+            f"✅ Скидка {message.text}% добавлена пользователю {target_user_id}!",
+            reply_markup=kb.get_admin_keyboard()
+        )
+
+    await state.clear()
+
+
+@callbacks.on(BonusCallback, BonusAction.remove)
+async def admin_bonus_remove(callback: types.CallbackQuery, callback_data: BonusCallback):
+    """Удаление всех активных скидок пользователя"""
+    target_user_id = callback_data.value
+
+    # Получаем все бонусы пользователя
+    bonuses = await db.get_user_bonuses(target_user_id)
+
+    if not bonuses:
+        await callback.answer("❌ У пользователя нет бонусов", show_alert=True)
+        return
+
+    # Удаляем все бонусы
+    removed_count = 0
+    for bonus in bonuses:
+        if bonus.is_active:
+            await db.remove_bonus(bonus.id)
+            removed_count += 1
+
+    await callback.answer(f"✅ Удалено {removed_count} скидок", show_alert=True)
+
+    # Обновляем клавиатуру
+    await callback.message.edit_reply_markup(
+        reply_markup=kb.get_bonus_actions_keyboard(target_user_id)
+    )
+
+
+# ==================== ЧЕРНЫЙ СПИСОК ====================
+@router.message(F.text.in_({"🚫 ЧС пользователей", "➖ Удалить из ЧС"}))
+async def admin_blacklist(message: types.Message, state: FSMContext):
+    """Черный список (постранично, нажатие разблокирует)"""
+    count = await db.count_users("banned")
+    await message.answer(f"🚫 <b>В черном списке:</b> {count}",
+                         reply_markup=users_reply_keyboard("➕ Добавить в ЧС"), parse_mode="HTML")
+    text, keyboard = await user_picker_page(state, UserPicker.unban)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@router.message(F.text == "➕ Добавить в ЧС")
+async def admin_ban_start(message: types.Message, state: FSMContext):
+    """Выбор пользователя для блокировки"""
+    text, keyboard = await user_picker_page(state, UserPicker.ban)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@callbacks.on(UserPickCallback, UserPickAction.pick, UserPicker.ban)
+async def admin_ban_pick(callback: types.CallbackQuery, state: FSMContext,
+                         callback_data: UserPickCallback):
+    """Блокировка"""
+    await db.ban_user(callback_data.user_id)
+    await callback.answer(f"✅ Пользователь {callback_data.user_id} добавлен в ЧС!", show_alert=True)
+    await refresh_user_picker(callback, state, UserPicker.ban)
+
+
+@callbacks.on(UserPickCallback, UserPickAction.pick, UserPicker.unban)
+async def admin_unban_pick(callback: types.CallbackQuery, state: FSMContext,
+                           callback_data: UserPickCallback):
+    """Разблокировка"""
+    await db.unban_user(callback_data.user_id)
+    await callback.answer(f"✅ Пользователь {callback_data.user_id} удалён из ЧС!", show_alert=True)
+    await refresh_user_picker(callback, state, UserPicker.unban)
+
+
+# ==================== ЗАКАЗЫ ====================
+@router.message(F.text == "📋 История заказов")
+async def admin_orders(message: types.Message):
+    """История заказов"""
+    orders = await db.get_recent_orders()
+
+    if not orders:
+        await message.answer("📋 Заказов пока нет", reply_markup=kb.get_back_keyboard())
+        return
+
+    await message.answer(
+        "📋 <b>История заказов:</b>\n\nВыберите заказ:",
+        reply_markup=kb.get_orders_keyboard(orders),
+        parse_mode="HTML"
+    )
+
+
+@callbacks.on(MenuCallback, MenuTarget.admin_orders)
+async def menu_admin_orders(callback: types.CallbackQuery):
+    """Возврат к истории заказов"""
+    orders = await db.get_recent_orders()
+    if not orders:
+        await callback.message.edit_text("📋 Заказов пока нет", reply_markup=kb.get_back_keyboard())
+        await callback.answer()
+        return
+
+    await callback.message.edit_text(
+        "📋 <b>История заказов:</b>\n\nВыберите заказ:",
+        reply_markup=kb.get_orders_keyboard(orders),
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+
+# ==================== ПОИСК ЗАКАЗОВ ====================
+ORDER_SEARCH_HELP = (
+    "🔎 <b>Поиск заказа</b>\n\n"
+    "Отправьте одно из:\n"
+    "• номер заказа: <code>ORDER-123456-ABCDEF</code>\n"
+    "• начало номера: <code>ORDER-1234</code>\n"
+    "• ID покупателя: <code>123456789</code>\n"
+    "• username покупателя: <code>@username</code>\n"
+    "• название товара из заказа: <code>худи</code>\n\n"
+    "Или командой: <code>/order запрос</code>"
+)
+
+
+async def order_search_page(state: FSMContext, query: str, cursor=None):
+    """Страница результатов поиска; запрос и курсор следующей страницы - в FSM"""
+    orders, next_cursor = await db.search_orders(query, cursor)
+    await state.update_data(order_query=query, order_cursor=next_cursor)
+
+    if not orders:
+        text = f"😔 По запросу «{html.escape(query)}» заказов не найдено"
+    else:
+        text = f"🔎 <b>Заказы по запросу «{html.escape(query)}»:</b>"
+    return text, kb.get_order_search_keyboard(orders, next_cursor is not None)
+
+
+async def send_order_search(message: types.Message, state: FSMContext, query: str):
+    """Поиск заказа; точный номер сразу открывает карточку"""
+    if db.order_search_mode(query.strip()) == "exact":
+        order = await db.get_order_summary(query.strip().upper())
+        if order:
+            await message.answer(
+                order.summary,
+                reply_markup=kb.get_order_admin_keyboard(order.order_number, order.archived),
+                parse_mode="HTML"
+            )
+            return
+
+    text, keyboard = await order_search_page(state, query)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@router.message(Command("order"))
+async def admin_order_search_command(message: types.Message, command: CommandObject, state: FSMContext):
+    """/order <номер | ID | @username | товар>"""
+    if not command.args:
+        await message.answer(ORDER_SEARCH_HELP, parse_mode="HTML")
+        return
+    await send_order_search(message, state, command.args)
+
+
+@callbacks.on(OrderCallback, OrderAction.search)
+async def admin_order_search_start(callback: types.CallbackQuery, state: FSMContext):
+    """Запрос текста для поиска заказа"""
+    await state.set_state(AdminStates.searching_order)
+    await callback.message.edit_text(ORDER_SEARCH_HELP, parse_mode="HTML")
+    await callback.answer()
+
+
+@router.message(AdminStates.searching_order, F.text)
+async def admin_order_search_input(message: types.Message, state: FSMContext):
+    """Результаты поиска заказа"""
+    await state.set_state(None)
+    await send_order_search(message, state, message.text)
+
+
+@callbacks.on(OrderCallback, OrderAction.search_more)
+async def admin_order_search_more(callback: types.CallbackQuery, state: FSMContext):
+    """Следующая страница результатов поиска"""
+    data = await state.get_data()
+    if not data.get('order_query') or data.get('order_cursor') is None:
+        await callback.answer("Больше заказов нет", show_alert=False)
+        return
+
+    text, keyboard = await order_search_page(state, data['order_query'], data['order_cursor'])
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    await callback.answer()
+
+
+@callbacks.on(OrderCallback, OrderAction.delete_confirm)
+async def admin_order_delete_execute(callback: types.CallbackQuery, callback_data: OrderCallback):
+    """Фактическое удаление заказа"""
+    order_number = callback_data.order_number
+    logging.info(f"🗑️ Выполняем удаление: {order_number}")
+
+    # Удаляем
+    success = await db.delete_order(order_number)
+
+    if success:
+        logging.info(f"✅ Заказ {order_number} удалён")
+        await callback.answer(f"✅ Заказ {order_number} удалён!", show_alert=True)
+
+        # Получаем обновлённый список
+        orders = await db.get_recent_orders()
+
+        if not orders:
+            await callback.message.edit_text(
+                "📋 Заказов пока нет",
+                reply_markup=kb.get_back_keyboard()
+            )
+            return
+
+        # Показываем обновлённый список
+        await callback.message.edit_text(
+            "📋 <b>История заказов:</b>\n\nВыберите заказ:",
+            reply_markup=kb.get_orders_keyboard(orders),
+            parse_mode="HTML"
+        )
+    else:
+        logging.error(f"❌ Не удалось удалить {order_number}")
+        await callback.answer("❌ Ошибка при удалении", show_alert=True)
+
+
+@callbacks.on(OrderCallback, OrderAction.delete)
+async def admin_order_delete_confirm(callback: types.CallbackQuery, callback_data: OrderCallback):
+    """Показ подтверждения удаления"""
+    order_number = callback_data.order_number
+
+    logging.info(f"🗑️ Запрошено удаление: {order_number}")
+
+    # Получаем заказ
+    order = await db.get_order_summary(order_number)
+    if not order:
+        await callback.answer("❌ Заказ не найден", show_alert=True)
+        return
+
+    # Текст подтверждения
+    text = (
+        f"🗑️ <b>Удаление заказа</b>\n\n"
+        f"📋 Заказ: <b>#{order_number}</b>\n"
+        f"💰 Сумма: {order.final_price}₽\n\n"
+        f"⚠️ <b>Удалить этот заказ?</b>\n"
+        f"Действие необратимо!"
+    )
+
+    # Кнопки
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(
+            text="✅ Да, удалить",
+            callback_data=OrderCallback(action=OrderAction.delete_confirm, order_number=order_number).pack()
+        ),
+        InlineKeyboardButton(
+            text="❌ Нет, отмена",
+            callback_data=OrderCallback(action=OrderAction.view, order_number=order_number).pack()
+        )
+    )
+
+    await callback.message.edit_text(
+        text,
+        reply_markup=builder.as_markup(),
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+
+@callbacks.on(OrderCallback, OrderAction.cancel)
+async def admin_order_cancel(callback: types.CallbackQuery, callback_data: OrderCallback):
+    """Отмена заказа (меняет статус, но не удаляет)"""
+    order_number = callback_data.order_number
+
+    # Меняем статус на cancelled
+    await db.update_order_status(order_number, "cancelled")
+
+    await callback.answer("✅ Статус заказа изменён на cancelled", show_alert=False)
+
+    # Обновляем информацию о заказе
+    order = await db.get_order_summary(order_number)
+
+    if order:
+        await callback.message.edit_text(
+            order.summary,
+            reply_markup=kb.get_order_admin_keyboard(order_number, order.archived),
+            parse_mode="HTML"
+        )
+
+
+@callbacks.on(OrderCallback, OrderAction.view)
+async def admin_order_view(callback: types.CallbackQuery, callback_data: OrderCallback):
+    """Просмотр заказа админом"""
+    order_number = callback_data.order_number
+    order = await db.get_order_summary(order_number)
+
+    if not order:
+        await callback.answer("❌ Заказ не найден", show_alert=True)
+        return
+
+    await callback.message.edit_text(
+        order.summary,
+        reply_markup=kb.get_order_admin_keyboard(order_number, order.archived),
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+
+@callbacks.on(OrderCallback, OrderAction.confirm)
+async def admin_order_confirm(callback: types.CallbackQuery, callback_data: OrderCallback):
+    """Подтверждение оплаты заказа"""
+    await db.update_order_status(callback_data.order_number, "paid")
+    await callback.answer("✅ Статус заказа изменён на paid")
+
+    orders = await db.get_recent_orders()
+    await callback.message.edit_reply_markup(reply_markup=kb.get_orders_keyboard(orders))
+
+
+# ==================== АРХИВ ЗАКАЗОВ ====================
+@router.message(Command("archive"))
+async def admin_archive_orders(message: types.Message, command: CommandObject):
+    """/archive [дней] - перенести завершённые заказы старше N дней в архив"""
+    days = int(command.args) if command.args and command.args.strip().isdigit() else ORDER_ARCHIVE_DAYS
+    await message.answer(f"🗄️ Переношу в архив оплаченные и отменённые заказы старше {days} дн...")
+
+    report = await db.archive_orders(days)
+    await message.answer(
+        f"🗄️ <b>Архивация завершена</b>\n\n"
+        f"📦 Заказов: {report['orders']}\n"
+        f"🧾 Позиций: {report['items']}\n"
+        f"💾 Освобождено в основной БД: {report['freed_bytes'] / 1024:.1f} КБ\n"
+        f"📁 Размер файла: {report['file_bytes_before'] / 1048576:.2f} → "
+        f"{report['file_bytes_after'] / 1048576:.2f} МБ\n\n"
+        f"Архивные заказы открываются по номеру (/order), только для просмотра.",
+        parse_mode="HTML"
+    )
+
+
+# ==================== ВЫГРУЗКА ЗАКАЗОВ ====================
+EXPORT_DEFAULT_DAYS = 30
+
+
+def parse_export_args(args: Optional[str]) -> Tuple[datetime.date, datetime.date, bool]:
+    """[с] [по] [gz] -> (первый день, последний день включительно, сжимать)"""
+    words = (args or "").split()
+    compress = "gz" in words
+    dates = [datetime.date.fromisoformat(word) for word in words if word != "gz"]
+    if len(dates) > 2:
+        raise ValueError("слишком много дат")
+    today = datetime.datetime.utcnow().date()
+    date_to = dates[1] if len(dates) == 2 else today
+    date_from = dates[0] if dates else today - datetime.timedelta(days=EXPORT_DEFAULT_DAYS - 1)
+    if date_from > date_to:
+        raise ValueError("начало периода позже конца")
+    return date_from, date_to, compress
+
+
+@router.message(Command("export"))
+async def admin_export_orders(message: types.Message, command: CommandObject):
+    """/export [ГГГГ-ММ-ДД] [ГГГГ-ММ-ДД] [gz] - CSV заказов с позициями за период"""
+    try:
+        date_from, date_to, compress = parse_export_args(command.args)
+    except ValueError:
+        await message.answer(
+            "❌ Формат: <code>/export [с] [по] [gz]</code>\n"
+            "Даты - ГГГГ-ММ-ДД (UTC), по умолчанию последние 30 дней.\n"
+            "Например: <code>/export 2024-01-01 2024-03-31 gz</code>",
+            parse_mode="HTML"
+        )
+        return
+
+    await message.answer(f"📤 Готовлю выгрузку заказов за {date_from} — {date_to}...")
+    path, rows = await export_orders_csv(
+        date_from.isoformat(), (date_to + datetime.timedelta(days=1)).isoformat(), compress
+    )
+    try:
+        if not rows:
+            await message.answer("📭 За этот период заказов нет")
+            return
+        filename = f"orders_{date_from}_{date_to}.csv" + (".gz" if compress else "")
+        await message.answer_document(
+            FSInputFile(path, filename=filename),
+            caption=f"📤 Заказы за {date_from} — {date_to}: {rows} строк"
+        )
+    finally:
+        os.remove(path)
+
+
+# ==================== СТАТИСТИКА ПРОДАЖ ====================
+@router.message(F.text == "📊 Статистика")
+async def admin_sales_stats(message: types.Message):
+    """Выручка и заказы за сегодня / 7 / 30 дней из дневных агрегатов"""
+    stats = await db.get_sales_stats()
+    titles = {1: "Сегодня", 7: "7 дней", 30: "30 дней"}
+
+    text = "📊 <b>Статистика продаж</b>\n\n"
+    for days, period in stats['periods'].items():
+        text += (
+            f"<b>{titles.get(days, f'{days} дн.')}:</b>\n"
+            f"💰 Выручка: {period['revenue']}₽\n"
+            f"📦 Заказов: {period['orders']}\n"
+            f"🎁 Скидки: {period['discount']}₽\n\n"
+        )
+
+    text += "🔥 <b>Топ товаров за 7 дней:</b>\n"
+    if stats['top']:
+        for i, item in enumerate(stats['top'], 1):
+            text += f"{i}. {item['product_name']} — {item['units']} шт. ({item['revenue']}₽)\n"
+    else:
+        text += "Продаж пока нет"
+
+    await message.answer(text, parse_mode="HTML")
+
+
+# ==================== РЕЖИМ ТЕХРАБОТ ====================
+@router.message(F.text == "🔧 Техработы")
+async def admin_maintenance_start(message: types.Message):
+    """Управление режимом техработ"""
+    is_maintenance = await db.get_maintenance_mode()
+
+    status_text = "🟢 ВКЛЮЧЕН" if is_maintenance else "🔴 ВЫКЛЮЧЕН"
+
+    text = (
+        f"🔧 <b>Режим технических работ</b>\n\n"
+        f"📊 <b>Текущий статус:</b> {status_text}\n\n"
+        f"⚠️ <b>Внимание!</b>\n"
+        f"При включении режима техработ обычные пользователи\n"
+        f"не смогут использовать бота.\n\n"
+        f"Администраторы могут использовать бота в любом режиме."
+    )
+
+    await message.answer(
+        text,
+        reply_markup=kb.get_maintenance_keyboard(is_maintenance),
+        parse_mode="HTML"
+    )
+
+
+@callbacks.on(MaintenanceCallback)
+async def admin_maintenance_toggle(callback: types.CallbackQuery, callback_data: MaintenanceCallback):
+    """Переключение режима техработ"""
+    enable = callback_data.enable
+
+    # Устанавливаем режим
+    await db.set_maintenance_mode(enable)
+
+    status_text = "✅ ВКЛЮЧЕН" if enable else "❌ ВЫКЛЮЧЕН"
+
+    await callback.answer(
+        f"Режим техработ {status_text}",
+        show_alert=True
+    )
+
+    # Обновляем клавиатуру
+    is_maintenance = await db.get_maintenance_mode()
+
+    status_text = "🟢 ВКЛЮЧЕН" if is_maintenance else "🔴 ВЫКЛЮЧЕН"
+
+    text = (
+        f"🔧 <b>Режим технических работ</b>\n\n"
+        f"📊 <b>Текущий статус:</b> {status_text}\n\n"
+        f"⚠️ <b>Внимание!</b>\n"
+        f"При включении режима техработ обычные пользователи\n"
+        f"не смогут использовать бота.\n\n"
+        f"Администраторы могут использовать бота в любом режиме."
+    )
+
+    await callback.message.edit_text(
+        text,
+        reply_markup=kb.get_maintenance_keyboard(is_maintenance),
+        parse_mode="HTML"
+    )
+
+
+# ==================== ДИАГНОСТИКА ====================
+DB_TOP_MAX = 15                  # больше строк не влезает в одно сообщение
+PROFILE_DEFAULT_SECONDS = 30
+
+
+@router.message(Command("dbhealth"))
+async def admin_db_health(message: types.Message):
+    """Состояние БД и последние запуски обслуживания"""
+    await message.answer(await maintenance.report(), parse_mode="HTML")
+
+
+@router.message(Command("dbtop"))
+async def admin_db_top(message: types.Message, command: CommandObject):
+    """/dbtop [N] [total|mean|max|calls] - самые дорогие функции БД с запуска"""
+    limit, key = 10, "total"
+    for arg in (command.args or "").split():
+        if arg.isdigit():
+            limit = min(int(arg), DB_TOP_MAX)
+        elif arg in ("total", "mean", "max", "calls"):
+            key = arg
+    await message.answer(db_metrics.report(limit, key), parse_mode="HTML")
+
+
+@router.message(Command("latency"))
+async def admin_handler_latency(message: types.Message):
+    """Скользящие p50/p95/p99 обработчиков и последние выбросы"""
+    await message.answer(handler_latency.report(), parse_mode="HTML")
+
+
+@router.message(Command("profile"))
+async def admin_profile(message: types.Message, command: CommandObject):
+    """/profile [сек] [cprofile] - профилирование бота, отчёт файлом"""
+    seconds, mode = PROFILE_DEFAULT_SECONDS, "sample"
+    for arg in (command.args or "").split():
+        if arg.isdigit():
+            seconds = max(1, min(int(arg), profiler.MAX_DURATION))
+        elif arg == "cprofile":
+            mode = "cprofile"
+    if profiler.is_running():
+        await message.answer("⏳ Профилирование уже идёт, дождитесь отчёта")
+        return
+
+    await message.answer(f"🔬 Профилирую {seconds} с ({'cProfile' if mode == 'cprofile' else 'сэмплы стеков'})...")
+    path, samples = await profiler.profile(seconds, mode)
+    try:
+        caption = f"🔬 Профиль за {seconds} с" + (f", сэмплов: {samples}" if samples is not None else "")
+        await message.answer_document(
+            FSInputFile(path, filename=f"profile_{mode}_{datetime.datetime.now():%Y%m%d_%H%M%S}.txt"),
+            caption=caption
+        )
+    finally:
+        os.remove(path)
+
+
+@router.message(Command("filters"))
+async def admin_filter_stats(message: types.Message):
+    """Статистика проверок доступа на апдейт и антифлуда"""
+    await message.answer(filter_stats.report() + "\n\n" + throttle.report(), parse_mode="HTML")
@@ -0,0 +1,190 @@
+import logging
+
+from aiogram import F, Router, types
+
+import database as db
+import keyboards as kb
+from callbacks import CallbackRouter, CartAction, CartCallback, MenuCallback, MenuTarget
+from rendering import render_cart, render_product_card
+from reservations import ledger
+
+router = Router(name="cart")
+callbacks = CallbackRouter(router)
+
+
+@callbacks.on(CartCallback, CartAction.add)
+async def cart_add(callback: types.CallbackQuery, callback_data: CartCallback):
+    """Добавление товара в корзину (+)"""
+    product_id = callback_data.product_id
+
+    product = await db.get_product(product_id)
+    if not product:
+        await callback.answer("❌ Товар не найден", show_alert=True)
+        return
+
+    user_id = callback.from_user.id
+
+    # Проверяем, сколько уже в корзине
+    cart = await db.get_cart(user_id)
+    cart_item = next((item for item in cart if item.product_id == product_id), None)
+    current_in_cart = cart_item.quantity if cart_item else 0
+
+    # 🔄 Проверяем доступный остаток (с учетом резервов и уже добавленного)
+    available_stock = ledger.available_for(user_id, product_id, product.stock, current_in_cart)
+
+    if available_stock <= 0:
+        await callback.answer("⚠️ Товар закончился!", show_alert=True)
+        return
+
+    # Добавляем в корзину и резервируем товар
+    success = await db.add_to_cart(user_id, product_id, 1)
+    if not success:
+        await callback.answer("⚠️ Товар закончился или зарезервирован другим покупателем", show_alert=True)
+        return
+
+    await callback.answer("✅ Товар добавлен!", show_alert=False)
+
+    # 🔄 Обновляем сообщение (покажет новый доступный остаток)
+    await update_product_message(callback, product_id)
+
+
+@callbacks.on(CartCallback, CartAction.dec)
+async def cart_decrease(callback: types.CallbackQuery, callback_data: CartCallback):
+    """Уменьшение количества товара в корзине (-)"""
+    product_id = callback_data.product_id
+
+    user_id = callback.from_user.id
+
+    # Проверяем, есть ли в корзине
+    cart = await db.get_cart(user_id)
+    cart_item = next((item for item in cart if item.product_id == product_id), None)
+
+    if not cart_item or cart_item.quantity <= 0:
+        await callback.answer("❌ Товар не в корзине", show_alert=True)
+        return
+
+    # Уменьшаем количество
+    new_qty = cart_item.quantity - 1
+
+    if new_qty <= 0:
+        # Удаляем из корзины
+        await db.remove_from_cart(user_id, product_id)
+    else:
+        # Обновляем количество
+        await db.update_cart_quantity(user_id, product_id, new_qty)
+
+    await callback.answer("✅ Количество уменьшено", show_alert=False)
+
+    # 🔄 Обновляем сообщение (покажет восстановленный остаток)
+    await update_product_message(callback, product_id)
+
+
+async def update_product_message(callback: types.CallbackQuery, product_id: int):
+    """🔄 Обновление сообщения с товаром (с учетом корзины)"""
+    # Получаем данные о товаре
+    product = await db.get_product(product_id)
+    if not product:
+        return
+
+    # Проверяем, есть ли товар в корзине
+    cart = await db.get_cart(callback.from_user.id)
+    cart_item = next((item for item in cart if item.product_id == product_id), None)
+    in_cart = cart_item.quantity if cart_item else 0
+
+    # 🔄 Вычисляем доступный остаток (с учетом резервов всех покупателей)
+    available_stock = ledger.available_for(callback.from_user.id, product_id, product.stock, in_cart)
+
+    # Обновляем сообщение с новой клавиатурой
+    try:
+        await callback.message.edit_text(
+            render_product_card(product, available_stock, in_cart),
+            reply_markup=kb.get_product_keyboard(product_id, available_stock, in_cart),
+            parse_mode="HTML"
+        )
+    except Exception as e:
+        logging.debug(f"Не удалось обновить сообщение: {e}")
+
+
+@router.message(F.text == "🛒 Корзина")
+async def show_cart(message: types.Message):
+    """Отображение корзины"""
+    await send_cart(message, message.from_user.id)
+
+
+async def send_cart(message: types.Message, user_id: int):
+    """Отправка корзины пользователя новым сообщением"""
+    cart = await db.get_cart(user_id)
+
+    if not cart:
+        await message.answer("🛒 Ваша корзина пуста", reply_markup=kb.get_back_keyboard())
+        return
+
+    await message.answer(render_cart(cart), reply_markup=kb.get_cart_keyboard(cart), parse_mode="HTML")
+
+
+@callbacks.on(CartCallback, CartAction.remove)
+async def cart_remove_item(callback: types.CallbackQuery, callback_data: CartCallback):
+    """Удаление товара из корзины"""
+    try:
+        product_id = callback_data.product_id
+        user_id = callback.from_user.id
+
+        logging.info(f"🗑️ Удаляем товар {product_id} из корзины пользователя {user_id}")
+
+        # ✅ Вызываем функцию из database.py
+        await db.remove_from_cart(user_id, product_id)
+
+        await callback.answer("✅ Товар удален", show_alert=False)
+
+        # Получаем обновленную корзину
+        cart = await db.get_cart(user_id)
+
+        if not cart:
+            # Корзина пуста
+            await callback.message.edit_text(
+                "🛒 Ваша корзина пуста",
+                reply_markup=kb.get_back_keyboard()
+            )
+            return
+
+        # Обновляем сообщение
+        await callback.message.edit_text(
+            render_cart(cart),
+            reply_markup=kb.get_cart_keyboard(cart),
+            parse_mode="HTML"
+        )
+
+    except Exception as e:
+        logging.error(f"❌ Ошибка при удалении товара: {e}")
+        import traceback
+        traceback.print_exc()
+        await callback.answer("❌ Ошибка при удалении товара", show_alert=True)
+
+
+@callbacks.on(CartCallback, CartAction.clear)
+async def cart_clear(callback: types.CallbackQuery):
+    """Очистка корзины"""
+    try:
+        user_id = callback.from_user.id
+
+        # Очищаем корзину
+        await db.clear_cart(user_id)
+
+        await callback.answer("🗑️ Корзина очищена", show_alert=True)
+
+        # Показываем пустую корзину
+        await callback.message.edit_text(
+            "🛒 Ваша корзина пуста",
+            reply_markup=kb.get_back_keyboard()
+        )
+
+    except Exception as e:
+        logging.error(f"❌ Ошибка при очистке корзины: {e}")
+        await callback.answer("❌ Ошибка при очистке корзины", show_alert=True)
+
+
+@callbacks.on(MenuCallback, MenuTarget.cart)
+async def menu_cart(callback: types.CallbackQuery):
+    """Возврат в корзину"""
+    await send_cart(callback.message, callback.from_user.id)
+    await callback.answer()
@@ -0,0 +1,191 @@
+import logging
+from typing import List
+
+from aiogram import Bot, Router, types
+
+import database as db
+import keyboards as kb
+from callbacks import BonusAction, BonusCallback, CallbackRouter, OrderAction, OrderCallback
+from config import ADMIN_ID
+from records import CartLine
+from rendering import cart_total, render_checkout, render_order_notification
+
+router = Router(name="checkout")
+callbacks = CallbackRouter(router)
+
+
+@callbacks.on(OrderCallback, OrderAction.checkout)
+async def order_checkout(callback: types.CallbackQuery):
+    """Оформление заказа - предпросмотр с выбором бонуса"""
+    user_id = callback.from_user.id
+    cart = await db.get_cart(user_id)
+
+    if not cart:
+        await callback.answer("Корзина пуста!", show_alert=True)
+        return
+
+    bonus = await db.get_active_bonus(user_id)
+    use_bonus = await db.get_bonus_usage(user_id)
+    text = render_checkout(cart, bonus, use_bonus)
+
+    # Показываем клавиатуру с выбором бонуса (если есть бонус)
+    if bonus:
+        keyboard = kb.get_bonus_choice_keyboard(use_bonus)
+    else:
+        keyboard = kb.get_checkout_keyboard()
+
+    try:
+        await callback.message.edit_text(
+            text,
+            reply_markup=keyboard,
+            parse_mode="HTML"
+        )
+    except Exception as e:
+        # Если сообщение не изменилось, просто отвечаем
+        logging.debug(f"Message not modified: {e}")
+
+    await callback.answer()
+
+
+@callbacks.on(BonusCallback, BonusAction.use)
+async def bonus_toggle(callback: types.CallbackQuery, callback_data: BonusCallback):
+    """Переключение использования бонуса"""
+    user_id = callback.from_user.id
+
+    use_bonus = bool(callback_data.value)
+    await db.set_bonus_usage(user_id, use_bonus)
+
+    await callback.answer(
+        f"✅ Скидка {'будет использована' if use_bonus else 'не будет использована'}",
+        show_alert=False
+    )
+
+    # Перезапускаем checkout для обновления
+    await order_checkout(callback)
+
+
+@callbacks.on(OrderCallback, OrderAction.pay)
+async def order_pay(callback: types.CallbackQuery):
+    """Оплата заказа"""
+    user_id = callback.from_user.id
+    cart = await db.get_cart(user_id)
+
+    if not cart:
+        await callback.answer("Корзина пуста!", show_alert=True)
+        return
+
+    logging.info(f"📋 Оформление заказа пользователем {user_id}")
+
+    # Получаем активный бонус и настройку использования
+    bonus = await db.get_active_bonus(user_id)
+    use_bonus = await db.get_bonus_usage(user_id)
+
+    # ✅ Безопасная обработка бонуса
+    if bonus is None:
+        bonus = 0
+
+    # Если пользователь выбрал не использовать скидку - обнуляем бонус
+    final_bonus = bonus if use_bonus else 0
+
+    logging.info(f"💰 Bonus: {bonus}, Use bonus: {use_bonus}, Final bonus: {final_bonus}")
+
+    # Создаем заказ
+    order_number = await db.create_order(user_id, cart, final_bonus)
+
+    if not order_number:
+        await callback.answer("❌ Ошибка создания заказа", show_alert=True)
+        return
+
+    logging.info(f"✅ Заказ {order_number} создан")
+
+    # 🔔 ОТПРАВЛЯЕМ УВЕДОМЛЕНИЕ АДМИНАМ
+    total = cart_total(cart)
+    final = total - (total * final_bonus // 100)
+
+    logging.info(f"🔔 Отправляем уведомления о заказе {order_number}")
+
+    await notify_admins_about_order(
+        bot=callback.bot,
+        order_number=order_number,
+        user_id=user_id,
+        total=total,
+        final=final,
+        discount=final_bonus,
+        cart=cart
+    )
+
+    # Деактивация бонуса после использования (только если использовали)
+    if use_bonus and bonus:
+        await db.deactivate_bonus(user_id)
+
+    # Очистка корзины
+    await db.clear_cart(user_id)
+
+    # Сбрасываем настройку использования бонуса
+    await db.set_bonus_usage(user_id, True)
+
+    # Формирование сообщения для пользователя
+    total = cart_total(cart)
+    final = total - (total * final_bonus // 100)
+
+    payment_text = (
+        f"✅ <b>Заказ #{order_number} создан!</b>\n\n"
+        f"💳 <b>Оплата переводом:</b>\n"
+        f"Переведите сумму на номер:\n"
+        f"📱 <code>+79122127547</code> (Озонбанк)\n\n"
+        f"💰 Сумма к оплате: <b>{final}₽</b>\n\n"
+        f"После перевода напишите @romasha_1 номер заказа "
+        f"и прикрепите чек оплаты.\n\n"
+        f"📦 Ваш заказ будет обработан после подтверждения оплаты!"
+    )
+
+    try:
+        await callback.message.edit_text(
+            payment_text,
+            reply_markup=kb.get_payment_keyboard(order_number),
+            parse_mode="HTML"
+        )
+    except:
+        await callback.message.answer(
+            payment_text,
+            reply_markup=kb.get_payment_keyboard(order_number),
+            parse_mode="HTML"
+        )
+
+    await callback.answer()
+
+    # Рекламное сообщение после заказа
+    await callback.message.answer(
+        "🙏 Спасибо за ваш заказ!\n\n"
+        "🔥 Не забудьте подписаться на наш канал:\n"
+        "👉 https://t.me/+C8EqPbH5Dok5NWQy\n\n"
+        "Там вас ждут эксклюзивные предложения! 🎁"
+    )
+
+
+async def notify_admins_about_order(bot: Bot, order_number: str, user_id: int,
+                                    total: int, final: int,
+                                    discount: int, cart: List[CartLine]):
+    """Отправка уведомления всем администраторам о новом заказе"""
+
+    # Получаем всех админов
+    admin_ids = await db.get_all_admin_ids()
+
+    # Добавляем главного админа из ADMIN_ID
+    if ADMIN_ID not in admin_ids:
+        admin_ids.append(ADMIN_ID)
+
+    text = render_order_notification(order_number, user_id, cart, total, final, discount)
+
+    # Отправляем уведомление каждому админу (БЕЗ клавиатуры)
+    for admin_id in admin_ids:
+        try:
+            await bot.send_message(
+                chat_id=admin_id,
+                text=text,
+                parse_mode="HTML"
+                # ❌ Убрали reply_markup
+            )
+            logging.info(f"✅ Уведомление отправлено админу {admin_id}")
+        except Exception as e:
+            logging.error(f"❌ Не удалось отправить уведомление админу {admin_id}: {e}")
@@ -0,0 +1,280 @@
+import html
+
+import aiosqlite  # ✅ ВАЖНО!
+from aiogram import F, Router, types
+from aiogram.filters import CommandStart
+from aiogram.fsm.context import FSMContext
+from aiogram.types import InlineQueryResultArticle, InputTextMessageContent
+
+import database as db
+import keyboards as kb
+from callbacks import (
+    NOOP, BonusAction, BonusCallback, CallbackRouter, CatalogCallback,
+    MenuCallback, MenuTarget, ProductAction, ProductCallback,
+)
+from config import CHANNEL_LINK
+from middlewares import IsAdmin, user_is_admin
+from rendering import render_product_card
+from reservations import ledger
+from states import ShopStates
+
+router = Router(name="user")
+callbacks = CallbackRouter(router)
+
+
+@router.message(CommandStart())
+async def cmd_start(message: types.Message):
+    """Обработчик /start"""
+    user_id = message.from_user.id
+    username = message.from_user.username
+    first_name = message.from_user.first_name
+
+    # ✅ ПРОВЕРКА: новый ли пользователь (используем db.DB_PATH)
+    async with aiosqlite.connect(db.DB_PATH) as conn:  # ✅ Изменили 'db' на 'conn'
+        cursor = await conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
+        existing_user = await cursor.fetchone()
+
+    # ✅ Вызываем функцию из модуля database (не из подключения!)
+    await db.get_or_create_user(user_id, username, first_name)
+    is_admin = await user_is_admin(user_id)
+
+    # Если новый пользователь - даем приветственную скидку
+    if not existing_user:
+        bonus_created = await db.create_welcome_bonus(user_id, 10)
+        if bonus_created:
+            await message.answer(
+                "🎁 <b>Приветственный бонус!</b>\n\n"
+                "Вам начислена скидка <b>10%</b> на первый заказ!\n"
+                "Скидка применится автоматически при оформлении заказа.\n\n"
+                "Проверить бонусы: кнопка 🎁 Бонусы",
+                parse_mode="HTML"
+            )
+
+    welcome_text = (
+        f"👋 Привет, {first_name}!\n\n"
+        f"🛍️ Добро пожаловать в наш Telegram-магазин!\n\n"
+        f"🔥 <b>Подпишитесь на наш канал:</b>\n"
+        f"👉 {CHANNEL_LINK}\n\n"
+        f"Здесь вы найдете эксклюзивные товары по лучшим ценам! 🎁"
+    )
+
+    await message.answer(
+        welcome_text,
+        reply_markup=kb.get_main_keyboard(user_id, is_admin),
+        parse_mode="HTML"
+    )
+
+
+@router.message(F.text == "🔙 Назад в меню")
+async def back_to_menu(message: types.Message, state: FSMContext):
+    """Возврат в главное меню"""
+    await state.clear()
+    is_admin = await user_is_admin(message.from_user.id)
+    await message.answer(
+        "📋 Главное меню:",
+        reply_markup=kb.get_main_keyboard(message.from_user.id, is_admin)
+    )
+
+
+@router.message(F.text == "🛍️ Каталог")
+async def show_catalog(message: types.Message):
+    """Отображение каталога товаров"""
+    products = await db.get_catalog_products()
+
+    if not products:
+        await message.answer("📭 Каталог пока пуст. Заходите позже!", reply_markup=kb.get_back_keyboard())
+        return
+
+    await message.answer(
+        "🛍️ <b>Каталог товаров:</b>\n\nВыберите товар для просмотра:",
+        reply_markup=kb.get_products_keyboard(products),
+        parse_mode="HTML"
+    )
+
+
+@callbacks.on(CatalogCallback)
+async def back_to_catalog(callback: types.CallbackQuery, callback_data: CatalogCallback):
+    """Возврат в каталог / листание страниц"""
+    products = await db.get_catalog_products()
+
+    if not products:
+        await callback.message.edit_text("📭 Каталог пока пуст.")
+        await callback.answer()
+        return
+
+    await callback.message.edit_text(
+        "🛍️ <b>Каталог товаров:</b>\n\nВыберите товар для просмотра:",
+        reply_markup=kb.get_products_keyboard(products, page=callback_data.page),
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+
+# ==================== ПОИСК ====================
+SEARCH_RESULTS = 10              # кнопок в выдаче текстового поиска
+INLINE_RESULTS = 20              # карточек в inline-выдаче
+
+
+def with_available_stock(products: list) -> list:
+    """Остаток в выдаче — за вычетом резервов (результаты поиска кэшируются, не меняем их)"""
+    return [product.replace(stock=ledger.available(product.id, product.stock)) for product in products]
+
+
+@callbacks.on(MenuCallback, MenuTarget.search)
+async def search_start(callback: types.CallbackQuery, state: FSMContext):
+    """Запрос текста для поиска по каталогу"""
+    await state.set_state(ShopStates.searching)
+    await callback.message.edit_text(
+        "🔍 <b>Поиск по каталогу</b>\n\nВведите название или слово из описания товара:",
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+
+@router.message(ShopStates.searching, F.text)
+async def search_query(message: types.Message, state: FSMContext):
+    """Результаты текстового поиска"""
+    await state.clear()
+    products = with_available_stock(await db.search_products(message.text, limit=SEARCH_RESULTS))
+
+    if not products:
+        await message.answer(
+            f"😔 По запросу «{message.text}» ничего не найдено",
+            reply_markup=kb.get_search_results_keyboard([])
+        )
+        return
+
+    await message.answer(
+        f"🔍 <b>Найдено по запросу «{html.escape(message.text)}»:</b>",
+        reply_markup=kb.get_search_results_keyboard(products),
+        parse_mode="HTML"
+    )
+
+
+@router.inline_query()
+async def inline_search(inline_query: types.InlineQuery):
+    """Inline-режим: @bot запрос"""
+    if not inline_query.query.strip():
+        await inline_query.answer([], cache_time=db.SEARCH_CACHE_TTL)
+        return
+
+    products = with_available_stock(await db.search_products(inline_query.query, limit=INLINE_RESULTS))
+    results = [
+        InlineQueryResultArticle(
+            id=str(product.id),
+            title=product.name,
+            description=f"{product.price}₽ · в наличии {product.stock} шт.",
+            input_message_content=InputTextMessageContent(
+                message_text=render_product_card(product, product.stock),
+                parse_mode="HTML"
+            )
+        )
+        for product in products
+    ]
+    await inline_query.answer(results, cache_time=db.SEARCH_CACHE_TTL)
+
+
+@callbacks.on(ProductCallback, ProductAction.view)
+async def show_product(callback: types.CallbackQuery, callback_data: ProductCallback):
+    """Показ деталей товара с учетом товаров в корзине"""
+    product_id = callback_data.product_id
+    product = await db.get_product(product_id)
+
+    if not product:
+        await callback.answer("❌ Товар не найден", show_alert=True)
+        return
+
+    # Проверяем, есть ли товар в корзине пользователя
+    cart = await db.get_cart(callback.from_user.id)
+    cart_item = next((item for item in cart if item.product_id == product_id), None)
+    in_cart = cart_item.quantity if cart_item else 0
+
+    # 🔄 Вычисляем доступный остаток (с учетом резервов всех покупателей)
+    available_stock = ledger.available_for(callback.from_user.id, product_id, product.stock, in_cart)
+
+    await callback.message.edit_text(
+        render_product_card(product, available_stock, in_cart),
+        reply_markup=kb.get_product_keyboard(product_id, available_stock, in_cart),
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+
+@router.message(F.text == "🎁 Бонусы")
+async def show_bonuses(message: types.Message):
+    """Отображение бонусов пользователя"""
+    user_id = message.from_user.id
+    bonuses = await db.get_user_bonuses(user_id)
+    has_active = any(b.is_active for b in bonuses)
+
+    if not bonuses:
+        await message.answer(
+            "🎁 У вас пока нет бонусов.\n"
+            "Следите за акциями и участвуйте в розыгрышах!",
+            reply_markup=kb.get_back_keyboard()
+        )
+        return
+
+    text = "🎁 <b>Ваши бонусы:</b>\n\n"
+    for bonus in bonuses:
+        status = "✅ Активна" if bonus.is_active else "❌ Использована"
+        text += f"• Скидка {bonus.discount_percent}% - {status}\n"
+
+    await message.answer(text, reply_markup=kb.get_bonuses_keyboard(bonuses, has_active), parse_mode="HTML")
+
+
+@callbacks.on(BonusCallback, BonusAction.apply)
+async def bonus_apply(callback: types.CallbackQuery):
+    """Применение бонуса к заказу"""
+    await callback.answer("🎁 Скидка будет применена при оформлении заказа!", show_alert=True)
+
+
+@router.message(F.text == "🔙 Назад")
+async def back_button_handler(message: types.Message, state: FSMContext):
+    """Обработчик кнопки Назад из разных меню"""
+    await state.clear()
+    is_admin = await user_is_admin(message.from_user.id)
+    await message.answer(
+        "📋 Главное меню:",
+        reply_markup=kb.get_main_keyboard(message.from_user.id, is_admin)
+    )
+
+
+@router.message(F.text == "⚙️ Админ-панель", ~IsAdmin())
+async def admin_panel_denied(message: types.Message):
+    """Кнопка админ-панели у обычного пользователя"""
+    await message.answer("🔐 Доступ запрещен. Вы не администратор.")
+
+
+@router.message(F.text == "🔙 В главное меню")
+async def admin_back_to_main(message: types.Message, state: FSMContext):
+    """Возврат из админ-панели в главное меню"""
+    await state.clear()
+    is_admin = await user_is_admin(message.from_user.id)
+    await message.answer(
+        "📋 Главное меню:",
+        reply_markup=kb.get_main_keyboard(message.from_user.id, is_admin)
+    )
+
+
+@callbacks.on(MenuCallback, MenuTarget.main)
+async def menu_main(callback: types.CallbackQuery):
+    """Возврат в главное меню из inline"""
+    is_admin = await user_is_admin(callback.from_user.id)
+
+    # Просто отправляем новое сообщение с ReplyKeyboard
+    await callback.message.answer(
+        "📋 Главное меню:",
+        reply_markup=kb.get_main_keyboard(callback.from_user.id, is_admin)
+    )
+
+    # Удаляем сообщение с inline-кнопками
+    await callback.message.delete()
+
+    await callback.answer()
+
+
+@callbacks.on(NOOP)
+async def noop(callback: types.CallbackQuery):
+    """Пустая обработка"""
+    await callback.answer()
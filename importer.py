@@ -0,0 +1,152 @@
+import asyncio
+import csv
+import itertools
+import json
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import database as db
+
+IMPORT_CHUNK = 500               # строк на транзакцию
+IMPORT_PAUSE = 0.05              # сек между транзакциями: покупатели не ждут весь файл
+IMPORT_MAX_BYTES = 20 * 1024 * 1024  # больше Bot API всё равно не отдаёт
+IMPORT_MAX_ERRORS = 10           # сколько отклонённых строк показываем в отчёте
+NAME_MAX_LENGTH = 128
+READ_SIZE = 64 * 1024
+JSON_MAX_OBJECT = 1024 * 1024    # объект длиннее - почти наверняка битый JSON
+
+# Колонки файла: description необязательна
+REQUIRED_FIELDS = ("name", "price", "stock")
+
+
+# ==================== ЧТЕНИЕ ФАЙЛА ====================
+def _iter_csv(file) -> Iterator[Dict]:
+    header = file.readline()
+    delimiter = ";" if header.count(";") > header.count(",") else ","
+    fields = [name.strip().lower() for name in next(csv.reader([header], delimiter=delimiter), [])]
+    missing = [name for name in REQUIRED_FIELDS if name not in fields]
+    if missing:
+        raise ValueError(f"в заголовке CSV нет колонок: {', '.join(missing)}")
+    for row in csv.DictReader(file, fieldnames=fields, delimiter=delimiter):
+        row.pop(None, None)  # лишние ячейки без заголовка
+        yield row
+
+
+def _iter_json(file) -> Iterator[Dict]:
+    """Объекты из JSON-массива или JSON Lines по одному, без чтения файла целиком"""
+    decoder = json.JSONDecoder()
+    buffer, eof = "", False
+    while True:
+        position = 0
+        while True:
+            # Разделители между объектами: пробелы, запятые, скобки массива
+            while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+                position += 1
+            if position == len(buffer):
+                break
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof or len(buffer) - position > JSON_MAX_OBJECT:
+                    raise ValueError("некорректный JSON")
+                break
+            yield item
+            position = end
+        buffer = buffer[position:]
+        if eof:
+            return
+        chunk = file.read(READ_SIZE)
+        eof = not chunk
+        buffer += chunk
+
+
+def iter_rows(file, file_format: str) -> Iterator[Tuple[int, Dict]]:
+    """(номер записи, словарь полей) из открытого текстового файла"""
+    if file_format == "csv":
+        # номер строки в файле: заголовок - первая
+        yield from enumerate(_iter_csv(file), 2)
+    else:
+        yield from enumerate(_iter_json(file), 1)
+
+
+def take_rows(rows: Iterator, count: int) -> Tuple[List, Optional[str]]:
+    """До count записей; ошибка разбора обрывает чтение, но прочитанное сохраняется"""
+    batch = []
+    try:
+        for row in itertools.islice(rows, count):
+            batch.append(row)
+    except (ValueError, csv.Error) as e:
+        return batch, str(e)
+    return batch, None
+
+
+def validate_row(row) -> Tuple[Optional[tuple], Optional[str]]:
+    """Запись файла -> (name, description, price, stock) или текст ошибки"""
+    if not isinstance(row, dict):
+        return None, "ожидался объект"
+    name = str(row.get("name") or "").strip()
+    if not name:
+        return None, "нет названия"
+    if len(name) > NAME_MAX_LENGTH:
+        return None, f"название длиннее {NAME_MAX_LENGTH} символов"
+
+    values = {}
+    for field in ("price", "stock"):
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip().replace(" ", "")
+            value = int(value) if value.isdigit() else None
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            return None, f"{field}: нужно целое число ≥ 0"
+        values[field] = value
+    if values["price"] == 0:
+        return None, "price: цена должна быть больше 0"
+
+    description = row.get("description")
+    description = (str(description).strip() or None) if description is not None else None
+    return (name, description, values["price"], values["stock"]), None
+
+
+# ==================== ИМПОРТ ====================
+async def import_products(path: str, file_format: str) -> Dict:
+    """Загрузка товаров из CSV/JSON: новые добавляются, существующие (по названию)
+    получают новые цену, остаток и описание, если оно указано.
+
+    Файл читается и проверяется в отдельном потоке порциями по IMPORT_CHUNK строк,
+    каждая порция пишется одной транзакцией. Версия каталога меняется один раз в конце,
+    в том числе если импорт прервался после записи части порций.
+    """
+    report = {"inserted": 0, "updated": 0, "unchanged": 0, "rejected": 0, "errors": []}
+    file = await asyncio.to_thread(open, path, encoding="utf-8-sig", newline="")
+    try:
+        rows = iter_rows(file, file_format)
+        failure = None
+        while failure is None:
+            batch, failure = await asyncio.to_thread(take_rows, rows, IMPORT_CHUNK)
+            if failure:
+                report["errors"].append(f"файл: {failure} (чтение остановлено)")
+            if not batch:
+                break
+
+            # Повтор названия внутри порции: берём последнюю запись
+            valid: Dict[str, tuple] = {}
+            for number, row in batch:
+                product, error = validate_row(row)
+                if error:
+                    report["rejected"] += 1
+                    if len(report["errors"]) < IMPORT_MAX_ERRORS:
+                        report["errors"].append(f"#{number}: {error}")
+                    continue
+                valid[product[0]] = product
+
+            if valid:
+                inserted, updated = await db.upsert_products(list(valid.values()))
+                report["inserted"] += inserted
+                report["updated"] += updated
+                report["unchanged"] += len(valid) - inserted - updated
+                await asyncio.sleep(IMPORT_PAUSE)
+    finally:
+        await asyncio.to_thread(file.close)
+        # Уже записанные порции видны и при сбое следующей - кэш поиска сбрасываем в любом случае
+        if report["inserted"] or report["updated"]:
+            db.bump_catalog_version()
+    return report
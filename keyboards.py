@@ -1,6 +1,14 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 
+from callbacks import (
+    NOOP, BonusAction, BonusCallback, CartAction, CartCallback, CatalogCallback,
+    MaintenanceCallback, MenuCallback, MenuTarget, OrderAction, OrderCallback,
+    ProductAction, ProductCallback, ProductPickAction, ProductPickCallback, ProductPicker,
+    ProductView, StockAction, StockCallback, UserPickAction, UserPickCallback, UserPicker,
+)
+from records import Order, Product
+
 CHANNEL_LINK = "https://t.me/+C8EqPbH5Dok5NWQy"
 
 
@@ -19,7 +27,7 @@ def get_main_keyboard(user_id: int, is_admin: bool) -> ReplyKeyboardMarkup:
 def get_back_keyboard() -> InlineKeyboardMarkup:
     """Кнопка Назад (inline)"""
     builder = InlineKeyboardBuilder()
-    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="menu:main"))
+    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=MenuCallback(target=MenuTarget.main).pack()))
     return builder.as_markup()
 
 
@@ -38,22 +46,41 @@ def get_products_keyboard(products: list, page: int = 0, page_size: int = 5) ->
     end = start + page_size
 
     for product in products[start:end]:
-        btn_text = f"{product['name']} - {product['price']}₽ (📦{product['stock']})"
+        btn_text = f"{product.name} - {product.price}₽ (📦{product.stock})"
         builder.row(InlineKeyboardButton(
             text=btn_text,
-            callback_data=f"product:{product['id']}"
+            callback_data=ProductCallback(action=ProductAction.view, product_id=product.id).pack()
         ))
 
     # Пагинация
     nav_row = []
     if page > 0:
-        nav_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"catalog:page:{page - 1}"))
+        nav_row.append(InlineKeyboardButton(text="⬅️", callback_data=CatalogCallback(page=page - 1).pack()))
     if end < len(products):
-        nav_row.append(InlineKeyboardButton(text="➡️", callback_data=f"catalog:page:{page + 1}"))
+        nav_row.append(InlineKeyboardButton(text="➡️", callback_data=CatalogCallback(page=page + 1).pack()))
     if nav_row:
         builder.row(*nav_row)
 
-    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="menu:main"))
+    builder.row(
+        InlineKeyboardButton(text="🔍 Поиск", callback_data=MenuCallback(target=MenuTarget.search).pack()),
+        InlineKeyboardButton(text="⚡ Inline-поиск", switch_inline_query_current_chat="")
+    )
+    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=MenuCallback(target=MenuTarget.main).pack()))
+    return builder.as_markup()
+
+
+def get_search_results_keyboard(products: list) -> InlineKeyboardMarkup:
+    """Клавиатура результатов поиска"""
+    builder = InlineKeyboardBuilder()
+    for product in products:
+        builder.row(InlineKeyboardButton(
+            text=f"{product.name} - {product.price}₽ (📦{product.stock})",
+            callback_data=ProductCallback(action=ProductAction.view, product_id=product.id).pack()
+        ))
+    builder.row(
+        InlineKeyboardButton(text="🔍 Искать ещё", callback_data=MenuCallback(target=MenuTarget.search).pack()),
+        InlineKeyboardButton(text="🛍️ Каталог", callback_data=CatalogCallback(page=0).pack())
+    )
     return builder.as_markup()
 
 
@@ -68,36 +95,36 @@ def get_product_keyboard(product_id: int, stock: int, in_cart: int = 0) -> Inlin
     if in_cart > 0:
         btn_row.append(InlineKeyboardButton(
             text="➖",
-            callback_data=f"cart:dec:{product_id}"
+            callback_data=CartCallback(action=CartAction.dec, product_id=product_id).pack()
         ))
     else:
         btn_row.append(InlineKeyboardButton(
             text="⚪",
-            callback_data="noop"
+            callback_data=NOOP
         ))
 
     # Отображение количества в корзине
     btn_row.append(InlineKeyboardButton(
         text=f"🛒 {in_cart}" if in_cart > 0 else "🛒 0",
-        callback_data="noop"
+        callback_data=NOOP
     ))
 
     # Кнопка Плюс (активна только если есть товар на складе)
     if stock > 0:
         btn_row.append(InlineKeyboardButton(
             text="➕",
-            callback_data=f"cart:add:{product_id}"
+            callback_data=CartCallback(action=CartAction.add, product_id=product_id).pack()
         ))
     else:
         btn_row.append(InlineKeyboardButton(
             text="❌",
-            callback_data="noop"
+            callback_data=NOOP
         ))
 
     builder.row(*btn_row)
 
     # Кнопка "В каталог"
-    builder.row(InlineKeyboardButton(text="🔙 В каталог", callback_data="catalog:page:0"))
+    builder.row(InlineKeyboardButton(text="🔙 В каталог", callback_data=CatalogCallback(page=0).pack()))
 
     return builder.as_markup()
 
@@ -110,13 +137,13 @@ def get_cart_keyboard(cart_items: list) -> InlineKeyboardMarkup:
     # Кнопки для каждого товара
     for item in cart_items:
         builder.row(InlineKeyboardButton(
-            text=f"❌ {item['name']} ({item['quantity']}шт)",
-            callback_data=f"cart:remove:{item['product_id']}"
+            text=f"❌ {item.name} ({item.quantity}шт)",
+            callback_data=CartCallback(action=CartAction.remove, product_id=item.product_id).pack()
         ))
 
-    builder.row(InlineKeyboardButton(text="🧹 Очистить корзину", callback_data="cart:clear"))
-    builder.row(InlineKeyboardButton(text="✅ Оформить заказ", callback_data="order:checkout"))
-    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="menu:main"))
+    builder.row(InlineKeyboardButton(text="🧹 Очистить корзину", callback_data=CartCallback(action=CartAction.clear).pack()))
+    builder.row(InlineKeyboardButton(text="✅ Оформить заказ", callback_data=OrderCallback(action=OrderAction.checkout).pack()))
+    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=MenuCallback(target=MenuTarget.main).pack()))
 
     return builder.as_markup()
 
@@ -124,8 +151,8 @@ def get_cart_keyboard(cart_items: list) -> InlineKeyboardMarkup:
 def get_checkout_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура оформления заказа"""
     builder = InlineKeyboardBuilder()
-    builder.row(InlineKeyboardButton(text="💳 Оплатить", callback_data="order:pay"))
-    builder.row(InlineKeyboardButton(text="🔙 Вернуться в корзину", callback_data="menu:cart"))
+    builder.row(InlineKeyboardButton(text="💳 Оплатить", callback_data=OrderCallback(action=OrderAction.pay).pack()))
+    builder.row(InlineKeyboardButton(text="🔙 Вернуться в корзину", callback_data=MenuCallback(target=MenuTarget.cart).pack()))
     return builder.as_markup()
 
 
@@ -136,7 +163,7 @@ def get_payment_keyboard(order_number: str) -> InlineKeyboardMarkup:
         text="📩 Написать админу",
         url="https://t.me/romasha_1"
     ))
-    builder.row(InlineKeyboardButton(text="🔙 В главное меню", callback_data="menu:main"))
+    builder.row(InlineKeyboardButton(text="🔙 В главное меню", callback_data=MenuCallback(target=MenuTarget.main).pack()))
     return builder.as_markup()
 
 
@@ -147,19 +174,19 @@ def get_bonuses_keyboard(bonuses: list, has_active: bool) -> InlineKeyboardMarku
     builder = InlineKeyboardBuilder()
 
     for bonus in bonuses:
-        status = "✅ Активна" if bonus['is_active'] else "❌ Использована"
+        status = "✅ Активна" if bonus.is_active else "❌ Использована"
         builder.row(InlineKeyboardButton(
-            text=f"🎁 Скидка {bonus['discount_percent']}% - {status}",
-            callback_data=f"bonus:toggle:{bonus['id']}" if bonus['is_active'] else "noop"
+            text=f"🎁 Скидка {bonus.discount_percent}% - {status}",
+            callback_data=BonusCallback(action=BonusAction.use, value=1).pack() if bonus.is_active else NOOP
         ))
 
     if has_active:
         builder.row(InlineKeyboardButton(
             text="🎯 Применить скидку к заказу",
-            callback_data="bonus:apply"
+            callback_data=BonusCallback(action=BonusAction.apply).pack()
         ))
 
-    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="menu:main"))
+    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=MenuCallback(target=MenuTarget.main).pack()))
     return builder.as_markup()
 
 
@@ -169,27 +196,14 @@ def get_admin_keyboard() -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
     builder.row(KeyboardButton(text="➕ Добавить товар"), KeyboardButton(text="📦 Пополнить товар"))
     builder.row(KeyboardButton(text="🗑️ Удалить товар"), KeyboardButton(text="💰 Изменить цену"))
+    builder.row(KeyboardButton(text="📥 Импорт товаров"))
     builder.row(KeyboardButton(text="👥 Список админов"), KeyboardButton(text="🎁 Система бонусов"))
     builder.row(KeyboardButton(text="🚫 ЧС пользователей"), KeyboardButton(text="📋 История заказов"))
-    builder.row(KeyboardButton(text="🔧 Техработы"))  # ✅ Новая кнопка
+    builder.row(KeyboardButton(text="📊 Статистика"), KeyboardButton(text="🔧 Техработы"))
     builder.row(KeyboardButton(text="🔙 В главное меню"))
     return builder.as_markup(resize_keyboard=True)
 
 
-def get_admin_products_stock_keyboard(products: list) -> InlineKeyboardMarkup:
-    """Клавиатура выбора товара для пополнения (список товаров)"""
-    builder = InlineKeyboardBuilder()
-
-    for product in products:
-        builder.row(InlineKeyboardButton(
-            text=f"{product['name']} (📦{product['stock']})",
-            callback_data=f"admin:stock:product:{product['id']}"
-        ))
-
-    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="admin:menu"))
-    return builder.as_markup()
-
-
 def get_admin_stock_keyboard(product_id: int, stock: int) -> InlineKeyboardMarkup:
     """Клавиатура управления остатком товара (+/-)"""
     builder = InlineKeyboardBuilder()
@@ -201,120 +215,166 @@ def get_admin_stock_keyboard(product_id: int, stock: int) -> InlineKeyboardMarku
     if stock > 0:
         btn_row.append(InlineKeyboardButton(
             text="➖",
-            callback_data=f"admin:stock:dec:{product_id}"
+            callback_data=StockCallback(action=StockAction.dec, product_id=product_id).pack()
         ))
     else:
         btn_row.append(InlineKeyboardButton(
             text="⛔",
-            callback_data="noop"
+            callback_data=NOOP
         ))
 
     # Отображение текущего количества
     btn_row.append(InlineKeyboardButton(
         text=f"📦 {stock}",
-        callback_data="noop"
+        callback_data=NOOP
     ))
 
     # Кнопка Плюс
     btn_row.append(InlineKeyboardButton(
         text="➕",
-        callback_data=f"admin:stock:add:{product_id}"
+        callback_data=StockCallback(action=StockAction.add, product_id=product_id).pack()
     ))
 
     builder.row(*btn_row)
 
     # Кнопки навигации
-    builder.row(InlineKeyboardButton(text="🔙 К товарам", callback_data="admin:stock:menu"))
-    builder.row(InlineKeyboardButton(text="🔙 В админ-панель", callback_data="admin:menu"))
+    builder.row(InlineKeyboardButton(text="🔙 К товарам", callback_data=StockCallback(action=StockAction.menu).pack()))
+    builder.row(InlineKeyboardButton(text="🔙 В админ-панель", callback_data=MenuCallback(target=MenuTarget.admin).pack()))
 
     return builder.as_markup()
 
 
-def get_admin_products_delete_keyboard(products: list) -> InlineKeyboardMarkup:
-    """Клавиатура выбора товара для удаления"""
-    builder = InlineKeyboardBuilder()
+PRODUCT_VIEW_LABELS = {ProductView.all: "📋 Все", ProductView.low: "⚠️ Мало", ProductView.out: "⛔ Нет"}
+
 
+def _product_pick_button(picker: ProductPicker, product: Product) -> InlineKeyboardButton:
+    if picker is ProductPicker.price:
+        return InlineKeyboardButton(
+            text=f"{product.name} ({product.price}₽)",
+            callback_data=ProductCallback(action=ProductAction.price, product_id=product.id).pack()
+        )
+    if picker is ProductPicker.delete:
+        callback_data = ProductCallback(action=ProductAction.delete, product_id=product.id).pack()
+    else:
+        callback_data = StockCallback(action=StockAction.view, product_id=product.id).pack()
+    return InlineKeyboardButton(text=f"{product.name} (📦{product.stock})", callback_data=callback_data)
+
+
+def get_admin_product_picker_keyboard(picker: ProductPicker, products: list, has_more: bool,
+                                      view: ProductView, searching: bool) -> InlineKeyboardMarkup:
+    """Страница пикера товаров в админке (цена / удаление / пополнение)"""
+    builder = InlineKeyboardBuilder()
     for product in products:
+        builder.row(_product_pick_button(picker, product))
+    if has_more:
         builder.row(InlineKeyboardButton(
-            text=f"{product['name']} (📦{product['stock']})",
-            callback_data=f"admin:delete:product:{product['id']}"
+            text="➡️ Дальше",
+            callback_data=ProductPickCallback(action=ProductPickAction.more, picker=picker, view=view).pack()
         ))
 
-    builder.row(InlineKeyboardButton(text="🔙 В админ-панель", callback_data="admin:menu"))
+    # Фильтры по остатку; нажатие на текущий фильтр сбрасывает поиск
+    builder.row(*(
+        InlineKeyboardButton(
+            text=f"• {label}" if option is view and not searching else label,
+            callback_data=ProductPickCallback(action=ProductPickAction.view, picker=picker, view=option).pack()
+        )
+        for option, label in PRODUCT_VIEW_LABELS.items()
+    ))
+    builder.row(InlineKeyboardButton(
+        text="🔍 Поиск по названию",
+        callback_data=ProductPickCallback(action=ProductPickAction.search, picker=picker, view=view).pack()
+    ))
+    builder.row(InlineKeyboardButton(text="🔙 В админ-панель", callback_data=MenuCallback(target=MenuTarget.admin).pack()))
     return builder.as_markup()
 
+
 def get_admin_product_actions(product_id: int) -> InlineKeyboardMarkup:
     """Действия с товаром для админа"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"admin:product:delete:{product_id}"),
-        InlineKeyboardButton(text="💰 Цена", callback_data=f"admin:product:price:{product_id}")
+        InlineKeyboardButton(text="🗑️ Удалить", callback_data=ProductCallback(action=ProductAction.delete, product_id=product_id).pack()),
+        InlineKeyboardButton(text="💰 Цена", callback_data=ProductCallback(action=ProductAction.price, product_id=product_id).pack())
     )
-    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="admin:products"))
+    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=ProductCallback(action=ProductAction.delete_menu).pack()))
     return builder.as_markup()
 
 
-def get_admin_users_keyboard(users: list, action: str) -> InlineKeyboardMarkup:
-    """Клавиатура для работы с пользователями (админы/ЧС)"""
+def get_user_picker_keyboard(picker: UserPicker, users: list, has_more: bool,
+                             searching: bool) -> InlineKeyboardMarkup:
+    """Страница пикера пользователей в админке"""
     builder = InlineKeyboardBuilder()
     for user in users:
-        name = user.get('username') or user.get('first_name') or str(user['user_id'])
+        name = f"@{user.username}" if user.username else user.first_name or str(user.user_id)
         builder.row(InlineKeyboardButton(
-            text=f"{name} ({user['user_id']})",
-            callback_data=f"admin:{action}:{user['user_id']}"
+            text=f"{name} ({user.user_id})",
+            callback_data=UserPickCallback(action=UserPickAction.pick, picker=picker, user_id=user.user_id).pack()
         ))
-    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="admin:menu"))
-    return builder.as_markup()
-
-
-def get_admin_bonuses_keyboard(users: list) -> InlineKeyboardMarkup:
-    """Клавиатура выбора пользователя для бонусов"""
-    builder = InlineKeyboardBuilder()
-    for user in users:
-        name = user.get('username') or user.get('first_name') or str(user['user_id'])
+    if has_more:
         builder.row(InlineKeyboardButton(
-            text=f"🎁 {name} ({user['user_id']})",
-            callback_data=f"admin:bonus:user:{user['user_id']}"
+            text="➡️ Дальше", callback_data=UserPickCallback(action=UserPickAction.more, picker=picker).pack()
         ))
-    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="admin:menu"))
+    search_row = [InlineKeyboardButton(
+        text="🔍 Поиск", callback_data=UserPickCallback(action=UserPickAction.search, picker=picker).pack()
+    )]
+    if searching:
+        search_row.append(InlineKeyboardButton(
+            text="👥 Все", callback_data=UserPickCallback(action=UserPickAction.reset, picker=picker).pack()
+        ))
+    builder.row(*search_row)
+    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=MenuCallback(target=MenuTarget.admin).pack()))
     return builder.as_markup()
 
 
-def get_bonus_actions_keyboard(user_id: int) -> InlineKeyboardMarkup:
-    """Действия с бонусами пользователя"""
-    builder = InlineKeyboardBuilder()
-    builder.row(
-        InlineKeyboardButton(text="➕ Добавить скидку", callback_data=f"admin:bonus:add:{user_id}"),
-        InlineKeyboardButton(text="📋 Мои скидки", callback_data=f"admin:bonus:list:{user_id}")
+def _order_button(order: Order) -> InlineKeyboardButton:
+    status_emoji = {"pending": "⏳", "paid": "✅", "cancelled": "❌"}.get(order.status, "📦")
+    return InlineKeyboardButton(
+        text=f"{status_emoji} {order.order_number} | {order.final_price}₽",
+        callback_data=OrderCallback(action=OrderAction.view, order_number=order.order_number).pack()
     )
-    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="admin:bonuses"))
-    return builder.as_markup()
 
 
 def get_orders_keyboard(orders: list) -> InlineKeyboardMarkup:
     """Клавиатура списка заказов"""
     builder = InlineKeyboardBuilder()
     for order in orders[:10]:  # Последние 10 заказов
-        status_emoji = {"pending": "⏳", "paid": "✅", "cancelled": "❌"}.get(order['status'], "📦")
+        builder.row(_order_button(order))
+    builder.row(InlineKeyboardButton(
+        text="🔎 Найти заказ", callback_data=OrderCallback(action=OrderAction.search).pack()
+    ))
+    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=MenuCallback(target=MenuTarget.admin).pack()))
+    return builder.as_markup()
+
+
+def get_order_search_keyboard(orders: list, has_more: bool) -> InlineKeyboardMarkup:
+    """Клавиатура результатов поиска заказов"""
+    builder = InlineKeyboardBuilder()
+    for order in orders:
+        builder.row(_order_button(order))
+    if has_more:
         builder.row(InlineKeyboardButton(
-            text=f"{status_emoji} {order['order_number']} | {order['final_price']}₽",
-            callback_data=f"admin:order:{order['order_number']}"
+            text="➡️ Дальше", callback_data=OrderCallback(action=OrderAction.search_more).pack()
         ))
-    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="admin:menu"))
+    builder.row(
+        InlineKeyboardButton(text="🔎 Новый поиск", callback_data=OrderCallback(action=OrderAction.search).pack()),
+        InlineKeyboardButton(text="🔙 К заказам", callback_data=MenuCallback(target=MenuTarget.admin_orders).pack())
+    )
     return builder.as_markup()
 
 
-def get_order_admin_keyboard(order_number: str) -> InlineKeyboardMarkup:
-    """Клавиатура управления заказом"""
+def get_order_admin_keyboard(order_number: str, archived: bool = False) -> InlineKeyboardMarkup:
+    """Клавиатура управления заказом (архивный заказ - только просмотр)"""
     builder = InlineKeyboardBuilder()
+    if archived:
+        builder.row(InlineKeyboardButton(text="🔙 К заказам", callback_data=MenuCallback(target=MenuTarget.admin_orders).pack()))
+        return builder.as_markup()
     builder.row(
-        InlineKeyboardButton(text="✅ Подтвердить", callback_data=f"admin:order:confirm:{order_number}"),
-        InlineKeyboardButton(text="❌ Отменить", callback_data=f"admin:order:cancel:{order_number}")
+        InlineKeyboardButton(text="✅ Подтвердить", callback_data=OrderCallback(action=OrderAction.confirm, order_number=order_number).pack()),
+        InlineKeyboardButton(text="❌ Отменить", callback_data=OrderCallback(action=OrderAction.cancel, order_number=order_number).pack())
     )
     builder.row(
-        InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"admin:order:delete:{order_number}")  # ✅ DELETE
+        InlineKeyboardButton(text="🗑️ Удалить", callback_data=OrderCallback(action=OrderAction.delete, order_number=order_number).pack())  # ✅ DELETE
     )
-    builder.row(InlineKeyboardButton(text="🔙 К заказам", callback_data="admin:orders"))
+    builder.row(InlineKeyboardButton(text="🔙 К заказам", callback_data=MenuCallback(target=MenuTarget.admin_orders).pack()))
     return builder.as_markup()
 
 
@@ -322,24 +382,24 @@ def get_admin_order_keyboard(order_number: str) -> InlineKeyboardMarkup:
     """Клавиатура для уведомления о заказе"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="✅ Подтвердить", callback_data=f"admin:order:confirm:{order_number}"),
-        InlineKeyboardButton(text="❌ Отменить", callback_data=f"admin:order:cancel:{order_number}")
+        InlineKeyboardButton(text="✅ Подтвердить", callback_data=OrderCallback(action=OrderAction.confirm, order_number=order_number).pack()),
+        InlineKeyboardButton(text="❌ Отменить", callback_data=OrderCallback(action=OrderAction.cancel, order_number=order_number).pack())
     )
     builder.row(
-        InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"admin:order:delete:{order_number}")
+        InlineKeyboardButton(text="🗑️ Удалить", callback_data=OrderCallback(action=OrderAction.delete, order_number=order_number).pack())
     )
-    builder.row(InlineKeyboardButton(text="📋 Открыть заказ", callback_data=f"admin:order:{order_number}"))
+    builder.row(InlineKeyboardButton(text="📋 Открыть заказ", callback_data=OrderCallback(action=OrderAction.view, order_number=order_number).pack()))
     return builder.as_markup()
 
 def get_bonus_actions_keyboard(user_id: int) -> InlineKeyboardMarkup:
     """Действия с бонусами пользователя"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="➕ Добавить скидку", callback_data=f"admin:bonus:add:{user_id}"),
-        InlineKeyboardButton(text="🗑️ Удалить скидку", callback_data=f"admin:bonus:remove:{user_id}")
+        InlineKeyboardButton(text="➕ Добавить скидку", callback_data=BonusCallback(action=BonusAction.add, value=user_id).pack()),
+        InlineKeyboardButton(text="🗑️ Удалить скидку", callback_data=BonusCallback(action=BonusAction.remove, value=user_id).pack())
     )
     # Убрали кнопку "Мои скидки"
-    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="admin:bonuses"))
+    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=MenuCallback(target=MenuTarget.admin_bonuses).pack()))
     return builder.as_markup()
 
 
@@ -351,43 +411,29 @@ def get_bonus_choice_keyboard(use_bonus: bool) -> InlineKeyboardMarkup:
         # Скидка ИСПОЛЬЗУЕТСЯ
         builder.row(InlineKeyboardButton(
             text="✅ Использовать скидку",
-            callback_data="bonus:toggle:no"  # Переключить на НЕТ
+            callback_data=BonusCallback(action=BonusAction.use, value=0).pack()  # Переключить на НЕТ
         ))
     else:
         # Скидка НЕ используется
         builder.row(InlineKeyboardButton(
             text="❌ Использовать скидку",
-            callback_data="bonus:toggle:yes"  # Переключить на ДА
+            callback_data=BonusCallback(action=BonusAction.use, value=1).pack()  # Переключить на ДА
         ))
 
     # Кнопка оформления заказа (всегда доступна)
     builder.row(InlineKeyboardButton(
         text="✅ Оформить заказ",
-        callback_data="order:pay"
+        callback_data=OrderCallback(action=OrderAction.pay).pack()
     ))
 
     builder.row(InlineKeyboardButton(
         text="🔙 Вернуться в корзину",
-        callback_data="menu:cart"
+        callback_data=MenuCallback(target=MenuTarget.cart).pack()
     ))
 
     return builder.as_markup()
 
 
-def get_admin_products_price_keyboard(products: list) -> InlineKeyboardMarkup:
-    """Клавиатура выбора товара для изменения цены"""
-    builder = InlineKeyboardBuilder()
-
-    for product in products:
-        builder.row(InlineKeyboardButton(
-            text=f"{product['name']} ({product['price']}₽)",
-            callback_data=f"admin:price:product:{product['id']}"
-        ))
-
-    builder.row(InlineKeyboardButton(text="🔙 В админ-панель", callback_data="admin:menu"))
-    return builder.as_markup()
-
-
 def get_maintenance_keyboard(is_maintenance: bool) -> InlineKeyboardMarkup:
     """Клавиатура управления режимом техработ"""
     builder = InlineKeyboardBuilder()
@@ -395,14 +441,14 @@ def get_maintenance_keyboard(is_maintenance: bool) -> InlineKeyboardMarkup:
     if is_maintenance:
         builder.row(InlineKeyboardButton(
             text="✅ Выключить техработы",
-            callback_data="maintenance:toggle:off"
+            callback_data=MaintenanceCallback(enable=False).pack()
         ))
     else:
         builder.row(InlineKeyboardButton(
             text="❌ Включить техработы",
-            callback_data="maintenance:toggle:on"
+            callback_data=MaintenanceCallback(enable=True).pack()
         ))
 
-    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="admin:menu"))
+    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=MenuCallback(target=MenuTarget.admin).pack()))
     return builder.as_markup()
 
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import database as db
+
+# Настройки по умолчанию (переопределяются через configure() из main.py)
+CHECK_INTERVAL = 60              # как часто планировщик смотрит, что пора запускать
+IDLE_UPDATES = 30                # апдейтов за CHECK_INTERVAL, выше которых бот считается занятым
+QUIET_HOURS = (3, 6)             # окно низкой нагрузки [с, до) по локальному времени сервера
+STEP_PAUSE = 0.5                 # сек между шагами: обработчики успевают забрать соединение
+VACUUM_STEP_PAGES = 1000         # страниц за один incremental_vacuum
+VACUUM_MAX_STEPS = 50
+VACUUM_CONVERT_RATIO = 0.2       # доля пустых страниц, ради которой файл переводится в INCREMENTAL
+ANALYSIS_LIMIT = 400             # строк индекса на ANALYZE в optimize (приблизительная статистика)
+
+# задача -> (интервал в секундах, только в окне низкой нагрузки)
+TASKS: Dict[str, Tuple[int, bool]] = {
+    "optimize": (3600, False),
+    "vacuum": (6 * 3600, False),
+    "analyze": (24 * 3600, True),
+    "integrity": (7 * 24 * 3600, True),
+}
+
+
+class DbMaintenance:
+    """Планировщик обслуживания БД: ANALYZE, PRAGMA optimize, incremental_vacuum, проверка целостности"""
+
+    def __init__(self, check_interval: int = CHECK_INTERVAL, idle_updates: int = IDLE_UPDATES,
+                 quiet_hours: Tuple[int, int] = QUIET_HOURS):
+        self.check_interval = check_interval
+        self.idle_updates = idle_updates
+        self.quiet_hours = quiet_hours
+        self.intervals = {name: interval for name, (interval, _) in TASKS.items()}
+        # задача -> {"at", "duration", "result", "ok", "freelist", "fragmentation"} последнего запуска
+        self.runs: Dict[str, Dict] = {}
+        self._steps: Dict[str, Callable[[], Awaitable[str]]] = {
+            "optimize": self.optimize,
+            "vacuum": self.vacuum,
+            "analyze": self.analyze,
+            "integrity": self.integrity,
+        }
+
+    def configure(self, check_interval: int = None, idle_updates: int = None,
+                  quiet_hours: Tuple[int, int] = None, intervals: Dict[str, int] = None):
+        """Переопределение настроек (из переменных окружения)"""
+        if check_interval is not None:
+            self.check_interval = check_interval
+        if idle_updates is not None:
+            self.idle_updates = idle_updates
+        if quiet_hours is not None:
+            self.quiet_hours = quiet_hours
+        if intervals:
+            self.intervals.update(intervals)
+
+    def in_quiet_hours(self, hour: Optional[int] = None) -> bool:
+        start, end = self.quiet_hours
+        hour = time.localtime().tm_hour if hour is None else hour
+        return start <= hour < end if start <= end else hour >= start or hour < end
+
+    def due(self, name: str, now: float) -> bool:
+        last = self.runs.get(name)
+        return self.intervals[name] > 0 and (last is None or now - last["at"] >= self.intervals[name])
+
+    # ==================== ШАГИ ====================
+    async def optimize(self) -> str:
+        """Обновление статистики планировщика. Простой PRAGMA optimize на свежем соединении
+        ничего не делает (смотрит только таблицы, к которым обращалось это соединение):
+        с 3.46 - флаг 0x10000 "все таблицы", раньше - ANALYZE с analysis_limit"""
+        async with db.connect() as conn:
+            if sqlite3.sqlite_version_info >= (3, 46):
+                await conn.execute("PRAGMA optimize=0x10002")
+                mode = "PRAGMA optimize=0x10002"
+            else:
+                await conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+                await conn.execute("ANALYZE")
+                mode = f"ANALYZE (analysis_limit={ANALYSIS_LIMIT})"
+            await conn.commit()
+        return mode
+
+    async def analyze(self) -> str:
+        async with db.connect() as conn:
+            await conn.execute("ANALYZE")
+            await conn.commit()
+        return "ok"
+
+    async def vacuum(self) -> str:
+        """Возврат пустых страниц файловой системе порциями по VACUUM_STEP_PAGES"""
+        stats = await db_stats()
+        if stats["auto_vacuum"] != 2:
+            # Файл создан до auto_vacuum = INCREMENTAL: режим меняется только полным VACUUM,
+            # поэтому делаем его один раз, в тихие часы и если есть что освобождать
+            if not self.in_quiet_hours() or stats["fragmentation"] < VACUUM_CONVERT_RATIO:
+                return f"пропущено (auto_vacuum={stats['auto_vacuum']}, пустых страниц {stats['freelist']})"
+            async with db.connect() as conn:
+                await conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                await conn.execute("VACUUM")
+            after = await db_stats()
+            return f"VACUUM: {stats['file_bytes'] // 1024} → {after['file_bytes'] // 1024} КБ, режим INCREMENTAL"
+
+        freed = 0
+        for _ in range(VACUUM_MAX_STEPS):
+            if not stats["freelist"]:
+                break
+            async with db.connect() as conn:
+                # executescript прогоняет прагму до конца (execute освобождает одну страницу)
+                await conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})")
+            freed += stats["freelist"]
+            stats = await db_stats()
+            freed -= stats["freelist"]
+            await asyncio.sleep(STEP_PAUSE)
+        return f"освобождено {freed} стр. ({freed * stats['page_size'] // 1024} КБ)"
+
+    async def integrity(self) -> str:
+        async with db.connect() as conn:
+            rows = await conn.execute_fetchall("PRAGMA quick_check(10)")
+        problems = [row[0] for row in rows if row[0] != "ok"]
+        if problems:
+            raise RuntimeError("; ".join(problems))
+        return "ok"
+
+    # ==================== ЗАПУСК ====================
+    async def run_step(self, name: str) -> Dict:
+        started = time.perf_counter()
+        try:
+            result, ok = await self._steps[name](), True
+        except Exception as e:
+            result, ok = str(e), False
+            logging.error(f"❌ Обслуживание БД ({name}): {e}")
+        run = {"at": time.time(), "duration": time.perf_counter() - started, "result": result, "ok": ok}
+        try:
+            # Пустые страницы после шага - в запись запуска, чтобы видеть их динамику
+            stats = await db_stats()
+            run["freelist"], run["fragmentation"] = stats["freelist"], stats["fragmentation"]
+        except Exception as e:
+            logging.error(f"❌ Обслуживание БД: не удалось прочитать состояние файла: {e}")
+        self.runs[name] = run
+        logging.info(f"🧹 Обслуживание БД: {name} за {run['duration']:.2f} с - {result}")
+        return run
+
+    async def run(self, activity: Callable[[], int]):
+        """Фоновая задача: запускает назревшие шаги, пока бот простаивает.
+        activity() - счётчик обработанных апдейтов"""
+        seen = activity()
+        while True:
+            await asyncio.sleep(self.check_interval)
+            current = activity()
+            busy = current - seen > self.idle_updates
+            seen = current
+            if busy:
+                continue
+
+            quiet = self.in_quiet_hours()
+            for name, (_, heavy) in TASKS.items():
+                if (quiet or not heavy) and self.due(name, time.time()):
+                    await self.run_step(name)
+                    await asyncio.sleep(STEP_PAUSE)
+
+    async def report(self) -> str:
+        stats = await db_stats()
+        text = (
+            f"🩺 <b>Состояние БД</b>\n\n"
+            f"📁 Файл: {stats['file_bytes'] / 1048576:.2f} МБ "
+            f"({stats['page_count']} стр. по {stats['page_size']} Б)\n"
+            f"🕳️ Пустых страниц: {stats['freelist']} ({stats['fragmentation'] * 100:.1f}%)\n"
+            f"🧹 auto_vacuum: {('NONE', 'FULL', 'INCREMENTAL')[stats['auto_vacuum']]}\n"
+            f"🌙 Тихие часы: {self.quiet_hours[0]:02d}:00-{self.quiet_hours[1]:02d}:00\n\n"
+        )
+        lines: List[str] = []
+        for name in TASKS:
+            run = self.runs.get(name)
+            if run is None:
+                lines.append(f"• {name}: ещё не запускался\n")
+                continue
+            when = time.strftime("%d.%m %H:%M", time.localtime(run["at"]))
+            mark = "✅" if run["ok"] else "❌"
+            pages = (f", пустых стр. {run['freelist']} ({run['fragmentation'] * 100:.1f}%)"
+                     if "freelist" in run else "")
+            lines.append(f"• {mark} {name}: {when}, {run['duration']:.2f} с - {run['result']}{pages}\n")
+        return text + "".join(lines)
+
+
+async def db_stats() -> Dict:
+    """Размер файла, пустые страницы и режим auto_vacuum основной БД"""
+    async with db.connect() as conn:
+        values = {}
+        for pragma in ("page_size", "page_count", "freelist_count", "auto_vacuum"):
+            values[pragma] = (await (await conn.execute(f"PRAGMA {pragma}")).fetchone())[0]
+    file_bytes = os.path.getsize(db.DB_PATH)
+    if os.path.exists(db.DB_PATH + "-wal"):
+        file_bytes += os.path.getsize(db.DB_PATH + "-wal")
+    return {
+        "page_size": values["page_size"],
+        "page_count": values["page_count"],
+        "freelist": values["freelist_count"],
+        "auto_vacuum": values["auto_vacuum"],
+        "fragmentation": values["freelist_count"] / values["page_count"] if values["page_count"] else 0.0,
+        "file_bytes": file_bytes,
+    }
+
+
+maintenance = DbMaintenance()
@@ -0,0 +1,640 @@
+import asyncio
+import bisect
+import functools
+import html
+import inspect
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+from aiogram.types import CallbackQuery, TelegramObject
+
+from callbacks import CallbackRouter
+
+# Настройки по умолчанию (переопределяются через configure() из main.py)
+SLOW_QUERY_MS = 100              # запросы дольше попадают в журнал вместе с EXPLAIN QUERY PLAN
+SLOW_LOG_SIZE = 50               # сколько последних медленных запросов помним
+SQL_PREVIEW = 120                # сколько символов запроса показываем в отчётах
+# Границы корзин гистограмм, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LOOP_LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+EXPLAINED = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+
+# ==================== ГИСТОГРАММЫ ====================
+class Histogram:
+    """Гистограмма задержек с фиксированными корзинами: O(log n) на замер, без списка значений"""
+
+    __slots__ = ("buckets", "counts", "count", "total", "max")
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя - всё, что больше buckets[-1]
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля: верхняя граница корзины, в которую он попал"""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+
+# ==================== БД ====================
+class FunctionStats:
+    __slots__ = ("latency", "acquire", "errors", "rows")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.acquire = Histogram()       # открытие соединения: очередь потока aiosqlite + sqlite3.connect
+        self.errors = 0
+        self.rows = 0
+
+
+class StatementStats:
+    __slots__ = ("function", "calls", "total", "max", "rows")
+
+    def __init__(self, function: str):
+        self.function = function
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+
+_current_function: ContextVar[str] = ContextVar("db_function", default="?")
+
+
+def _count_rows(result: Any) -> int:
+    """Сколько строк вернула функция БД: список, (список, курсор), иначе одна запись или ничего"""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    return 0 if result is None else 1
+
+
+class DbMetrics:
+    """Замеры функций database.py и их SQL: задержки, строки, открытие соединений, медленные запросы"""
+
+    def __init__(self, slow_query_ms: int = SLOW_QUERY_MS):
+        self.enabled = False
+        self.slow_query = slow_query_ms / 1000
+        self.started = time.time()
+        self.functions: Dict[str, FunctionStats] = {}
+        self.statements: Dict[str, StatementStats] = {}
+        self.slow_log: deque = deque(maxlen=SLOW_LOG_SIZE)
+        # Статистика запросов пишется из потоков aiosqlite
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool = None, slow_query_ms: int = None):
+        """Переопределение настроек (из переменных окружения)"""
+        if enabled is not None:
+            self.enabled = enabled
+        if slow_query_ms is not None:
+            self.slow_query = slow_query_ms / 1000
+
+    def _function(self, name: str) -> FunctionStats:
+        stats = self.functions.get(name)
+        if stats is None:
+            stats = self.functions[name] = FunctionStats()
+        return stats
+
+    # ==================== ОБЁРТКИ ====================
+    def instrument(self, module, skip: Sequence[str] = ()):
+        """Оборачивает публичные корутины модуля. Фоновые циклы (run_*) не меряются:
+        они не завершаются, а их запросы и так видны по вызываемым функциям"""
+        for name, func in list(vars(module).items()):
+            if (name.startswith(("_", "run_")) or name in skip
+                    or not inspect.iscoroutinefunction(func) or func.__module__ != module.__name__):
+                continue
+            setattr(module, name, self._wrap(name, func))
+
+    def _wrap(self, name: str, func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return await func(*args, **kwargs)
+            stats = self._function(name)
+            token = _current_function.set(name)
+            started = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException:
+                stats.errors += 1
+                raise
+            finally:
+                stats.latency.observe(time.perf_counter() - started)
+                _current_function.reset(token)
+            stats.rows += _count_rows(result)
+            return result
+        return wrapper
+
+    def connect_kwargs(self) -> Dict:
+        """Аргументы aiosqlite.connect: при включённых замерах - фабрика соединения с таймерами"""
+        if not self.enabled:
+            return {}
+        function = _current_function.get()
+        requested = time.perf_counter()
+        return {"factory": lambda *args, **kwargs: _TracedConnection(self, function, requested, *args, **kwargs)}
+
+    # ==================== ЗАПИСЬ ЗАМЕРОВ (из потоков aiosqlite) ====================
+    def _acquired(self, function: str, elapsed: float):
+        with self._lock:
+            self._function(function).acquire.observe(elapsed)
+
+    def _statement(self, function: str, sql: str, elapsed: float, rows: int, first: bool, cumulative: float):
+        """elapsed - очередной шаг (execute или выборка), cumulative - всё время запроса до сих пор"""
+        key = " ".join(sql.split())
+        with self._lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                stats = self.statements[key] = StatementStats(function)
+            stats.calls += first
+            stats.total += elapsed
+            stats.rows += rows
+            if cumulative > stats.max:
+                stats.max = cumulative
+
+    def _slow(self, connection: sqlite3.Connection, function: str, sql: str, parameters, elapsed: float):
+        text = " ".join(sql.split())
+        plan = []
+        if text.upper().startswith(EXPLAINED) and parameters is not None:
+            try:
+                # Свой курсор без row_factory: у соединения может стоять фабрика записей
+                cursor = sqlite3.Connection.cursor(connection)
+                cursor.row_factory = None
+                rows = cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+                plan = [row[3] for row in rows]
+            except sqlite3.Error as e:
+                plan = [f"EXPLAIN не удался: {e}"]
+        self.slow_log.append({"at": time.time(), "function": function, "sql": text,
+                              "elapsed": elapsed, "plan": plan})
+        logging.warning(
+            f"🐢 Медленный запрос {elapsed * 1000:.0f} мс в {function}: {text[:SQL_PREVIEW]}"
+            + "".join(f"\n    {line}" for line in plan)
+        )
+
+    # ==================== ОТЧЁТЫ ====================
+    def top_functions(self, limit: int = 10, key: str = "total") -> List[Dict]:
+        rows = []
+        for name, stats in self.functions.items():
+            latency = stats.latency
+            rows.append({
+                "name": name, "calls": latency.count, "total": latency.total, "mean": latency.mean,
+                "p95": latency.quantile(0.95), "max": latency.max, "rows": stats.rows,
+                "errors": stats.errors, "acquire": stats.acquire.mean,
+            })
+        rows.sort(key=lambda row: row[key], reverse=True)
+        return rows[:limit]
+
+    def top_statements(self, limit: int = 5) -> List[Dict]:
+        with self._lock:
+            rows = [{"sql": sql, "function": stats.function, "calls": stats.calls, "total": stats.total,
+                     "max": stats.max, "rows": stats.rows}
+                    for sql, stats in self.statements.items()]
+        rows.sort(key=lambda row: row["total"], reverse=True)
+        return rows[:limit]
+
+    def report(self, limit: int = 10, key: str = "total") -> str:
+        if not self.enabled:
+            return "📉 Замеры БД выключены (DB_METRICS=0)"
+        uptime = (time.time() - self.started) / 3600
+        titles = {"total": "суммарному времени", "mean": "среднему времени", "max": "худшему вызову",
+                  "calls": "числу вызовов"}
+        text = f"📈 <b>Функции БД по {titles[key]}</b> (за {uptime:.1f} ч)\n\n"
+        for row in self.top_functions(limit, key):
+            text += (
+                f"• <code>{row['name']}</code>: {row['calls']} выз., всего {row['total'] * 1000:.0f} мс, "
+                f"ср. {row['mean'] * 1000:.1f} мс, p95 ≤ {row['p95'] * 1000:.1f} мс, "
+                f"макс. {row['max'] * 1000:.1f} мс, строк {row['rows']}, "
+                f"соединение {row['acquire'] * 1000:.1f} мс"
+                + (f", ошибок {row['errors']}" if row['errors'] else "") + "\n"
+            )
+        text += "\n🧾 <b>Самые дорогие запросы:</b>\n"
+        for row in self.top_statements():
+            text += (
+                f"• {row['total'] * 1000:.0f} мс / {row['calls']} выз. ({row['function']}): "
+                f"<code>{html.escape(row['sql'][:SQL_PREVIEW])}</code>\n"
+            )
+        text += f"\n🐢 Медленных запросов (≥ {self.slow_query * 1000:.0f} мс): {len(self.slow_log)}"
+        if self.slow_log:
+            last = self.slow_log[-1]
+            text += (
+                f"\nПоследний: {last['elapsed'] * 1000:.0f} мс в <code>{last['function']}</code>\n"
+                + "".join(f"  {html.escape(line)}\n" for line in last['plan'])
+            )
+        return text
+
+
+# sqlite3 вызывает фабрику в потоке aiosqlite: всё ниже работает вне цикла событий
+class _TracedCursor(sqlite3.Cursor):
+    """Курсор, который досчитывает время выборки строк к своему запросу"""
+
+    def _track(self, started: float, rows: int, first: bool = False):
+        elapsed = time.perf_counter() - started
+        connection = self.connection
+        metrics = connection.metrics
+        self._elapsed += elapsed
+        metrics._statement(connection.function, self._sql, elapsed, rows, first, self._elapsed)
+        if self._elapsed >= metrics.slow_query and not self._logged:
+            self._logged = True
+            metrics._slow(connection, connection.function, self._sql, self._parameters, self._elapsed)
+
+    def execute(self, sql, parameters=()):
+        self._sql, self._parameters, self._elapsed, self._logged = sql, parameters, 0.0, False
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._track(started, 0, first=True)
+
+    def executemany(self, sql, seq_of_parameters):
+        # параметров много - план не строим
+        self._sql, self._parameters, self._elapsed, self._logged = sql, None, 0.0, False
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._track(started, 0, first=True)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._track(started, row is not None)
+        return row
+
+    def fetchmany(self, size: int = None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._track(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._track(started, len(rows))
+        return rows
+
+
+class _TracedConnection(sqlite3.Connection):
+    def __init__(self, metrics: DbMetrics, function: str, requested: float, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics
+        self.function = function
+        metrics._acquired(function, time.perf_counter() - requested)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor(_TracedCursor).execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor(_TracedCursor).executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics._statement(self.function, sql_script, elapsed, 0, True, elapsed)
+
+
+db_metrics = DbMetrics()
+
+
+# ==================== БОТ ====================
+LOOP_LAG_INTERVAL = 0.5          # как часто замеряем задержку цикла событий, сек
+
+
+def _handler_name(handler, event: TelegramObject) -> str:
+    callback = getattr(handler, "callback", None)
+    # Все callback-кнопки роутера идут через один CallbackRouter._dispatch: берём обработчик маршрута
+    router = getattr(callback, "__self__", None)
+    if isinstance(router, CallbackRouter) and isinstance(event, CallbackQuery):
+        route = router.trie.resolve(event.data or "")
+        if route is not None:
+            callback = route.handler.callback
+    return getattr(callback, "__name__", "?")
+
+
+class BotMetrics:
+    """Апдейты, обработчики, вызовы Bot API и задержка цикла событий.
+    Ничего не считает, пока в main.py не подключены middleware (METRICS_PORT > 0)"""
+
+    def __init__(self):
+        self.enabled = False
+        self.updates: Dict[str, int] = {}
+        self.update_latency: Dict[str, Histogram] = {}
+        self.in_flight = 0
+        self.handlers: Dict[str, Histogram] = {}
+        self.api: Dict[str, Histogram] = {}
+        self.api_errors: Dict[Tuple[str, str], int] = {}
+        self.loop_lag = Histogram(LOOP_LAG_BUCKETS)
+        self.loop_lag_last = 0.0
+        # имя кэша -> функция, возвращающая (попадания, промахи)
+        self.caches: Dict[str, Callable[[], Tuple[int, int]]] = {}
+        # имя счётчика -> (метка, функция, возвращающая {значение метки: счёт})
+        self.counters: Dict[str, Tuple[str, Callable[[], Dict[str, int]]]] = {}
+
+    def register_cache(self, name: str, stats: Callable[[], Tuple[int, int]]):
+        self.caches[name] = stats
+
+    def register_counter(self, name: str, label: str, values: Callable[[], Dict[str, int]]):
+        """Счётчик другого модуля как bot_<name>_total{label=...}"""
+        self.counters[name] = (label, values)
+
+    def install(self, dp, bot):
+        """Подключение счётчиков к диспетчеру и сессии бота
+        (время обработчиков пишет HandlerTimingMiddleware, он подключён всегда)"""
+        self.enabled = True
+        dp.update.outer_middleware(UpdateMetricsMiddleware(self))
+        bot.session.middleware(ApiMetricsMiddleware(self))
+
+    async def watch_loop_lag(self, interval: float = LOOP_LAG_INTERVAL):
+        """Фоновая задача: на сколько позже заказанного просыпается sleep"""
+        while True:
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag_last = max(0.0, time.perf_counter() - expected)
+            self.loop_lag.observe(self.loop_lag_last)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware на dp.update: апдейты по типам, время обработки, апдейты в работе"""
+
+    def __init__(self, metrics: BotMetrics):
+        self.metrics = metrics
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        metrics = self.metrics
+        kind = getattr(event, "event_type", "unknown")
+        metrics.updates[kind] = metrics.updates.get(kind, 0) + 1
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            metrics.in_flight -= 1
+            latency = metrics.update_latency.get(kind)
+            if latency is None:
+                latency = metrics.update_latency[kind] = Histogram()
+            latency.observe(time.perf_counter() - started)
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """Внутренний middleware: время конкретного обработчика (после фильтров).
+    Скользящее окно для /latency - всегда, гистограммы Prometheus - если включены"""
+
+    def __init__(self, latency: "HandlerLatency", metrics: BotMetrics):
+        self.latency = latency
+        self.metrics = metrics
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            elapsed = time.perf_counter() - started
+            name = _handler_name(data.get("handler"), event)
+            self.latency.observe(name, elapsed)
+            if self.metrics.enabled:
+                histogram = self.metrics.handlers.get(name)
+                if histogram is None:
+                    histogram = self.metrics.handlers[name] = Histogram()
+                histogram.observe(elapsed)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время и ошибки исходящих вызовов Bot API"""
+
+    def __init__(self, metrics: BotMetrics):
+        self.metrics = metrics
+
+    async def __call__(self, make_request, bot, method):
+        metrics = self.metrics
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter:
+            self._error(name, "RetryAfter")
+            raise
+        except TelegramAPIError as e:
+            self._error(name, type(e).__name__.removeprefix("Telegram"))
+            raise
+        finally:
+            latency = metrics.api.get(name)
+            if latency is None:
+                latency = metrics.api[name] = Histogram()
+            latency.observe(time.perf_counter() - started)
+
+    def _error(self, method: str, error: str):
+        key = (method, error)
+        self.metrics.api_errors[key] = self.metrics.api_errors.get(key, 0) + 1
+
+
+bot_metrics = BotMetrics()
+
+
+# ==================== ОБРАБОТЧИКИ ====================
+HANDLER_WINDOW = 500             # последних вызовов на обработчик для p50/p95/p99
+HANDLER_SLOW = 0.25              # сек: вызов дольше и дольше OUTLIER_FACTOR × p95 - выброс
+OUTLIER_FACTOR = 3.0
+P95_REFRESH = 50                 # пересчёт p95 для поиска выбросов раз в столько вызовов
+OUTLIER_LOG_SIZE = 20
+
+
+class HandlerWindow:
+    __slots__ = ("samples", "calls", "outliers", "p95", "stale")
+
+    def __init__(self, size: int):
+        self.samples: deque = deque(maxlen=size)
+        self.calls = 0
+        self.outliers = 0
+        self.p95 = 0.0
+        self.stale = 0
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+class HandlerLatency:
+    """Скользящие p50/p95/p99 по обработчикам и журнал выбросов"""
+
+    def __init__(self, window: int = HANDLER_WINDOW, slow: float = HANDLER_SLOW):
+        self.window = window
+        self.slow = slow
+        self.handlers: Dict[str, HandlerWindow] = {}
+        self.outlier_log: deque = deque(maxlen=OUTLIER_LOG_SIZE)
+
+    def configure(self, slow_ms: int = None):
+        """Переопределение настроек (из переменных окружения)"""
+        if slow_ms is not None:
+            self.slow = slow_ms / 1000
+
+    def observe(self, name: str, elapsed: float):
+        stats = self.handlers.get(name)
+        if stats is None:
+            stats = self.handlers[name] = HandlerWindow(self.window)
+        stats.samples.append(elapsed)
+        stats.calls += 1
+        stats.stale += 1
+        if stats.stale >= P95_REFRESH:
+            stats.p95 = _percentile(sorted(stats.samples), 0.95)
+            stats.stale = 0
+        if elapsed >= self.slow and elapsed >= stats.p95 * OUTLIER_FACTOR:
+            stats.outliers += 1
+            self.outlier_log.append((time.time(), name, elapsed))
+            logging.warning(f"🐌 Медленный обработчик {name}: {elapsed * 1000:.0f} мс (p95 {stats.p95 * 1000:.0f} мс)")
+
+    def summary(self) -> List[Dict]:
+        rows = []
+        for name, stats in self.handlers.items():
+            ordered = sorted(stats.samples)
+            rows.append({
+                "name": name, "calls": stats.calls, "outliers": stats.outliers,
+                "p50": _percentile(ordered, 0.5), "p95": _percentile(ordered, 0.95),
+                "p99": _percentile(ordered, 0.99), "max": ordered[-1] if ordered else 0.0,
+            })
+        rows.sort(key=lambda row: row["p95"], reverse=True)
+        return rows
+
+    def report(self, limit: int = 15) -> str:
+        rows = self.summary()
+        if not rows:
+            return "⏱️ Обработчики ещё не вызывались"
+        text = f"⏱️ <b>Обработчики по p95</b> (последние {self.window} вызовов каждого)\n\n"
+        for row in rows[:limit]:
+            text += (
+                f"• <code>{row['name']}</code>: {row['calls']} выз., p50 {row['p50'] * 1000:.1f} / "
+                f"p95 {row['p95'] * 1000:.1f} / p99 {row['p99'] * 1000:.1f} мс, макс. {row['max'] * 1000:.0f} мс"
+                + (f", выбросов {row['outliers']}" if row['outliers'] else "") + "\n"
+            )
+        if self.outlier_log:
+            text += "\n🐌 <b>Последние выбросы:</b>\n"
+            for at, name, elapsed in list(self.outlier_log)[-5:]:
+                text += f"• {time.strftime('%H:%M:%S', time.localtime(at))} <code>{name}</code>: {elapsed * 1000:.0f} мс\n"
+        return text
+
+
+handler_latency = HandlerLatency()
+
+
+def install_handler_timing(dp):
+    """Замер времени обработчиков: внутренний middleware на всех типах событий диспетчера"""
+    middleware = HandlerTimingMiddleware(handler_latency, bot_metrics)
+    for observer in (dp.message, dp.callback_query, dp.inline_query):
+        observer.middleware(middleware)
+
+
+# ==================== PROMETHEUS ====================
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, histogram: Histogram, **labels: str) -> List[str]:
+    lines, cumulative = [], 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=repr(bound))} {cumulative}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+    suffix = _labels(**labels) if labels else ""
+    lines.append(f"{name}_sum{suffix} {histogram.total}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+    return lines
+
+
+def render_prometheus(bot: BotMetrics = bot_metrics, database: DbMetrics = db_metrics) -> str:
+    """Все метрики в текстовом формате Prometheus 0.0.4"""
+    lines = [
+        "# HELP bot_updates_total Апдейты по типам",
+        "# TYPE bot_updates_total counter",
+    ]
+    lines += [f"bot_updates_total{_labels(type=kind)} {count}" for kind, count in bot.updates.items()]
+    lines += ["# TYPE bot_updates_in_flight gauge", f"bot_updates_in_flight {bot.in_flight}"]
+
+    lines.append("# TYPE bot_update_seconds histogram")
+    for kind, histogram in bot.update_latency.items():
+        lines += _histogram_lines("bot_update_seconds", histogram, type=kind)
+    lines.append("# TYPE bot_handler_seconds histogram")
+    for name, histogram in bot.handlers.items():
+        lines += _histogram_lines("bot_handler_seconds", histogram, handler=name)
+
+    lines.append("# TYPE bot_api_seconds histogram")
+    for name, histogram in bot.api.items():
+        lines += _histogram_lines("bot_api_seconds", histogram, method=name)
+    lines.append("# TYPE bot_api_errors_total counter")
+    lines += [f"bot_api_errors_total{_labels(method=method, error=error)} {count}"
+              for (method, error), count in bot.api_errors.items()]
+
+    lines.append("# TYPE bot_cache_requests_total counter")
+    for name, stats in bot.caches.items():
+        hits, misses = stats()
+        lines.append(f"bot_cache_requests_total{_labels(cache=name, result='hit')} {hits}")
+        lines.append(f"bot_cache_requests_total{_labels(cache=name, result='miss')} {misses}")
+
+    for name, (label, values) in bot.counters.items():
+        lines.append(f"# TYPE bot_{name}_total counter")
+        lines += [f"bot_{name}_total{_labels(**{label: key})} {count}" for key, count in values().items()]
+
+    lines += ["# TYPE bot_event_loop_lag_seconds histogram"]
+    lines += _histogram_lines("bot_event_loop_lag_seconds", bot.loop_lag)
+    lines += ["# TYPE bot_event_loop_lag_last_seconds gauge", f"bot_event_loop_lag_last_seconds {bot.loop_lag_last}"]
+
+    if database.enabled:
+        lines.append("# TYPE bot_db_function_seconds histogram")
+        for name, stats in list(database.functions.items()):
+            lines += _histogram_lines("bot_db_function_seconds", stats.latency, function=name)
+        lines.append("# TYPE bot_db_connect_seconds histogram")
+        for name, stats in list(database.functions.items()):
+            lines += _histogram_lines("bot_db_connect_seconds", stats.acquire, function=name)
+        lines += ["# TYPE bot_db_slow_queries gauge", f"bot_db_slow_queries {len(database.slow_log)}"]
+    return "\n".join(lines) + "\n"
+
+
+async def start_metrics_server(host: str, port: int):
+    """HTTP /metrics для Prometheus; возвращает runner для остановки (await runner.cleanup())"""
+    from aiohttp import web
+
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(text=render_prometheus(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"📈 Метрики: http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,139 @@
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from aiogram import BaseMiddleware
+from aiogram.filters import Filter
+from aiogram.types import CallbackQuery, InlineQuery, Message, TelegramObject, Update
+
+import database as db
+from config import ADMIN_ID, SUPPORT_USERNAME
+
+
+# ==================== СЧЁТЧИКИ ПРОВЕРОК ====================
+class FilterStats:
+    """Сколько раз за апдейт вычисляются проверки доступа"""
+
+    def __init__(self):
+        self.updates = 0
+        self.evaluations = Counter()
+
+    def report(self) -> str:
+        total = sum(self.evaluations.values())
+        per_update = total / self.updates if self.updates else 0
+        lookups = db.flag_cache_stats["hits"] + db.flag_cache_stats["misses"]
+        hit_ratio = db.flag_cache_stats["hits"] / lookups * 100 if lookups else 0
+
+        text = (
+            f"🧮 <b>Проверки доступа</b>\n\n"
+            f"📨 Апдейтов: {self.updates}\n"
+            f"🔍 Проверок: {total} ({per_update:.2f} на апдейт)\n"
+        )
+        for name, count in self.evaluations.most_common():
+            text += f"• {name}: {count}\n"
+        text += (
+            f"\n💾 Кэш флагов: {db.flag_cache_stats['hits']} попаданий, "
+            f"{db.flag_cache_stats['misses']} запросов к БД ({hit_ratio:.1f}%)"
+        )
+        return text
+
+
+filter_stats = FilterStats()
+_update_evaluations: ContextVar[Optional[Counter]] = ContextVar("update_evaluations", default=None)
+
+
+def count_evaluation(name: str):
+    filter_stats.evaluations[name] += 1
+    current = _update_evaluations.get()
+    if current is not None:
+        current[name] += 1
+
+
+class UpdateStatsMiddleware(BaseMiddleware):
+    """Внешний middleware на dp.update: открывает счётчик проверок для апдейта"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        filter_stats.updates += 1
+        token = _update_evaluations.set(Counter())
+        try:
+            return await handler(event, data)
+        finally:
+            _update_evaluations.reset(token)
+
+
+# ==================== ДОСТУП ====================
+async def user_is_admin(user_id: int) -> bool:
+    return user_id == ADMIN_ID or await db.is_admin(user_id)
+
+
+class IsAdmin(Filter):
+    """Фильтр роутера админки: вычисляется один раз на апдейт"""
+
+    async def __call__(self, event: Union[Message, CallbackQuery]) -> bool:
+        count_evaluation("admin")
+        return await user_is_admin(event.from_user.id)
+
+
+class BanMiddleware(BaseMiddleware):
+    """Внешний middleware на dp.update: ЧС до любых обработчиков и фильтров.
+    Для всех, кого нет в ЧС, - одна проверка множества в памяти, без БД"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: Dict[str, Any]) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+        count_evaluation("ban")
+        if not await db.is_banned(user.id):
+            return await handler(event, data)
+
+        # Админы могут использовать бота, даже если попали в ЧС
+        if await user_is_admin(user.id):
+            return await handler(event, data)
+
+        if event.inline_query:
+            # В inline-режиме некуда писать объяснение: просто пустая выдача
+            await event.inline_query.answer([], cache_time=0, is_personal=True)
+        elif event.callback_query:
+            await event.callback_query.answer("🚫 Вы находитесь в черном списке бота.", show_alert=True)
+        elif event.message:
+            await event.message.answer("🚫 Вы находитесь в черном списке бота.")
+        else:
+            return await handler(event, data)
+        return None
+
+
+class AccessMiddleware(BaseMiddleware):
+    """Режим техработ для роутеров покупателя: одна проверка на апдейт (ЧС - BanMiddleware)"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: Union[Message, CallbackQuery, InlineQuery], data: Dict[str, Any]) -> Any:
+        count_evaluation("access")
+        user_id = event.from_user.id
+
+        # Админы могут использовать бота даже во время техработ
+        if await user_is_admin(user_id):
+            return await handler(event, data)
+
+        if isinstance(event, InlineQuery):
+            # В inline-режиме некуда писать объяснение: просто пустая выдача
+            if await db.get_maintenance_mode():
+                await event.answer([], cache_time=0, is_personal=True)
+                return None
+            return await handler(event, data)
+
+        if await db.get_maintenance_mode():
+            if isinstance(event, CallbackQuery):
+                await event.answer("🔧 Технические работы. Попробуйте позже.", show_alert=True)
+            else:
+                await event.answer(
+                    "🔧 <b>Технические работы</b>\n\n"
+                    "В данный момент бот находится на техническом обслуживании.\n"
+                    "Пожалуйста, попробуйте позже.\n\n"
+                    f"📞 По вопросам: {SUPPORT_USERNAME}",
+                    parse_mode="HTML"
+                )
+            return None
+
+        return await handler(event, data)
@@ -0,0 +1,114 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Optional, Tuple
+
+SAMPLE_INTERVAL = 0.005          # сек между снимками стека
+MAX_DURATION = 300               # дольше профилировать не даём
+TOP_STACKS = 40                  # стеков в начале отчёта
+TOP_FUNCTIONS = 40               # строк pstats / функций по собственному времени
+
+
+# ==================== СЭМПЛИРОВАНИЕ ====================
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Раз в SAMPLE_INTERVAL снимает стек потока цикла событий из отдельного потока.
+    Обработчики не замедляются: за каждый снимок платит поток сэмплера (и GIL на микросекунды)"""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def run(self, duration: float):
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def report(self) -> str:
+        """Топ стеков и функций по собственному времени, затем все стеки в collapsed-формате
+        (открывается flamegraph.pl и speedscope)"""
+        total = self.samples or 1
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+
+        lines = [f"# Сэмплов: {self.samples}, интервал {self.interval * 1000:.0f} мс", "",
+                 "# Функции по собственному времени (верх стека)"]
+        lines += [f"{count * 100 / total:6.2f}%  {count:6d}  {name}" for name, count in leaves.most_common(TOP_FUNCTIONS)]
+        lines += ["", "# Самые частые стеки"]
+        for stack, count in self.stacks.most_common(TOP_STACKS):
+            lines.append(f"{count * 100 / total:6.2f}%  {count:6d}")
+            lines += [f"    {frame}" for frame in reversed(stack.split(";"))]
+        lines += ["", "# Все стеки (collapsed)"]
+        lines += [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+        return "\n".join(lines) + "\n"
+
+
+# ==================== ЗАПУСК ====================
+_running = False
+
+
+def is_running() -> bool:
+    return _running
+
+
+async def profile(duration: float, mode: str = "sample") -> Tuple[str, Optional[int]]:
+    """Профилирование цикла событий на duration секунд.
+    sample - сэмплер стеков в отдельном потоке, cprofile - детерминированный cProfile
+    (все вызовы потока цикла событий, заметно замедляет бота на время замера).
+    Возвращает путь к текстовому отчёту (удаляет вызывающий) и число сэмплов"""
+    global _running
+    if _running:
+        raise RuntimeError("профилирование уже идёт")
+    _running = True
+    try:
+        duration = min(duration, MAX_DURATION)
+        samples = None
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await asyncio.sleep(duration)
+            finally:
+                profiler.disable()
+            stream = io.StringIO()
+            stats = pstats.Stats(profiler, stream=stream)
+            stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            stats.sort_stats("tottime").print_stats(TOP_FUNCTIONS)
+            text = stream.getvalue()
+        else:
+            sampler = StackSampler(threading.get_ident())
+            await asyncio.to_thread(sampler.run, duration)
+            text, samples = sampler.report(), sampler.samples
+    finally:
+        _running = False
+
+    return await asyncio.to_thread(_write_report, text), samples
+
+
+def _write_report(text: str) -> str:
+    fd, path = tempfile.mkstemp(prefix="profile_", suffix=".txt")
+    with os.fdopen(fd, "w", encoding="utf-8") as file:
+        file.write(text)
+    return path
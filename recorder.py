@@ -0,0 +1,232 @@
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import re
+import secrets
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import TelegramObject, Update
+
+from callbacks import BonusAction, BonusCallback, UserPickCallback
+from keyboards import get_admin_keyboard, get_back_reply_keyboard, get_main_keyboard
+
+# Настройки по умолчанию (переопределяются через configure() из main.py)
+FLUSH_EVERY = 200                # записей в буфере до сброса на диск
+FLUSH_INTERVAL = 5.0             # сек: сбрасываем и при редком трафике
+MAX_RECORDS = 100_000            # потом запись останавливается, чтобы не забить диск
+ANON_ID_BASE = 10 ** 13          # обезличенные id не пересекаются с настоящими
+
+NAME_FIELDS = {"first_name", "last_name", "username", "title", "phone_number", "vcard", "bio", "email", "url"}
+TEXT_FIELDS = {"text", "caption", "query"}
+CALLBACK_FIELDS = {"data", "callback_data"}  # callback_query.data и кнопки в reply_markup сообщений бота
+ID_OWNERS = {"from", "chat", "user", "sender_chat", "forward_from", "forward_from_chat"}
+DROP_FIELDS = {"location", "venue", "live_period"}
+KEEP_TEXT = re.compile(r"[+\-=]?\d{1,4}")  # ввод остатка и цены
+USER_ID_TEXT = re.compile(r"\d{5,}")       # id в поиске пикера пользователей - тоже псевдонимом
+COMMANDS = {"/start", "/order", "/archive", "/export", "/dbhealth", "/dbtop", "/latency", "/profile", "/filters"}
+
+
+def _button_texts() -> Set[str]:
+    """Кнопки reply-клавиатур: по ним идёт маршрутизация, данных пользователя в них нет"""
+    keyboards = (get_main_keyboard(0, True), get_back_reply_keyboard(), get_admin_keyboard())
+    texts = {button.text for keyboard in keyboards for row in keyboard.keyboard for button in row}
+    # Клавиатуры списков админов и ЧС (users_reply_keyboard в handlers/admin.py)
+    return texts | {"🔙 Назад", "➕ Добавить админа", "➖ Удалить админа", "➕ Добавить в ЧС", "➖ Удалить из ЧС"}
+
+
+BUTTON_TEXTS = _button_texts()
+
+
+# ==================== ОБЕЗЛИЧИВАНИЕ ====================
+def anonymize_id(user_id: int, salt: str) -> int:
+    """Стабильный для одной соли псевдоним id: тот же пользователь - тот же псевдоним"""
+    digest = hmac.new(salt.encode(), str(user_id).encode(), hashlib.sha256).digest()
+    return ANON_ID_BASE + int.from_bytes(digest[:5], "big")
+
+
+def _mask(text: str) -> str:
+    """Буквы -> x, цифры -> 0: длина и разметка (смещения entities) сохраняются"""
+    return "".join("x" if char.isalpha() else "0" if char.isdigit() else char for char in text)
+
+
+def anonymize_text(text: str, salt: str = "") -> str:
+    """Как есть - только известные кнопки, команды (без аргументов) и короткие числа (ввод остатка
+    и цены). Число-id (поиск в пикере) - псевдонимом; всё остальное, включая тексты бота, маскируется"""
+    if not text or text in BUTTON_TEXTS or KEEP_TEXT.fullmatch(text.strip()):
+        return text
+    if salt and USER_ID_TEXT.fullmatch(text.strip()):
+        return str(anonymize_id(int(text.strip()), salt))
+    command, separator, args = text.partition(" ")
+    if command.partition("@")[0] in COMMANDS:
+        return command + separator + _mask(args)
+    return _mask(text)
+
+
+def anonymize_callback_data(data: str, salt: str) -> str:
+    """user_id в callback_data (пикер пользователей, скидки от админа) - псевдонимом, как в БД-копии.
+    Уже обезличенные id не трогаем: функция применяется и к старым записям при воспроизведении"""
+    prefix = data.partition(":")[0]
+    try:
+        if prefix == UserPickCallback.__prefix__:
+            callback = UserPickCallback.unpack(data)
+            if 0 < callback.user_id < ANON_ID_BASE:
+                return callback.model_copy(update={"user_id": anonymize_id(callback.user_id, salt)}).pack()
+        elif prefix == BonusCallback.__prefix__:
+            callback = BonusCallback.unpack(data)
+            if callback.action in (BonusAction.add, BonusAction.remove) and 0 < callback.value < ANON_ID_BASE:
+                return callback.model_copy(update={"value": anonymize_id(callback.value, salt)}).pack()
+    except (TypeError, ValueError):
+        # Чужой формат - id не разобрать, поэтому без цифр
+        return _mask(data)
+    return data
+
+
+def _anonymize(value: Any, salt: str, owner: str = "") -> Any:
+    if isinstance(value, list):
+        return [_anonymize(item, salt, owner) for item in value]
+    if not isinstance(value, dict):
+        return value
+
+    result = {}
+    for key, item in value.items():
+        if key in DROP_FIELDS:
+            continue
+        if key in NAME_FIELDS and isinstance(item, str):
+            result[key] = "user" if key in ("first_name", "username") else _mask(item)
+        elif key in TEXT_FIELDS and isinstance(item, str):
+            result[key] = anonymize_text(item, salt)
+        elif key in CALLBACK_FIELDS and isinstance(item, str):
+            result[key] = anonymize_callback_data(item, salt)
+        elif (key == "id" and owner in ID_OWNERS or key == "user_id") and isinstance(item, int) and item > 0:
+            result[key] = anonymize_id(item, salt)
+        else:
+            result[key] = _anonymize(item, salt, key)
+    return result
+
+
+def anonymize_update(update: Update, salt: str) -> Dict:
+    return _anonymize(update.model_dump(mode="json", exclude_none=True, by_alias=True), salt)
+
+
+# ==================== ИСХОДЯЩИЕ ВЫЗОВЫ ====================
+_update_calls: ContextVar[Optional[List[str]]] = ContextVar("update_calls", default=None)
+
+
+class ApiCallsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: какие методы Bot API вызвал текущий апдейт"""
+
+    async def __call__(self, make_request, bot, method):
+        calls = _update_calls.get()
+        if calls is not None:
+            calls.append(type(method).__name__)
+        return await make_request(bot, method)
+
+
+async def traced(call: Awaitable) -> Tuple[Any, List[str], float]:
+    """Выполняет обработку апдейта; возвращает результат, вызовы Bot API и время, сек"""
+    calls: List[str] = []
+    token = _update_calls.set(calls)
+    started = time.perf_counter()
+    try:
+        result = await call
+    finally:
+        _update_calls.reset(token)
+    return result, calls, time.perf_counter() - started
+
+
+# ==================== ЗАПИСЬ ====================
+class UpdateRecorder:
+    """Запись входящих апдейтов (обезличенных) в gzip JSONL для воспроизведения.
+    Строка: {"t": время прихода, "ms": время обработки, "calls": методы Bot API, "update": апдейт}"""
+
+    def __init__(self):
+        self.path: Optional[str] = None
+        self.salt = ""
+        self.flush_every = FLUSH_EVERY
+        self.max_records = MAX_RECORDS
+        self.recorded = 0
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None and self.recorded < self.max_records
+
+    def configure(self, path: str = None, salt: str = None, max_records: int = None):
+        """Переопределение настроек (из переменных окружения)"""
+        if path is not None:
+            self.path = path or None
+        if salt is not None:
+            self.salt = salt
+        if max_records is not None:
+            self.max_records = max_records
+
+    def install(self, dp, bot):
+        if not self.salt:
+            # Без постоянной соли копию БД под запись не переименовать - но и восстановить id нельзя
+            self.salt = secrets.token_hex(16)
+            logging.warning("⚠️ RECORD_SALT не задан: псевдонимы пользователей не совпадут с копией БД")
+        dp.update.outer_middleware(RecordMiddleware(self))
+        bot.session.middleware(ApiCallsMiddleware())
+        logging.info(f"📼 Запись апдейтов: {self.path} (не больше {self.max_records})")
+
+    def add(self, update: Update, received: float, elapsed: float, calls: List[str]):
+        record = {"t": round(received, 3), "ms": round(elapsed * 1000, 2), "calls": calls,
+                  "update": anonymize_update(update, self.salt)}
+        self._buffer.append(json.dumps(record, ensure_ascii=False))
+        self.recorded += 1
+        if self.recorded >= self.max_records:
+            logging.warning(f"📼 Записано {self.recorded} апдейтов - запись остановлена")
+        if ((len(self._buffer) >= self.flush_every or time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+                or not self.enabled) and (self._flush_task is None or self._flush_task.done())):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        async with self._lock:
+            lines, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            if lines:
+                # Каждый сброс - отдельный gzip-член: файл читается целиком, даже если бот упал
+                await asyncio.to_thread(self._write, lines)
+
+    def _write(self, lines: List[str]):
+        with gzip.open(self.path, "at", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+
+    async def close(self):
+        await self.flush()
+
+
+class RecordMiddleware(BaseMiddleware):
+    """Внешний middleware на dp.update: апдейт, время его обработки и вызовы Bot API"""
+
+    def __init__(self, recorder: UpdateRecorder):
+        self.recorder = recorder
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        if not self.recorder.enabled:
+            return await handler(event, data)
+        received = time.time()
+        result, calls, elapsed = await traced(handler(event, data))
+        self.recorder.add(event, received, elapsed, calls)
+        return result
+
+
+recorder = UpdateRecorder()
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,91 @@
+from typing import Any, Callable, Dict, Sequence, Tuple
+
+
+# ==================== ЗАПИСИ ====================
+class Record:
+    """Строка БД с доступом по атрибутам. __slots__ вместо dict(row): ни словаря,
+    ни повторяющихся строковых ключей на каждую строку. Колонки, которых не было
+    в SELECT, читаются как None"""
+    __slots__ = ()
+    # (cursor.description, сборщик) последнего запроса и сборщики по наборам колонок
+    _last: Tuple[Any, Callable] = (None, None)
+    _builders: Dict[Tuple[str, ...], Callable]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._builders = {}
+        cls._last = (None, None)
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def factory(cls, cursor, row: Sequence) -> "Record":
+        """row_factory для sqlite3/aiosqlite: db.row_factory = Product.factory"""
+        # Одна ссылка на кортеж: потоки aiosqlite разных соединений не смешают описание и сборщик
+        last = cls._last
+        if last[0] is not cursor.description:
+            last = cls._last = (cursor.description, cls._builder(tuple(column[0] for column in cursor.description)))
+        return last[1](row)
+
+    @classmethod
+    def _builder(cls, columns: Tuple[str, ...]) -> Callable:
+        """Сборщик под набор колонок: одно распаковочное присваивание вместо setattr в цикле"""
+        builder = cls._builders.get(columns)
+        if builder is None:
+            unknown = [name for name in columns if name not in cls.__slots__]
+            if unknown:
+                raise AttributeError(f"{cls.__name__}: нет полей для колонок {', '.join(unknown)}")
+            targets = "".join(f"record.{name}, " for name in columns)
+            namespace = {"cls": cls, "new": object.__new__}
+            exec(f"def build(row):\n    record = new(cls)\n    {targets}= row\n    return record\n", namespace)
+            builder = cls._builders[columns] = namespace["build"]
+        return builder
+
+    def __getattr__(self, name: str):
+        # Сюда попадаем, только если слот не заполнен
+        if name in type(self).__slots__:
+            return None
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def replace(self, **changes) -> "Record":
+        """Копия с изменёнными полями (закэшированные записи не трогаем)"""
+        return type(self)(**{**self.as_dict(), **changes})
+
+    def __eq__(self, other) -> bool:
+        return type(other) is type(self) and self.as_dict() == other.as_dict()
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={value!r}" for name, value in self.as_dict().items() if value is not None)
+        return f"{type(self).__name__}({fields})"
+
+
+class User(Record):
+    __slots__ = ("user_id", "username", "first_name", "name_key", "is_admin", "is_banned", "created_at")
+
+
+class Product(Record):
+    __slots__ = ("id", "name", "description", "price", "stock", "created_at", "version")
+
+
+class CartLine(Record):
+    """Позиция корзины вместе с названием, ценой и остатком товара"""
+    __slots__ = ("id", "user_id", "product_id", "quantity", "name", "price", "stock")
+
+
+class Bonus(Record):
+    __slots__ = ("id", "user_id", "discount_percent", "is_active", "created_at")
+
+
+class Order(Record):
+    """Заказ; username/first_name - из JOIN с users, items и archived заполняет database.py"""
+    __slots__ = ("id", "order_number", "user_id", "total_price", "discount_percent", "final_price", "status",
+                 "created_at", "summary", "item_count", "username", "first_name", "items", "archived")
+
+
+class OrderItem(Record):
+    __slots__ = ("id", "order_id", "product_name", "quantity", "price_per_item", "subtotal")
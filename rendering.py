@@ -0,0 +1,147 @@
+from typing import Dict, List, Optional, Tuple
+
+from records import CartLine, OrderItem, Product
+
+CARD_CACHE_SIZE = 2048           # сколько карточек товаров держим в памяти
+ORDER_STATUS_PREFIX = "📊 Статус: "  # строка статуса в карточке заказа (патчится в SQL)
+
+# ==================== ШАБЛОНЫ ====================
+# Шаблоны - f-строки внутри функций: компилируются вместе с модулем,
+# в обработчиках остаётся только подстановка значений
+
+def _card_head(product: Product) -> str:
+    return (
+        f"📦 <b>{product.name}</b>\n\n"
+        f"📝 {product.description or 'Описание отсутствует'}\n\n"
+        f"💰 Цена: <b>{product.price}₽</b>\n"
+    )
+
+
+# ==================== КАРТОЧКА ТОВАРА ====================
+class CardCache:
+    """Статическая часть карточек (название, описание, цена) по версии товара"""
+
+    def __init__(self, maxsize: int = CARD_CACHE_SIZE):
+        self.maxsize = maxsize
+        # product_id -> (version, текст); новая версия товара заменяет старую
+        self._heads: Dict[int, Tuple[int, str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def head(self, product: Product) -> str:
+        cached = self._heads.get(product.id)
+        if cached is not None and cached[0] == product.version:
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        text = _card_head(product)
+        if cached is None and len(self._heads) >= self.maxsize:
+            # Вытесняем самую давнюю запись (порядок вставки dict)
+            del self._heads[next(iter(self._heads))]
+        self._heads[product.id] = (product.version, text)
+        return text
+
+    def drop(self, product_id: int):
+        self._heads.pop(product_id, None)
+
+    def clear(self):
+        self._heads.clear()
+
+    def __len__(self) -> int:
+        return len(self._heads)
+
+
+cards = CardCache()
+
+
+def render_product_card(product: Product, available: int, in_cart: int = 0) -> str:
+    """Карточка товара для покупателя: кэшированная шапка + остаток и корзина"""
+    if in_cart > 0:
+        return (
+            f"{cards.head(product)}📦 В наличии: <b>{available} шт.</b>\n"
+            f"🛒 <b>В вашей корзине: {in_cart} шт.</b>\n"
+        )
+    return f"{cards.head(product)}📦 В наличии: <b>{available} шт.</b>\n"
+
+
+def render_stock_card(product: Product) -> str:
+    """Карточка товара в админке пополнения склада"""
+    return (
+        f"{cards.head(product)}📊 <b>Текущий остаток: {product.stock} шт.</b>\n\n"
+        f"Кнопки ➕ и ➖ меняют остаток на 1. Можно отправить число: "
+        f"<code>+50</code>, <code>-3</code> или <code>=120</code> (точный остаток):"
+    )
+
+
+# ==================== КОРЗИНА И ЗАКАЗ ====================
+def cart_total(cart: List[CartLine]) -> int:
+    return sum(item.price * item.quantity for item in cart)
+
+
+def render_cart(cart: List[CartLine]) -> str:
+    """Текст корзины: строки собираются списком и склеиваются одним join"""
+    lines = [
+        f"• {item.name} × {item.quantity} шт. = <b>{item.price * item.quantity}₽</b>\n"
+        for item in cart
+    ]
+    return f"🛒 <b>Ваша корзина:</b>\n\n{''.join(lines)}\n💰 <b>Итого: {cart_total(cart)}₽</b>"
+
+
+def render_checkout(cart: List[CartLine], bonus: Optional[int], use_bonus: bool) -> str:
+    """Предпросмотр заказа с учётом выбранной скидки"""
+    lines = [
+        f"• {item.name} × {item.quantity} = <b>{item.price * item.quantity}₽</b>\n"
+        for item in cart
+    ]
+    total = cart_total(cart)
+    text = f"📋 <b>Ваш заказ:</b>\n\n{''.join(lines)}\n💰 Сумма: <b>{total}₽</b>"
+
+    if not bonus:
+        return f"{text}\n✅ <b>К оплате: {total}₽</b>"
+    if use_bonus:
+        discount = total * bonus // 100
+        return f"{text}\n🎁 Скидка {bonus}%: -{discount}₽\n✅ <b>К оплате: {total - discount}₽</b>"
+    return f"{text}\n🎁 Скидка {bonus}%: <i>не используется</i>\n✅ <b>К оплате: {total}₽</b>"
+
+
+def render_order_notification(order_number: str, user_id: int, cart: List[CartLine],
+                              total: int, final: int, discount: int) -> str:
+    """Уведомление админам о новом заказе"""
+    lines = [
+        f"• {item.name} × {item.quantity} шт. = {item.price * item.quantity}₽\n"
+        for item in cart
+    ]
+    discount_line = f"🎁 <b>Скидка:</b> {discount}%\n" if discount > 0 else ""
+    return (
+        f"🔔 <b>НОВЫЙ ЗАКАЗ!</b>\n\n"
+        f"📋 <b>Заказ #{order_number}</b>\n"
+        f"👤 <b>Заказчик:</b> ID {user_id}\n\n"
+        f"<b>📦 Товары:</b>\n"
+        f"{''.join(lines)}"
+        f"\n💰 <b>Сумма:</b> {total}₽\n"
+        f"{discount_line}"
+        f"✅ <b>К оплате:</b> {final}₽\n\n"
+        f"⏳ <b>Статус:</b> Ожидает оплаты"
+    )
+
+
+def render_order_summary(order_number: str, customer, created_at: str, status: str,
+                         items: List[OrderItem], total: int, discount: int, final: int) -> str:
+    """Карточка заказа для админки (хранится в orders.summary)"""
+    lines = [
+        f"• {item.product_name} × {item.quantity} = {item.subtotal}₽\n"
+        for item in items
+    ]
+    discount_line = f"🎁 Скидка {discount}%\n" if discount else ""
+    return (
+        f"📦 <b>Заказ {order_number}</b>\n"
+        f"👤 Пользователь: {customer}\n"
+        f"📅 Дата: {created_at}\n"
+        f"{ORDER_STATUS_PREFIX}{status}\n\n"
+        f"<b>Товары:</b>\n"
+        f"{''.join(lines)}"
+        f"\n💰 Сумма: {total}₽\n"
+        f"{discount_line}"
+        f"✅ <b>К оплате: {final}₽</b>"
+    )
@@ -0,0 +1,108 @@
+import time
+from typing import Dict, Tuple
+
+# Настройки по умолчанию (переопределяются через configure() из main.py)
+RESERVATION_TTL = 15 * 60        # сколько секунд держится резерв
+SWEEP_INTERVAL = 30              # как часто чистим просроченные резервы
+SWEEP_BATCH = 500                # сколько резервов удаляем за одну транзакцию
+
+
+class ReservationLedger:
+    """Индекс активных резервов в памяти (зеркало таблицы reservations)"""
+
+    def __init__(self, ttl: int = RESERVATION_TTL,
+                 sweep_interval: int = SWEEP_INTERVAL,
+                 sweep_batch: int = SWEEP_BATCH):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        # (user_id, product_id) -> (quantity, expires_at)
+        self._holds: Dict[Tuple[int, int], Tuple[int, float]] = {}
+        # product_id -> сумма резервов по товару
+        self._held: Dict[int, int] = {}
+
+    def configure(self, ttl: int = None, sweep_interval: int = None, sweep_batch: int = None):
+        """Переопределение настроек (из переменных окружения)"""
+        if ttl is not None:
+            self.ttl = ttl
+        if sweep_interval is not None:
+            self.sweep_interval = sweep_interval
+        if sweep_batch is not None:
+            self.sweep_batch = sweep_batch
+
+    def expires_at(self) -> float:
+        """Время истечения нового резерва"""
+        return time.time() + self.ttl
+
+    # ==================== ЧТЕНИЕ (O(1)) ====================
+    def held(self, product_id: int) -> int:
+        """Сколько единиц товара сейчас зарезервировано всеми пользователями"""
+        return self._held.get(product_id, 0)
+
+    def held_by(self, user_id: int, product_id: int) -> int:
+        """Сколько единиц товара зарезервировал пользователь"""
+        hold = self._holds.get((user_id, product_id))
+        return hold[0] if hold else 0
+
+    def available(self, product_id: int, stock: int) -> int:
+        """Остаток на складе за вычетом всех резервов"""
+        return max(stock - self.held(product_id), 0)
+
+    def available_for(self, user_id: int, product_id: int, stock: int, in_cart: int) -> int:
+        """Сколько пользователь ещё может добавить в корзину"""
+        others = self.held(product_id) - self.held_by(user_id, product_id)
+        return max(stock - others - in_cart, 0)
+
+    # ==================== ИЗМЕНЕНИЕ ИНДЕКСА ====================
+    # Вызываются из database.py только после успешного commit
+
+    def set(self, user_id: int, product_id: int, quantity: int, expires_at: float):
+        """Установка резерва (замена предыдущего)"""
+        self.drop(user_id, product_id)
+        if quantity <= 0:
+            return
+        self._holds[(user_id, product_id)] = (quantity, expires_at)
+        self._held[product_id] = self._held.get(product_id, 0) + quantity
+
+    def resize(self, user_id: int, product_id: int, quantity: int):
+        """Изменение количества в резерве без продления срока"""
+        hold = self._holds.get((user_id, product_id))
+        if hold:
+            self.set(user_id, product_id, quantity, hold[1])
+
+    def drop(self, user_id: int, product_id: int):
+        """Снятие резерва"""
+        hold = self._holds.pop((user_id, product_id), None)
+        if not hold:
+            return
+        left = self._held.get(product_id, 0) - hold[0]
+        if left > 0:
+            self._held[product_id] = left
+        else:
+            self._held.pop(product_id, None)
+
+    def drop_user(self, user_id: int):
+        """Снятие всех резервов пользователя"""
+        for key in [key for key in self._holds if key[0] == user_id]:
+            self.drop(*key)
+
+    def drop_product(self, product_id: int):
+        """Снятие всех резервов по товару"""
+        for key in [key for key in self._holds if key[1] == product_id]:
+            self.drop(*key)
+
+    def expire(self, user_id: int, product_id: int, now: float):
+        """Снятие резерва, только если он всё ещё просрочен (его могли продлить)"""
+        hold = self._holds.get((user_id, product_id))
+        if hold and hold[1] <= now:
+            self.drop(user_id, product_id)
+
+    def clear(self):
+        self._holds.clear()
+        self._held.clear()
+
+    def __len__(self) -> int:
+        return len(self._holds)
+
+
+ledger = ReservationLedger()
@@ -0,0 +1,19 @@
+from aiogram.fsm.state import State, StatesGroup
+
+
+# ==================== FSM STATES ====================
+class ShopStates(StatesGroup):
+    searching = State()
+
+
+class AdminStates(StatesGroup):
+    adding_product = State()
+    importing_products = State()
+    adding_stock = State()
+    deleting_product = State()
+    changing_price = State()
+    changing_price_input = State()  # ✅ Добавьте это!
+    adding_bonus = State()
+    picking_user = State()
+    picking_product = State()
+    searching_order = State()
@@ -0,0 +1,198 @@
+import logging
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from callbacks import (
+    NOOP, BonusAction, BonusCallback, CartCallback, CatalogCallback, MaintenanceCallback, MenuCallback,
+    MenuTarget, OrderAction, OrderCallback, ProductAction, ProductCallback, ProductPickCallback,
+    StockCallback, UserPickCallback,
+)
+
+# Настройки по умолчанию (переопределяются через configure() из main.py)
+# Класс обработчиков -> (токенов в секунду, размер пачки)
+LIMITS: Dict[str, Tuple[float, float]] = {
+    "browse": (2.0, 8),          # каталог, карточки, поиск, меню
+    "cart": (4.0, 12),           # ➕/➖ в корзине и карточке, бонусы к заказу
+    "checkout": (0.5, 3),        # оформление и оплата заказа
+    "admin": (10.0, 30),         # админка: пакетный ввод остатков не должен упираться в лимит
+}
+MAX_BUCKETS = 50_000             # больше - вытесняются самые давние, даже не восстановившиеся
+THROTTLED_TEXT = "⏳ Слишком часто, подождите секунду"
+
+
+# ==================== КЛАССЫ ОБРАБОТЧИКОВ ====================
+# callback_data: "префикс" или "префикс:действие" -> класс; действие точнее префикса
+CALLBACK_CLASSES = {
+    NOOP: "browse",
+    CatalogCallback.__prefix__: "browse",
+    f"{ProductCallback.__prefix__}:{ProductAction.view.value}": "browse",
+    ProductCallback.__prefix__: "admin",
+    CartCallback.__prefix__: "cart",
+    f"{BonusCallback.__prefix__}:{BonusAction.use.value}": "cart",
+    f"{BonusCallback.__prefix__}:{BonusAction.apply.value}": "cart",
+    BonusCallback.__prefix__: "admin",
+    f"{OrderCallback.__prefix__}:{OrderAction.checkout.value}": "checkout",
+    f"{OrderCallback.__prefix__}:{OrderAction.pay.value}": "checkout",
+    OrderCallback.__prefix__: "admin",
+    f"{MenuCallback.__prefix__}:{MenuTarget.main.value}": "browse",
+    f"{MenuCallback.__prefix__}:{MenuTarget.search.value}": "browse",
+    f"{MenuCallback.__prefix__}:{MenuTarget.cart.value}": "cart",
+    MenuCallback.__prefix__: "admin",
+    StockCallback.__prefix__: "admin",
+    UserPickCallback.__prefix__: "admin",
+    ProductPickCallback.__prefix__: "admin",
+    MaintenanceCallback.__prefix__: "admin",
+}
+# Кнопки reply-клавиатур и команды; прочий текст (поиск, ввод в FSM) - browse
+MESSAGE_CLASSES = {
+    "🛒 Корзина": "cart",
+    **dict.fromkeys((
+        "⚙️ Админ-панель", "💰 Изменить цену", "➕ Добавить товар", "📥 Импорт товаров", "🗑️ Удалить товар",
+        "📦 Пополнить товар", "👥 Список админов", "➖ Удалить админа", "➕ Добавить админа",
+        "🎁 Система бонусов", "🚫 ЧС пользователей", "➖ Удалить из ЧС", "➕ Добавить в ЧС",
+        "📋 История заказов", "📊 Статистика", "🔧 Техработы",
+        "/order", "/archive", "/export", "/dbhealth", "/dbtop", "/latency", "/profile", "/filters",
+    ), "admin"),
+}
+
+
+def classify(update: Update) -> Optional[str]:
+    """Класс обработчика по самому апдейту - до фильтров и запросов к БД"""
+    if update.callback_query:
+        data = update.callback_query.data or ""
+        prefix, _, rest = data.partition(":")
+        action = rest.partition(":")[0]
+        return CALLBACK_CLASSES.get(f"{prefix}:{action}") or CALLBACK_CLASSES.get(prefix, "browse")
+    if update.message:
+        text = update.message.text or ""
+        if text.startswith("/"):
+            text = text.split(maxsplit=1)[0].partition("@")[0]
+        return MESSAGE_CLASSES.get(text, "browse")
+    if update.inline_query:
+        return "browse"
+    return None
+
+
+# ==================== ТОКЕНЫ ====================
+class _Bucket:
+    __slots__ = ("tokens", "stamp", "warned")
+
+    def __init__(self, tokens: float, stamp: float):
+        self.tokens = tokens
+        self.stamp = stamp
+        self.warned = False
+
+
+class Throttle:
+    """Антифлуд: token bucket на пару (пользователь, класс обработчиков).
+    Корзины лежат в порядке последнего обращения; восстановившаяся до полной корзина
+    ничем не отличается от отсутствующей и вытесняется с головы очереди"""
+
+    def __init__(self):
+        self.limits = dict(LIMITS)
+        self.max_buckets = MAX_BUCKETS
+        self.passed = Counter()
+        self.dropped = Counter()
+        self.evicted = 0
+        self._buckets: "OrderedDict[Tuple[int, str], _Bucket]" = OrderedDict()
+
+    def configure(self, limits: Dict[str, Tuple[float, float]] = None, max_buckets: int = None):
+        """Переопределение настроек (из переменных окружения)"""
+        if limits:
+            unknown = set(limits) - set(self.limits)
+            if unknown:
+                raise ValueError(f"Неизвестные классы обработчиков: {', '.join(sorted(unknown))}")
+            for kind, limit in limits.items():
+                if len(limit) != 2 or limit[0] <= 0 or limit[1] < 1:
+                    raise ValueError(f"Лимит {kind}: нужно «токенов в секунду/пачка», скорость > 0 и пачка ≥ 1")
+            self.limits.update({kind: tuple(limit) for kind, limit in limits.items()})
+        if max_buckets is not None:
+            self.max_buckets = max_buckets
+
+    def install(self, dp):
+        dp.update.outer_middleware(ThrottleMiddleware(self))
+        logging.info("🚦 Антифлуд: " + ", ".join(
+            f"{kind} {rate:g}/с (пачка {burst:g})" for kind, (rate, burst) in self.limits.items()
+        ))
+
+    def take(self, user_id: int, kind: str, now: float = None) -> Optional[_Bucket]:
+        """Списывает токен; None - токенов нет. Возвращает корзину, чтобы сбросить предупреждение"""
+        now = time.monotonic() if now is None else now
+        rate, burst = self.limits[kind]
+        key = (user_id, kind)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(burst, now)
+            self._evict(now)
+        else:
+            bucket.tokens = min(burst, bucket.tokens + (now - bucket.stamp) * rate)
+            bucket.stamp = now
+            self._buckets.move_to_end(key)
+
+        if bucket.tokens < 1:
+            self.dropped[kind] += 1
+            return None
+        bucket.tokens -= 1
+        self.passed[kind] += 1
+        return bucket
+
+    def _evict(self, now: float):
+        """С головы: корзины, простоявшие дольше полного восстановления, и лишние сверх лимита"""
+        buckets = self._buckets
+        while buckets:
+            (_, kind), bucket = next(iter(buckets.items()))
+            rate, burst = self.limits[kind]
+            if now - bucket.stamp < burst / rate:
+                if len(buckets) <= self.max_buckets:
+                    break
+                self.evicted += 1
+            buckets.popitem(last=False)
+
+    def warn_once(self, user_id: int, kind: str) -> bool:
+        """Предупреждать о лимите текстом - один раз, пока идёт серия отброшенных"""
+        bucket = self._buckets.get((user_id, kind))
+        if bucket is None or bucket.warned:
+            return False
+        bucket.warned = True
+        return True
+
+    def report(self) -> str:
+        text = f"🚦 <b>Антифлуд</b> (корзин: {len(self._buckets)}, вытеснено до восстановления: {self.evicted})\n"
+        for kind, (rate, burst) in self.limits.items():
+            text += (f"• {kind} ({rate:g}/с, пачка {burst:g}): пропущено {self.passed[kind]}, "
+                     f"отброшено {self.dropped[kind]}\n")
+        return text
+
+
+class ThrottleMiddleware(BaseMiddleware):
+    """Внешний middleware на dp.update: лишние апдейты отбрасываются до фильтров и БД"""
+
+    def __init__(self, throttle: Throttle):
+        self.throttle = throttle
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        user = data.get("event_from_user")
+        kind = classify(event) if user else None
+        if kind is None:
+            return await handler(event, data)
+
+        bucket = self.throttle.take(user.id, kind)
+        if bucket is not None:
+            bucket.warned = False
+            return await handler(event, data)
+
+        # Отброшено: callback всё равно отвечаем (иначе у кнопки крутятся часики),
+        # на сообщения - одно предупреждение за серию, inline-запрос просто истечёт
+        if event.callback_query:
+            await event.callback_query.answer(THROTTLED_TEXT)
+        elif event.message and self.throttle.warn_once(user.id, kind):
+            await event.message.answer(THROTTLED_TEXT)
+        return None
+
+
+throttle = Throttle()